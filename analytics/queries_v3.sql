@@ -0,0 +1,183 @@
+-- =============================================================================
+-- queries_v3.sql
+-- Analytics queries against schema v3 (database/03-create.sql)
+-- Same answers as queries.sql; dimensions are grouped by their SMALLINT key
+-- and the text labels joined in afterwards (a few rows per dimension).
+-- Organization names are whitespace-normalized by the v3 loader, so query 5
+-- merges names that differ only in spacing.
+-- Queries not listed here run unchanged on v3.v_studies.
+-- =============================================================================
+
+-- =============================================================================
+-- 1. HOW MANY TRIALS ARE THERE BY STUDY TYPE AND PHASE?
+-- =============================================================================
+
+SELECT
+    ty.code AS study_type,
+    COALESCE(ph.code, 'NOT_SPECIFIED') AS phase,
+    q.number_of_studies,
+    ROUND(100.0 * q.number_of_studies / SUM(q.number_of_studies) OVER (), 2) AS percentage,
+    q.completed,
+    ROUND(100.0 * q.completed / q.number_of_studies, 2) AS completion_rate
+FROM (
+    SELECT
+        study_type_id,
+        phase_id,
+        COUNT(*) AS number_of_studies,
+        COUNT(CASE WHEN overall_status_id = (SELECT id FROM v3.dim_status WHERE code = 'COMPLETED')
+                   THEN 1 END) AS completed
+    FROM v3.studies
+    GROUP BY study_type_id, phase_id
+) q
+JOIN v3.dim_study_type ty ON ty.id = q.study_type_id
+LEFT JOIN v3.dim_phase ph ON ph.id = q.phase_id
+ORDER BY q.number_of_studies DESC;
+
+-- =============================================================================
+-- 2. WHAT ARE THE MOST COMMONLY STUDIED CONDITIONS?
+-- =============================================================================
+
+SELECT
+    c.condition_name,
+    COUNT(DISTINCT sc.study_key) AS number_of_studies,
+    ROUND(100.0 * COUNT(DISTINCT sc.study_key) /
+          (SELECT COUNT(*) FROM v3.studies), 2) AS coverage_percentage,
+    COUNT(CASE WHEN s.overall_status_id = (SELECT id FROM v3.dim_status WHERE code = 'COMPLETED')
+               THEN 1 END) AS completed_studies
+FROM v3.conditions c
+JOIN v3.study_conditions sc ON c.id = sc.condition_id
+JOIN v3.studies s ON sc.study_key = s.study_key
+GROUP BY c.condition_name
+ORDER BY number_of_studies DESC
+LIMIT 20;  -- Top 20 conditions
+
+-- =============================================================================
+-- 3. DISTRIBUTION OF STUDIES BY STATUS
+-- =============================================================================
+
+SELECT
+    st.code AS overall_status,
+    q.number_of_studies,
+    ROUND(100.0 * q.number_of_studies / SUM(q.number_of_studies) OVER (), 2) AS percentage,
+    q.with_start_date,
+    q.average_days_since_start
+FROM (
+    SELECT
+        overall_status_id,
+        COUNT(*) AS number_of_studies,
+        COUNT(start_date) AS with_start_date,
+        ROUND(AVG(CAST((CURRENT_DATE - start_date) AS numeric)), 1) AS average_days_since_start
+    FROM v3.studies
+    GROUP BY overall_status_id
+) q
+JOIN v3.dim_status st ON st.id = q.overall_status_id
+ORDER BY q.number_of_studies DESC;
+
+-- =============================================================================
+-- 4. TEMPORAL ANALYSIS: DISTRIBUTION BY START YEAR
+-- =============================================================================
+
+WITH s AS (SELECT code, id FROM v3.dim_status)
+SELECT
+    EXTRACT(YEAR FROM start_date)::INTEGER AS year,
+    COUNT(*) AS number_of_studies,
+    COUNT(CASE WHEN overall_status_id = (SELECT id FROM s WHERE code = 'COMPLETED')  THEN 1 END) AS completed,
+    COUNT(CASE WHEN overall_status_id = (SELECT id FROM s WHERE code = 'RECRUITING') THEN 1 END) AS recruiting,
+    COUNT(CASE WHEN overall_status_id = (SELECT id FROM s WHERE code = 'SUSPENDED')  THEN 1 END) AS suspended,
+    ROUND(100.0 * COUNT(CASE WHEN overall_status_id = (SELECT id FROM s WHERE code = 'COMPLETED') THEN 1 END) /
+          COUNT(*), 2) AS completion_rate
+FROM v3.studies
+WHERE start_date IS NOT NULL
+GROUP BY EXTRACT(YEAR FROM start_date)
+ORDER BY year DESC;
+
+-- =============================================================================
+-- 5. STUDIES BY ORGANIZATION (TOP 10)
+-- =============================================================================
+
+-- Grouped by name as in queries.sql: one name can have several org_ids (one
+-- per org class), so organizations is joined before aggregating (small hash join)
+SELECT
+    o.org_name,
+    COUNT(*) AS number_of_studies,
+    COUNT(DISTINCT sc.condition_id) AS num_unique_conditions,
+    COUNT(CASE WHEN s.overall_status_id = (SELECT id FROM v3.dim_status WHERE code = 'COMPLETED')
+               THEN 1 END) AS completed,
+    ROUND(100.0 * COUNT(CASE WHEN s.overall_status_id = (SELECT id FROM v3.dim_status WHERE code = 'COMPLETED')
+                             THEN 1 END) / COUNT(*), 2) AS completion_rate
+FROM v3.studies s
+JOIN v3.organizations o ON o.id = s.org_id
+LEFT JOIN v3.study_conditions sc ON s.study_key = sc.study_key
+GROUP BY o.org_name
+HAVING COUNT(*) >= 2  -- At least 2 studies
+ORDER BY number_of_studies DESC
+LIMIT 10;
+
+-- =============================================================================
+-- 6. NUMBER OF CONDITIONS PER STUDY (DISTRIBUTION ANALYSIS)
+-- =============================================================================
+
+-- cardinality(condition_ids): no join with study_conditions
+SELECT
+    cardinality(condition_ids) AS num_conditions,
+    COUNT(*) AS number_of_studies,
+    ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (), 2) AS percentage
+FROM v3.studies
+GROUP BY cardinality(condition_ids)
+ORDER BY num_conditions;
+
+-- =============================================================================
+-- 8. DATA QUALITY: CRITICAL FIELDS
+-- =============================================================================
+
+SELECT
+    COUNT(*) AS total_studies,
+    COUNT(CASE WHEN brief_title IS NULL OR brief_title = '' THEN 1 END) AS empty_titles,
+    COUNT(CASE WHEN o.org_name = '' THEN 1 END) AS empty_orgs,
+    COUNT(CASE WHEN start_date IS NULL THEN 1 END) AS empty_dates,
+    COUNT(CASE WHEN phase_id IS NULL THEN 1 END) AS empty_phases,
+    ROUND(100.0 * COUNT(CASE WHEN brief_title IS NOT NULL AND
+                            start_date IS NOT NULL
+                       THEN 1 END) / COUNT(*), 2) AS average_completeness
+FROM v3.studies s
+JOIN v3.organizations o ON o.id = s.org_id;
+
+-- =============================================================================
+-- 11. STUDIES WITH ALL / ANY OF A SET OF CONDITIONS (GIN on condition_ids)
+-- =============================================================================
+
+-- All of them: @> (every listed condition must exist, otherwise the array is
+-- shorter and the filter looser; the CASE returns no rows in that case)
+SELECT s.study_key, s.brief_title, s.overall_status, s.conditions_list
+FROM v3.v_studies_with_conditions s
+WHERE s.condition_ids @> (
+    SELECT CASE WHEN COUNT(*) = 2 THEN array_agg(id) END
+    FROM v3.conditions
+    WHERE condition_name IN ('breast cancer', 'obesity')
+)
+LIMIT 100;
+
+-- Any of them: &&
+SELECT COUNT(*) AS number_of_studies
+FROM v3.studies
+WHERE condition_ids && (
+    SELECT array_agg(id)
+    FROM v3.conditions
+    WHERE condition_name IN ('asthma', 'healthy')
+);
+
+-- =============================================================================
+-- NOTES
+-- =============================================================================
+--
+-- overall_status_id is NOT NULL with an FK to dim_status, so "empty_statuses"
+-- from queries.sql is always 0 here and was left out of query 8.
+--
+-- org_name is NOT NULL in organizations, so query 8 only counts empty names.
+--
+-- Queries 7 and 9 run unchanged against the compatibility views:
+--   SET search_path = v3, public;   -- then replace "studies" with "v_studies"
+--
+-- PARA EJECUTAR EN PSQL:
+-- psql -U migx_user -d clinical_db -f analytics/queries_v3.sql
+--
@@ -0,0 +1,61 @@
+-- =============================================================================
+-- history.sql
+-- Study version history for periodic full snapshots (study_history.py)
+-- Created automatically by study_history.py; safe to run more than once.
+-- =============================================================================
+
+-- Design reasons:
+-- 1. One row per version of a study, valid over a DATERANGE [valid_from, valid_to).
+--    The current version has an open upper bound; a study removed from a
+--    snapshot keeps its last version, closed on that snapshot's date.
+-- 2. content_hash fingerprints every loaded column plus the sorted condition
+--    names. The next snapshot is diffed against the current (study_key,
+--    content_hash) pairs read in key order, so unchanged studies are never
+--    written: only new / changed / removed studies touch this table.
+-- 3. "As of" queries (valid @> DATE '...') use the GiST index on the range;
+--    one study's history uses the (study_key, lower(valid)) index. The partial
+--    unique index holds the current versions in key order (read by the diff
+--    without a sort) and makes two open versions of one study impossible.
+--    Ranges of one study do not overlap because snapshot dates only increase
+--    (an EXCLUDE constraint would also need the btree_gist extension).
+-- 4. study_snapshots records every applied snapshot with its diff counts.
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS public.study_snapshots (
+    snapshot_id         SERIAL PRIMARY KEY,
+    snapshot_date       DATE NOT NULL UNIQUE,
+    source_path         TEXT NOT NULL,
+    source_fingerprint  VARCHAR(64) NOT NULL,
+    studies             INTEGER NOT NULL,
+    inserted            INTEGER NOT NULL,
+    changed             INTEGER NOT NULL,
+    removed             INTEGER NOT NULL,
+    unchanged           INTEGER NOT NULL,
+    loaded_at           TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS public.study_versions (
+    version_id          BIGSERIAL PRIMARY KEY,
+    study_key           VARCHAR(16) COLLATE "C" NOT NULL,   -- byte order, the order the diff merges in
+    valid               DATERANGE NOT NULL,
+    content_hash        VARCHAR(32) NOT NULL,
+    snapshot_id         INTEGER NOT NULL REFERENCES study_snapshots(snapshot_id),
+    brief_title         TEXT NOT NULL,
+    full_title          TEXT,
+    org_name            TEXT NOT NULL,
+    org_class           VARCHAR(50),
+    responsible_party   VARCHAR(100),
+    overall_status      VARCHAR(50) NOT NULL,
+    study_type          VARCHAR(50) NOT NULL,
+    phase               VARCHAR(50),
+    start_date          DATE,
+    standard_age        TEXT,
+    primary_purpose     VARCHAR(50),
+    conditions_list     TEXT,                           -- sorted names, ' | ' separated
+    CONSTRAINT valid_not_empty CHECK (NOT isempty(valid) AND NOT lower_inf(valid))
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_study_versions_current
+    ON study_versions (study_key) INCLUDE (content_hash) WHERE upper_inf(valid);
+CREATE INDEX IF NOT EXISTS idx_study_versions_valid ON study_versions USING gist (valid);
+CREATE INDEX IF NOT EXISTS idx_study_versions_key   ON study_versions (study_key, lower(valid));
@@ -0,0 +1,86 @@
+-- =============================================================================
+-- ledger.sql
+-- Load ledger for resumable loads (02-upload.py --mode resume)
+-- Created automatically by the loader; safe to run more than once.
+-- =============================================================================
+
+-- Design reasons:
+-- 1. One row per load attempt, keyed by a fingerprint of the source file, so a
+--    rerun on the same file can find the unfinished run and continue it.
+-- 2. One row per committed chunk (chunk_offset = first CSV row of the chunk).
+--    The chunk's rows and its ledger row are committed in the same transaction,
+--    so a chunk is either fully loaded and recorded, or neither.
+-- 3. Rows rejected by the database (CHECK / NOT NULL / length violations) go to
+--    load_quarantine with the error instead of aborting the whole load.
+-- 4. load_sketches keeps the approximate-summary sketches (sketches.py) of each
+--    load: one row per committed chunk in resume mode (same transaction as the
+--    chunk) and one merged row (part = -1) when the load is published.
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS public.load_runs (
+    run_id              SERIAL PRIMARY KEY,
+    source_path         TEXT NOT NULL,
+    source_fingerprint  VARCHAR(64) NOT NULL,
+    chunk_rows          INTEGER NOT NULL,
+    status              VARCHAR(20) NOT NULL DEFAULT 'running',
+    started_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at         TIMESTAMP,
+    CONSTRAINT valid_run_status CHECK (status IN ('running', 'failed', 'published'))
+);
+
+CREATE TABLE IF NOT EXISTS public.load_chunks (
+    run_id              INTEGER REFERENCES load_runs(run_id) ON DELETE CASCADE,
+    chunk_offset        BIGINT NOT NULL,
+    rows_read           INTEGER NOT NULL,
+    rows_loaded         INTEGER NOT NULL,
+    rows_quarantined    INTEGER NOT NULL,
+    loaded_at           TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, chunk_offset)
+);
+
+CREATE TABLE IF NOT EXISTS public.load_quarantine (
+    id                  BIGSERIAL PRIMARY KEY,
+    run_id              INTEGER REFERENCES load_runs(run_id) ON DELETE CASCADE,
+    chunk_offset        BIGINT NOT NULL,
+    study_key           VARCHAR(16),
+    reason              TEXT NOT NULL,
+    row_data            JSONB,
+    quarantined_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_load_runs_fingerprint ON load_runs(source_fingerprint);
+
+-- Source fingerprints for --mode incremental: the last successfully loaded
+-- state of each input file, with per-block digests and the study keys each
+-- block produced (needed to delete studies that disappear from a block).
+CREATE TABLE IF NOT EXISTS public.source_files (
+    source_path         TEXT PRIMARY KEY,
+    size                BIGINT NOT NULL,
+    mtime_ns            BIGINT NOT NULL,
+    fingerprint         VARCHAR(64) NOT NULL,
+    header              TEXT,
+    loaded_at           TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS public.source_blocks (
+    source_path         TEXT REFERENCES source_files(source_path) ON DELETE CASCADE,
+    block_no            INTEGER NOT NULL,
+    byte_offset         BIGINT NOT NULL,
+    byte_length         INTEGER NOT NULL,
+    digest              VARCHAR(32) NOT NULL,
+    study_keys          TEXT[] NOT NULL,
+    PRIMARY KEY (source_path, block_no)
+);
+
+-- Mergeable sketches (top conditions, distinct counts) per load, see sketches.py.
+-- load_id: 'run-<run_id>' for --mode resume, '<mode>-<timestamp>' otherwise.
+CREATE TABLE IF NOT EXISTS public.load_sketches (
+    load_id             TEXT NOT NULL,
+    part                BIGINT NOT NULL,                -- chunk offset, or -1: merged sketch of the load
+    mode                VARCHAR(20) NOT NULL,
+    sketch              BYTEA NOT NULL,
+    created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (load_id, part)
+);
+
+CREATE INDEX IF NOT EXISTS idx_load_sketches_merged ON load_sketches(created_at) WHERE part = -1;
@@ -8,13 +8,44 @@
 # - Warning logging + count when unexpected values are found
 # - Soft mapping of rare statuses to nearby categories
 # - Option commented for filtering invalid rows (if you want to be strict)
+#
+# Load modes (--mode):
+# - truncate: TRUNCATE + reload in one transaction (default)
+# - swap:     blue/green reload into <table>_new + atomic rename swap
+# - resume:   swap, committed chunk by chunk with a ledger (02-ledger.sql)
+# - incremental: no-op on unchanged files, re-transform only changed blocks
+# Schema (--schema): v2 (02-create.sql, default) or v3 (03-create.sql, dimension tables)
+# --profile full|sample: per-stage CPU / allocation profiles (profiling.py)
+# --reader arrow: multi-threaded pyarrow.csv parser, text columns kept as Arrow
+#   strings (pd.ArrowDtype) through transform() instead of Python str objects
+# --vocabulary FILE|db: known condition names containing commas ("carcinoma,
+#   non-small-cell lung") are kept whole instead of split (condition_tokenizer.py)
+#
+# CSV_PATH may also point to a ClinicalTrials.gov XML dump (*.xml), streamed by
+# xml_source.py; use --mode resume for large dumps (constant memory).
 # =============================================================================
 
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import numpy as np
 import pandas as pd
 import hashlib
 import re
+import sys
 import logging
+from pathlib import Path
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
 
 # Logging configuration
 logging.basicConfig(
@@ -47,6 +78,57 @@ VALID_STATUSES = {
     'NO_LONGER_AVAILABLE'
 }
 
+# Columns written to the studies table (only those present in the CSV are used)
+STUDY_COLUMNS = [
+    'study_key', 'brief_title', 'full_title', 'org_name', 'org_class',
+    'responsible_party', 'overall_status', 'study_type', 'phase',
+    'start_date', 'standard_age', 'primary_purpose'
+]
+
+# Tables written by the loader, parents first
+LOAD_TABLES = ['studies', 'conditions', 'study_conditions']
+
+# Blue/green reload: shadow tables are built as <table>_new and swapped in
+SHADOW_SUFFIX     = '_new'
+SWAP_LOCK_TIMEOUT = '2s'      # never queue behind long dashboard queries for longer
+SWAP_RETRIES      = 5
+
+# pg_try_advisory_lock key: only one load may run against the database at a time
+LOAD_LOCK_ID = 20260218
+
+# Resumable load: CSV rows per committed chunk + ledger DDL
+CHUNK_ROWS = 50_000
+LEDGER_SQL = Path(__file__).resolve().parent / "02-ledger.sql"
+
+# Incremental load: the CSV is fingerprinted in blocks of ~BLOCK_BYTES (cut at record ends)
+BLOCK_BYTES = 8 << 20
+
+# CSV readers (--reader): 'pandas' = read_csv, one Python str object per cell;
+# 'arrow' = pyarrow.csv, blocks of ARROW_BLOCK_BYTES parsed on all cores, text
+# kept in Arrow string buffers (pd.ArrowDtype(pa.string()))
+READERS           = ('pandas', 'arrow')
+ARROW_BLOCK_BYTES = 4 << 20
+# pandas' default na_values: cells both readers turn into missing values, so the
+# same file gives the same study keys with either reader
+CSV_NULL_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                   '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# Fields hashed into study_key, in order. 'organization_full_name' no longer exists
+# after normalize_column_names() and always hashes as '': kept so keys stay stable.
+KEY_FIELDS = ['brief_title', 'full_title', 'organization_full_name', 'start_date']
+
+# Schema v3 (03-create.sql): low-cardinality columns as SMALLINT keys into dim_* tables
+V3_SCHEMA     = 'v3'
+V3_CREATE_SQL = Path(__file__).resolve().parent / "03-create.sql"
+DIMENSIONS = {                      # studies column → dimension table
+    'overall_status':  'dim_status',
+    'phase':           'dim_phase',
+    'study_type':      'dim_study_type',
+    'org_class':       'dim_org_class',
+    'primary_purpose': 'dim_primary_purpose',
+}
+CLOSED_DIMENSIONS = {'overall_status'}   # seeded by 03-create.sql; unknown values are an error
+
 # Mapping to normalize rare statuses (optional)
 STATUS_MAPPING = {
     'ENROLLING_BY_INVITATION': 'RECRUITING',    # very similar
@@ -71,6 +153,41 @@ def generate_study_key(row) -> str:
     return hashlib.md5(unique_str.encode('utf-8')).hexdigest()[:16]
 
 
+def study_key_sources(df: pd.DataFrame) -> pd.Series:
+    """
+    The strings generate_study_key() hashes, built column-wise for the whole
+    frame (same text, including 'nan' / '' for missing values). Arrow string
+    columns stay Arrow: their missing values are filled with the 'nan' that
+    read_csv's NaN turns into.
+    """
+    parts = [key_part(df[col]) if col in df.columns else pd.Series('', index=df.index)
+             for col in KEY_FIELDS]
+    source = parts[0]
+    for part in parts[1:]:
+        source = source + '|' + part
+    return source
+
+
+def key_part(values: pd.Series) -> pd.Series:
+    if isinstance(values.dtype, pd.ArrowDtype):
+        return values.fillna('nan')
+    return values.astype(str)
+
+
+def check_key_collisions(keys: pd.Series, sources: pd.Series):
+    """
+    Raises if two different key sources hash to the same truncated key.
+    Equal sources with equal keys are ordinary duplicates, removed later.
+    """
+    dup = keys.duplicated(keep=False)
+    if not dup.any():
+        return
+    distinct = pd.DataFrame({'key': keys[dup], 'source': sources[dup]}).groupby('key')['source'].nunique()
+    collided = distinct[distinct > 1]
+    if not collided.empty:
+        raise ValueError(f"study_key collision on {len(collided)} key(s): {collided.index[:10].tolist()}")
+
+
 def normalize_column_names(df: pd.DataFrame) -> pd.DataFrame:
     """Clean and map CSV column names to expected database names"""
     df.columns = (
@@ -95,24 +212,43 @@ def normalize_column_names(df: pd.DataFrame) -> pd.DataFrame:
     return df.rename(columns=mapping)
 
 
-def extract_conditions(df: pd.DataFrame) -> pd.DataFrame:
-    """Extract and clean conditions (handles comma and pipe)"""
-    records = []
+def split_conditions(cells: pd.Series) -> pd.Series:
+    """
+    Cleaned condition names of each cell, one per row, indexed by the cell's
+    position: split on comma and pipe, strip, drop names shorter than 3
+    characters, lowercase. Arrow string columns are processed by Arrow kernels.
+    """
+    names = cells.reset_index(drop=True).str.split(r'\s*[,\|]\s*', regex=True).explode().str.strip()
+    return names[(names.str.len() >= 3).fillna(False).astype(bool)].str.lower()
+
+
+def extract_conditions(df: pd.DataFrame, tokenizer=None) -> pd.DataFrame:
+    """
+    Extract and clean conditions (handles comma and pipe), one row per
+    (study, name). With a condition_tokenizer.ConditionTokenizer, known names
+    that contain separators ("carcinoma, non-small-cell lung") are matched
+    first and only the rest of each cell is split.
+    """
     if 'conditions' not in df.columns:
         logging.warning("Column 'conditions' not found")
         return pd.DataFrame()
 
-    for _, row in df.iterrows():
-        if pd.isna(row['conditions']) or not str(row['conditions']).strip():
-            continue
-        raw = re.split(r'\s*[,\|]\s*', str(row['conditions']))
-        cleaned = {c.strip().lower() for c in raw if c.strip() and len(c.strip()) >= 3}
-        for cond in cleaned:
-            records.append({
-                'study_key': row['study_key'],
-                'condition_name': cond
-            })
-    return pd.DataFrame(records)
+    cells = df['conditions'].reset_index(drop=True)
+    matches = None
+    if tokenizer is not None:
+        cells, matches = tokenizer.tokenize(cells)
+    names = split_conditions(cells)
+    pairs = pd.DataFrame({'row': names.index, 'condition_name': names.array})
+    if matches is not None and not matches.empty:
+        matches = matches.astype({'condition_name': names.dtype})
+        pairs = pd.concat([matches, pairs], ignore_index=True).sort_values('row', kind='stable')
+    pairs = pairs.drop_duplicates()
+    if pairs.empty:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        'study_key': df['study_key'].iloc[pairs['row']].reset_index(drop=True),
+        'condition_name': pairs['condition_name'].reset_index(drop=True),
+    })
 
 
 def normalize_statuses(studies: pd.DataFrame) -> pd.DataFrame:
@@ -140,73 +276,1051 @@ def normalize_statuses(studies: pd.DataFrame) -> pd.DataFrame:
     return studies
 
 
-# ──────────────────────────────────────────────────────────────────────────────
-# MAIN FUNCTION
-# ──────────────────────────────────────────────────────────────────────────────
-
-def load_data():
-    logging.info("Starting data load...")
-
-    # 1. Read CSV
-    try:
-        df = pd.read_csv(CSV_PATH, dtype=str, low_memory=False)
-        logging.info(f"CSV read → {len(df):,} rows")
-    except Exception as e:
-        logging.error(f"Error reading CSV: {e}")
-        return
-
-    # 2. Normalize columns + generate key
+def transform(df: pd.DataFrame, tokenizer=None) -> tuple:
+    """
+    Transform step shared by every loader: normalize columns, generate keys,
+    deduplicate, convert types, map statuses and extract conditions (with
+    `tokenizer`'s vocabulary when given, see extract_conditions).
+    Returns (studies, cond_df).
+    """
+    # Normalize columns + generate key (and make sure no two studies share one)
     df = normalize_column_names(df)
-    df['study_key'] = df.apply(generate_study_key, axis=1)
+    sources = study_key_sources(df)
+    df['study_key'] = [hashlib.md5(src.encode('utf-8')).hexdigest()[:16] for src in sources]
+    check_key_collisions(df['study_key'], sources)
     df = df.drop_duplicates(subset='study_key', keep='first')
     logging.info(f"Unique rows after deduplication: {len(df):,}")
 
-    # 3. Prepare studies table
-    target_cols = [
-        'study_key', 'brief_title', 'full_title', 'org_name', 'org_class',
-        'responsible_party', 'overall_status', 'study_type', 'phase',
-        'start_date', 'standard_age', 'primary_purpose'
-    ]
-    existing_cols = [c for c in target_cols if c in df.columns]
+    # Prepare studies table
+    existing_cols = [c for c in STUDY_COLUMNS if c in df.columns]
     studies = df[existing_cols].copy()
 
-    # Type conversion
+    # Type conversion. 'YYYY-MM' and 'YYYY-MM-DD' are both ISO 8601; without an
+    # explicit format pandas infers one from the first value and turns the
+    # other shape into NaT, so the result would depend on the row order.
     if 'start_date' in studies.columns:
-        studies['start_date'] = pd.to_datetime(studies['start_date'], errors='coerce')
+        studies['start_date'] = pd.to_datetime(studies['start_date'], errors='coerce', format='ISO8601')
 
-    # 4. Normalize statuses (optional part activated)
+    # Normalize statuses (optional part activated)
     studies = normalize_statuses(studies)
 
-    # 5. Process conditions
-    cond_df = extract_conditions(df)
+    # Process conditions
+    cond_df = extract_conditions(df, tokenizer)
+    return studies, cond_df
 
-    # 6. Load to PostgreSQL
-    engine = create_engine(DB_URL)
+
+def is_xml_source(path: str) -> bool:
+    return str(path).lower().endswith('.xml')
+
+
+def _no_stage(name: str):
+    """Stand-in for Profiler.stage() when the run is not profiled"""
+    return contextlib.nullcontext()
+
+
+def save_load_sketch(conn, load_id: str, part: int, mode: str, studies: pd.DataFrame, cond_df: pd.DataFrame):
+    """Sketches (top conditions, distinct counts) of the rows just written, for sketches.py summary"""
+    sketches = load_script('sketches')
+    sketch = sketches.LoadSketches()
+    sketch.update(studies, cond_df)
+    sketches.save_sketch(conn, load_id, part, mode, sketch)
+
+
+def csv_header_names(header: bytes) -> list:
+    """Column names of a CSV header line (BOM removed, as read_csv does)"""
+    return next(csv.reader(io.StringIO(header.decode('utf-8-sig'))))
+
+
+def read_header(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.readline()
+
+
+def arrow_csv_options(names: list) -> dict:
+    """
+    pyarrow.csv options equivalent to read_csv(dtype=str): every column a
+    string, CSV_NULL_VALUES (quoted or not) as missing, quoted newlines allowed.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    return {
+        'read_options': pacsv.ReadOptions(use_threads=True, block_size=ARROW_BLOCK_BYTES),
+        'parse_options': pacsv.ParseOptions(newlines_in_values=True),
+        'convert_options': pacsv.ConvertOptions(column_types={n: pa.string() for n in names},
+                                                null_values=CSV_NULL_VALUES, strings_can_be_null=True,
+                                                quoted_strings_can_be_null=True),
+    }
+
+
+def arrow_to_frame(table) -> pd.DataFrame:
+    """Arrow table → DataFrame of pd.ArrowDtype(pa.string()) columns (the buffers are not copied into str objects)"""
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def read_csv_arrow(source, header: bytes) -> pd.DataFrame:
+    """Whole CSV (path or file object) with the multi-threaded Arrow reader"""
+    import pyarrow.csv as pacsv
+    return arrow_to_frame(pacsv.read_csv(source, **arrow_csv_options(csv_header_names(header))))
+
+
+def iter_arrow_frames(path: str, chunk_rows: int):
+    """
+    The Arrow reader's record batches regrouped into frames of exactly
+    `chunk_rows` rows (the last one shorter), like read_csv(chunksize=...).
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    reader = pacsv.open_csv(path, **arrow_csv_options(csv_header_names(read_header(path))))
+    pending, rows = [], 0
+    for batch in reader:
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= chunk_rows:
+            table = pa.Table.from_batches(pending, schema=reader.schema)
+            yield arrow_to_frame(table.slice(0, chunk_rows))
+            pending, rows = table.slice(chunk_rows).to_batches(), rows - chunk_rows
+    if rows:
+        yield arrow_to_frame(pa.Table.from_batches(pending, schema=reader.schema))
+
+
+def iter_source_frames(path: str, chunk_rows: int, reader: str = 'pandas'):
+    """
+    Source file → DataFrame chunks of up to `chunk_rows` rows (dtype str).
+    CSV goes through read_csv(chunksize=...) or the Arrow reader; ClinicalTrials.gov
+    XML (.xml) is streamed with iterparse. transform() accepts either kind of chunk.
+    """
+    if is_xml_source(path):
+        return load_script('xml').iter_xml_frames(path, chunk_rows)
+    if reader == 'arrow':
+        return iter_arrow_frames(path, chunk_rows)
+    return pd.read_csv(path, dtype=str, chunksize=chunk_rows)
+
+
+def read_source(path: str, reader: str = 'pandas') -> pd.DataFrame:
+    """Whole source file as one DataFrame (truncate / swap modes)"""
+    if is_xml_source(path):
+        return load_script('xml').parse_xml_to_df(path)
+    if reader == 'arrow':
+        return read_csv_arrow(path, read_header(path))
+    return pd.read_csv(path, dtype=str, low_memory=False)
+
+
+def write_tables(conn, studies: pd.DataFrame, cond_df: pd.DataFrame, suffix: str = ''):
+    """
+    Writes the three tables on an open connection, in FK-safe order:
+    unique conditions → map IDs → studies → relationships.
+    `suffix` targets the shadow tables (e.g. '_new') instead of the live ones.
+    """
+    # Unique conditions
+    if not cond_df.empty:
+        unique_cond = cond_df[['condition_name']].drop_duplicates()
+        unique_cond.to_sql(f'conditions{suffix}', conn, if_exists='append', index=False)
+        cond_map = pd.read_sql(f"SELECT id, condition_name FROM conditions{suffix}", conn).set_index('condition_name')['id']
+        cond_df['condition_id'] = cond_df['condition_name'].map(cond_map)
+
+    # Studies
+    studies.to_sql(f'studies{suffix}', conn, if_exists='append', index=False)
+
+    # Relationships
+    if not cond_df.empty:
+        relations = cond_df[['study_key', 'condition_id']].dropna()
+        if not relations.empty:
+            relations.to_sql(f'study_conditions{suffix}', conn, if_exists='append', index=False)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# BLUE/GREEN RELOAD (SHADOW TABLES + ATOMIC SWAP)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def acquire_load_lock(engine):
+    """
+    Takes the session-level advisory lock on a dedicated connection.
+    Raises RuntimeError if another load holds it. Keep the returned
+    connection open for the whole load and pass it to release_load_lock().
+    """
+    lock_conn = engine.connect()
+    acquired = lock_conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {'id': LOAD_LOCK_ID}).scalar()
+    lock_conn.commit()
+    if not acquired:
+        lock_conn.close()
+        raise RuntimeError(f"Another load is already running (advisory lock {LOAD_LOCK_ID} is held)")
+    return lock_conn
+
+
+def release_load_lock(lock_conn):
+    lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': LOAD_LOCK_ID})
+    lock_conn.commit()
+    lock_conn.close()
+
+
+def create_shadow_tables(conn, suffix: str = SHADOW_SUFFIX):
+    """
+    Creates empty <table>_new copies of the live tables: columns, defaults,
+    CHECK and NOT NULL constraints. Keys and indexes are added after the load
+    by finish_shadow_tables(), which is faster than maintaining them row by row.
+    """
+    for table in reversed(LOAD_TABLES):
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}{suffix} CASCADE"))
+    for table in LOAD_TABLES:
+        conn.execute(text(
+            f"CREATE TABLE {table}{suffix} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        # SERIAL columns: give the shadow its own sequence (the live one is dropped with the live table)
+        serial_cols = conn.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = :t AND column_default LIKE 'nextval(%'
+        """), {'t': table}).scalars().all()
+        for col in serial_cols:
+            seq = f"{table}{suffix}_{col}_seq"
+            conn.execute(text(f"CREATE SEQUENCE {seq} OWNED BY {table}{suffix}.{col}"))
+            conn.execute(text(f"ALTER TABLE {table}{suffix} ALTER COLUMN {col} SET DEFAULT nextval('{seq}')"))
+
+
+def finish_shadow_tables(conn, suffix: str = SHADOW_SUFFIX, analyze: bool = True):
+    """Recreates the live tables' keys, FKs and indexes on the shadow tables, then ANALYZE"""
+    for table in LOAD_TABLES:
+        # PRIMARY KEY / UNIQUE first, FOREIGN KEY afterwards (they need the referenced keys)
+        constraints = conn.execute(text("""
+            SELECT conname, contype, pg_get_constraintdef(oid) AS def
+            FROM pg_constraint
+            WHERE conrelid = CAST(:t AS regclass) AND contype IN ('p', 'u', 'f')
+            ORDER BY contype = 'f', conname
+        """), {'t': table}).all()
+        for name, contype, definition in constraints:
+            if contype == 'f':
+                for parent in LOAD_TABLES:
+                    definition = definition.replace(f"REFERENCES {parent}(", f"REFERENCES {parent}{suffix}(")
+            conn.execute(text(f"ALTER TABLE {table}{suffix} ADD CONSTRAINT {name}{suffix} {definition}"))
+
+        # Plain indexes (the ones not backing a constraint)
+        indexes = conn.execute(text("""
+            SELECT i.indexname, i.indexdef
+            FROM pg_indexes i
+            WHERE i.schemaname = 'public' AND i.tablename = :t
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c
+                              WHERE c.conindid = CAST(quote_ident(i.schemaname) || '.' || quote_ident(i.indexname) AS regclass))
+        """), {'t': table}).all()
+        for name, definition in indexes:
+            definition = definition.replace(f"INDEX {name} ON public.{table} ",
+                                            f"INDEX {name}{suffix} ON public.{table}{suffix} ", 1)
+            conn.execute(text(definition))
+
+        if analyze:
+            conn.execute(text(f"ANALYZE {table}{suffix}"))
+
+
+def swap_shadow_tables(engine, suffix: str = SHADOW_SUFFIX):
+    """
+    Replaces the live tables with the shadow ones in one short transaction:
+    copy grants + comments to the shadow tables → drop live → rename shadow
+    (tables, constraints, indexes, sequences) → recreate the views that
+    depended on the live tables, with their grants + comments.
+    Refuses (RuntimeError) when anything else depends on the live tables.
+    Retries if readers keep the tables busy for longer than SWAP_LOCK_TIMEOUT.
+    """
+    for attempt in range(1, SWAP_RETRIES + 1):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+                _swap(conn, suffix)
+            return
+        except Exception as e:
+            if 'lock timeout' not in str(e) or attempt == SWAP_RETRIES:
+                raise
+            logging.warning(f"Swap attempt {attempt} timed out waiting for readers, retrying...")
+
+
+def swap_blockers(conn, tables: str) -> list:
+    """
+    Objects DROP ... CASCADE would remove without _swap recreating them:
+    anything depending on the live tables, or on the views built directly on
+    them, except those views themselves and the load tables' own constraints
+    (e.g. FKs from other tables, materialized views, views on those views).
+    """
+    return conn.execute(text(f"""
+        WITH direct_views AS (
+            SELECT DISTINCT r.ev_class AS oid
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v   ON v.oid = r.ev_class
+            WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid IN ({tables}) AND v.relkind = 'v'
+        )
+        SELECT DISTINCT pg_describe_object(d.classid, d.objid, d.objsubid)
+        FROM pg_depend d
+        LEFT JOIN pg_rewrite r    ON d.classid = 'pg_rewrite'::regclass AND r.oid = d.objid
+        LEFT JOIN pg_constraint c ON d.classid = 'pg_constraint'::regclass AND c.oid = d.objid
+        WHERE d.deptype = 'n' AND d.refclassid = 'pg_class'::regclass
+          AND (d.refobjid IN ({tables}) OR d.refobjid IN (SELECT oid FROM direct_views))
+          AND (r.ev_class IS NULL OR r.ev_class NOT IN (SELECT oid FROM direct_views))
+          AND (c.conrelid IS NULL OR c.conrelid NOT IN ({tables}))
+        ORDER BY 1
+    """)).scalars().all()
+
+
+def privilege_statements(conn, source: str, target: str) -> list:
+    """GRANT / COMMENT statements that give relation `target` the privileges and comments of `source`"""
+    return conn.execute(text("""
+        WITH src AS (
+            SELECT c.oid, c.relacl,
+                   CASE c.relkind WHEN 'S' THEN 'SEQUENCE' ELSE 'TABLE' END AS grant_kind,
+                   CASE c.relkind WHEN 'S' THEN 'SEQUENCE' WHEN 'v' THEN 'VIEW' ELSE 'TABLE' END AS comment_kind
+            FROM pg_class c WHERE c.oid = CAST(:source AS regclass)
+        ), grantees AS (
+            SELECT g.grantee, g.privilege_type, g.is_grantable, NULL::name AS attname
+            FROM src, aclexplode(src.relacl) g
+            UNION ALL
+            SELECT g.grantee, g.privilege_type, g.is_grantable, a.attname
+            FROM src JOIN pg_attribute a ON a.attrelid = src.oid AND a.attnum > 0 AND NOT a.attisdropped,
+                 aclexplode(a.attacl) g
+        )
+        SELECT format('GRANT %s%s ON %s %I TO %s%s', g.privilege_type,
+                      CASE WHEN g.attname IS NULL THEN '' ELSE format(' (%I)', g.attname) END,
+                      src.grant_kind, CAST(:target AS text),
+                      CASE WHEN g.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(g.grantee)) END,
+                      CASE WHEN g.is_grantable THEN ' WITH GRANT OPTION' ELSE '' END)
+        FROM src, grantees g
+        UNION ALL
+        SELECT format('COMMENT ON %s %I IS %L', src.comment_kind, CAST(:target AS text), obj_description(src.oid, 'pg_class'))
+        FROM src WHERE obj_description(src.oid, 'pg_class') IS NOT NULL
+        UNION ALL
+        SELECT format('COMMENT ON COLUMN %I.%I IS %L', CAST(:target AS text), a.attname, col_description(a.attrelid, a.attnum))
+        FROM src JOIN pg_attribute a ON a.attrelid = src.oid AND a.attnum > 0 AND NOT a.attisdropped
+        WHERE col_description(a.attrelid, a.attnum) IS NOT NULL
+    """), {'source': source, 'target': target}).scalars().all()
+
+
+def _swap(conn, suffix: str):
+    tables = ", ".join(f"'{t}'::regclass" for t in LOAD_TABLES)
+    blockers = swap_blockers(conn, tables)
+    if blockers:
+        raise RuntimeError("Swap would drop objects that depend on the live tables: " + "; ".join(blockers)
+                           + ". Drop or detach them first, or load with --mode truncate")
+    # In creation order, so a view built on another one is recreated after it
+    views = conn.execute(text(f"""
+        SELECT v.relname, pg_get_viewdef(v.oid) AS def
+        FROM pg_class v
+        WHERE v.relkind = 'v' AND v.oid IN (SELECT r.ev_class FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+                                            WHERE d.refobjid IN ({tables}))
+        ORDER BY v.oid
+    """)).all()
+    view_privileges = [st for name, _ in views for st in privilege_statements(conn, name, name)]
+
+    # Renames to apply once the live tables are gone
+    renames = []
+    for table in LOAD_TABLES:
+        renames.append(f"ALTER TABLE {table}{suffix} RENAME TO {table}")
+        for (name,) in conn.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:t AS regclass) AND contype IN ('p', 'u', 'f')"
+        ), {'t': f"{table}{suffix}"}):
+            if name.endswith(suffix):
+                renames.append(f"ALTER TABLE {table} RENAME CONSTRAINT {name} TO {name[:-len(suffix)]}")
+        for (name,) in conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = :t"
+        ), {'t': f"{table}{suffix}"}):
+            if name.endswith(suffix):
+                renames.append(f"ALTER INDEX IF EXISTS {name} RENAME TO {name[:-len(suffix)]}")
+        for (col,) in conn.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = :t AND column_default LIKE 'nextval(%'
+        """), {'t': f"{table}{suffix}"}):
+            renames.append(f"ALTER SEQUENCE IF EXISTS {table}{suffix}_{col}_seq RENAME TO {table}_{col}_seq")
+            if conn.execute(text("SELECT to_regclass(:s)"), {'s': f"{table}_{col}_seq"}).scalar():
+                for statement in privilege_statements(conn, f"{table}_{col}_seq", f"{table}{suffix}_{col}_seq"):
+                    conn.execute(text(statement))
+        # Readers keep their access: the shadow table gets the live table's grants and comments
+        for statement in privilege_statements(conn, table, f"{table}{suffix}"):
+            conn.execute(text(statement))
+
+    # Nothing outside the load tables and the recreated views depends on them (swap_blockers)
+    conn.execute(text(f"DROP TABLE {', '.join(reversed(LOAD_TABLES))} CASCADE"))
+    for statement in renames:
+        conn.execute(text(statement))
+    for name, definition in views:
+        conn.execute(text(f"CREATE VIEW {name} AS {definition}"))
+    for statement in view_privileges:
+        conn.execute(text(statement))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# SOURCE FINGERPRINTS + INCREMENTAL LOAD
+# ──────────────────────────────────────────────────────────────────────────────
+
+def iter_csv_blocks(f, block_bytes: int = BLOCK_BYTES):
+    """
+    Splits an open binary CSV stream (positioned after the header) into blocks
+    of at least `block_bytes`, cut at the first record end after that size.
+    A newline only ends a record when the number of quotes before it is even,
+    so quoted fields with embedded newlines are never split.
+    Yields (offset, data).
+    """
+    offset, pending = f.tell(), b''
+    while True:
+        data = f.read(block_bytes)
+        if not data:
+            if pending:
+                yield offset, pending
+            return
+        pending += data
+        cut = pending.find(b'\n', block_bytes - 1)
+        while cut != -1 and pending.count(b'"', 0, cut) % 2:
+            cut = pending.find(b'\n', cut + 1)
+        if cut == -1:
+            continue
+        yield offset, pending[:cut + 1]
+        offset += cut + 1
+        pending = pending[cut + 1:]
+
+
+def iter_fixed_blocks(f, block_bytes: int = BLOCK_BYTES):
+    """Plain `block_bytes` slices of an open binary stream. Yields (offset, data)."""
+    offset = f.tell()
+    while data := f.read(block_bytes):
+        yield offset, data
+        offset += len(data)
+
+
+def scan_source(path: str, block_bytes: int = BLOCK_BYTES) -> dict:
+    """
+    Reads the file once and returns its size, mtime, header, per-block
+    (offset, length, digest) and an overall content fingerprint.
+    """
+    st = os.stat(path)
+    overall = hashlib.sha256(str(st.st_size).encode())
+    blocks = []
+    with open(path, 'rb') as f:
+        header = f.readline()
+        overall.update(header)
+        # XML records have no cheap end marker: fixed-size blocks are enough for a fingerprint
+        blocks_iter = iter_fixed_blocks(f, block_bytes) if is_xml_source(path) else iter_csv_blocks(f, block_bytes)
+        for offset, data in blocks_iter:
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            overall.update(digest.encode())
+            blocks.append({'offset': offset, 'length': len(data), 'digest': digest})
+    return {
+        'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'header': header,
+        'blocks': blocks, 'fingerprint': overall.hexdigest(),
+    }
+
+
+def source_fingerprint(path: str) -> str:
+    """Content fingerprint of the source file (see scan_source)"""
+    return scan_source(path)['fingerprint']
+
+
+def read_block(path: str, header: bytes, offset: int, length: int, reader: str = 'pandas') -> pd.DataFrame:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    if reader == 'arrow':
+        return read_csv_arrow(io.BytesIO(header + data), header)
+    return pd.read_csv(io.BytesIO(header + data), dtype=str, low_memory=False)
+
+
+def changed_blocks(scan: dict, stored: list) -> list:
+    """Block numbers whose digest differs from the stored one (or that are new)"""
+    old = {b['block_no']: b['digest'] for b in stored}
+    return [n for n, b in enumerate(scan['blocks']) if old.get(n) != b['digest']]
+
+
+def first_blocks(block_keys: dict) -> dict:
+    """study_key → number of the first block that produces it (the occurrence keep-first loads)"""
+    first = {}
+    for n in sorted(block_keys):
+        for key in block_keys[n]:
+            first.setdefault(key, n)
+    return first
+
+
+def plan_incremental(stored: list, block_keys: dict, n_blocks: int) -> tuple:
+    """
+    (upsert, extra, deleted) for a delta. `stored` holds the previous blocks
+    with their study_keys; `block_keys` maps block_no → keys for the changed
+    blocks, re-transformed. Keys keep their first occurrence in the whole file:
+    - upsert:  keys whose first block changed, or moved to another block
+               (e.g. removed from a changed block, still in a later one)
+    - extra:   unchanged blocks holding the first occurrence of an upserted key,
+               which must be re-read too
+    - deleted: keys no block of the new file produces
+    Keys of a changed block that first occur in an earlier, unchanged block
+    are left alone.
+    """
+    old = {b['block_no']: b['study_keys'] for b in stored}
+    new = {n: block_keys[n] if n in block_keys else old[n] for n in range(n_blocks)}
+    first_old, first_new = first_blocks(old), first_blocks(new)
+    upsert = {k for k, n in first_new.items() if n in block_keys or first_old.get(k) != n}
+    extra = sorted({first_new[k] for k in upsert} - set(block_keys))
+    return upsert, extra, set(first_old) - set(first_new)
+
+
+def forget_source_state(conn, keep: str = None):
+    """
+    Drops the incremental state of every source but `keep`: it describes what
+    the live tables were built from, so any full reload makes it stale.
+    """
+    conn.execute(text("DELETE FROM source_files WHERE source_path IS DISTINCT FROM :p"), {'p': keep})
+
+
+def merge_blocks(frames: list) -> tuple:
+    """
+    (studies, cond_df) of several transformed blocks (in file order) as one
+    delta, keep-first across blocks: a study repeated in a later block is dropped together with
+    that block's conditions, so each key keeps the conditions of its first
+    occurrence only (and never gets the same relationship twice).
+    """
+    studies, conditions, seen = [], [], set()
+    for block_studies, block_cond in frames:
+        first = block_studies[~block_studies['study_key'].isin(seen)]
+        seen.update(first['study_key'])
+        studies.append(first)
+        if not block_cond.empty:
+            conditions.append(block_cond[block_cond['study_key'].isin(first['study_key'])])
+    if not studies:
+        return pd.DataFrame(), pd.DataFrame()
+    cond_df = pd.concat(conditions, ignore_index=True).drop_duplicates() if conditions else pd.DataFrame()
+    return pd.concat(studies, ignore_index=True), cond_df
+
+
+def apply_incremental(conn, studies: pd.DataFrame, cond_df: pd.DataFrame, deleted=()):
+    """
+    Applies a delta to the live tables with row-level locks only (readers are
+    never blocked): deletes `deleted` keys, upserts `studies`, adds unknown
+    conditions and replaces the relationships of the upserted studies.
+    """
+    if deleted:
+        conn.execute(text("DELETE FROM studies WHERE study_key = ANY(:keys)"), {'keys': list(deleted)})
+    if studies.empty:
+        return
+
+    cols = list(studies.columns)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in cols if c != 'study_key')
+    conn.execute(text("CREATE TEMP TABLE studies_delta (LIKE studies INCLUDING DEFAULTS) ON COMMIT DROP"))
+    studies.to_sql('studies_delta', conn, if_exists='append', index=False)
+    conn.execute(text(f"""
+        INSERT INTO studies ({", ".join(cols)}) SELECT {", ".join(cols)} FROM studies_delta
+        ON CONFLICT (study_key) DO UPDATE SET {updates}
+    """))
+    conn.execute(text("DELETE FROM study_conditions WHERE study_key IN (SELECT study_key FROM studies_delta)"))
+
+    if cond_df.empty:
+        return
+    conn.execute(text("CREATE TEMP TABLE study_conditions_delta (study_key VARCHAR(16), condition_name TEXT) ON COMMIT DROP"))
+    cond_df[['study_key', 'condition_name']].to_sql('study_conditions_delta', conn, if_exists='append', index=False)
+    conn.execute(text("""
+        INSERT INTO conditions (condition_name)
+        SELECT DISTINCT condition_name FROM study_conditions_delta
+        ON CONFLICT (condition_name) DO NOTHING
+    """))
+    conn.execute(text("""
+        INSERT INTO study_conditions (study_key, condition_id)
+        SELECT DISTINCT d.study_key, c.id
+        FROM study_conditions_delta d
+        JOIN conditions c ON c.condition_name = d.condition_name
+        JOIN studies s    ON s.study_key = d.study_key
+        ON CONFLICT DO NOTHING
+    """))
+
+
+def save_source_state(conn, path: str, scan: dict, block_keys: dict):
+    """Stores the fingerprint and per-block digests (+ keys) after a successful load"""
+    conn.execute(text("""
+        INSERT INTO source_files (source_path, size, mtime_ns, fingerprint, header, loaded_at)
+        VALUES (:p, :size, :mtime, :fp, :header, CURRENT_TIMESTAMP)
+        ON CONFLICT (source_path) DO UPDATE SET
+            size = EXCLUDED.size, mtime_ns = EXCLUDED.mtime_ns, fingerprint = EXCLUDED.fingerprint,
+            header = EXCLUDED.header, loaded_at = EXCLUDED.loaded_at
+    """), {'p': path, 'size': scan['size'], 'mtime': scan['mtime_ns'], 'fp': scan['fingerprint'],
+           'header': scan['header'].decode('utf-8', errors='replace')})
+    conn.execute(text("DELETE FROM source_blocks WHERE source_path = :p AND block_no >= :n"),
+                 {'p': path, 'n': len(scan['blocks'])})
+    for n, keys in block_keys.items():
+        b = scan['blocks'][n]
+        conn.execute(text("""
+            INSERT INTO source_blocks (source_path, block_no, byte_offset, byte_length, digest, study_keys)
+            VALUES (:p, :n, :o, :l, :d, :k)
+            ON CONFLICT (source_path, block_no) DO UPDATE SET
+                byte_offset = EXCLUDED.byte_offset, byte_length = EXCLUDED.byte_length,
+                digest = EXCLUDED.digest, study_keys = EXCLUDED.study_keys
+        """), {'p': path, 'n': n, 'o': b['offset'], 'l': b['length'], 'd': b['digest'], 'k': keys})
+
+
+def load_data_incremental(engine, csv_path: str, reader: str = 'pandas', tokenizer=None):
+    """
+    Skips unchanged inputs and reprocesses only the changed blocks:
+    1. same size + mtime as the last successful load → no-op (no file read)
+    2. same content fingerprint → no-op (only the stored mtime is refreshed)
+    3. otherwise only blocks whose digest changed are parsed and transformed,
+       and applied as a delta (deleted keys, upserted studies, relationships).
+       Unchanged blocks are re-read only where a key's first occurrence moved
+       into them (plan_incremental).
+    The first load of a file (or a changed header) replaces the tables fully
+    and forgets the state of every other source.
+    """
+    if is_xml_source(csv_path):
+        raise ValueError("Incremental mode re-reads byte ranges of the CSV; use --mode resume for XML sources")
+    path = str(Path(csv_path).resolve())
+    st = os.stat(path)
+    with engine.begin() as conn:
+        ensure_ledger(conn)
+        stored_file = conn.execute(text("SELECT size, mtime_ns, fingerprint, header FROM source_files "
+                                        "WHERE source_path = :p"), {'p': path}).mappings().first()
+        if stored_file and (stored_file['size'], stored_file['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+            logging.info("Source unchanged (size + mtime) → nothing to do")
+            return
+
+    scan = scan_source(path, BLOCK_BYTES)
+    with engine.begin() as conn:
+        if stored_file and stored_file['fingerprint'] == scan['fingerprint']:
+            conn.execute(text("UPDATE source_files SET mtime_ns = :m WHERE source_path = :p"),
+                         {'m': scan['mtime_ns'], 'p': path})
+            logging.info("Source content unchanged (fingerprint) → nothing to do")
+            return
+        full = not stored_file or stored_file['header'] != scan['header'].decode('utf-8', errors='replace')
+        stored = [] if full else [dict(r) for r in conn.execute(text(
+            "SELECT block_no, digest, study_keys FROM source_blocks WHERE source_path = :p ORDER BY block_no"
+        ), {'p': path}).mappings()]
+
+    changed = list(range(len(scan['blocks']))) if full else changed_blocks(scan, stored)
+    logging.info(f"{len(changed)}/{len(scan['blocks'])} block(s) to (re)process"
+                 f"{' (full load)' if full else ''}")
+
+    frames, block_keys = {}, {}
+
+    def read_blocks(numbers):
+        for n in numbers:
+            b = scan['blocks'][n]
+            block = read_block(path, scan['header'], b['offset'], b['length'], reader)
+            frames[n] = transform(block, tokenizer)
+            block_keys[n] = frames[n][0]['study_key'].tolist()
+
+    read_blocks(changed)
+    upsert, extra, deleted = plan_incremental(stored, block_keys, len(scan['blocks']))
+    if extra:
+        logging.info(f"{len(extra)} unchanged block(s) re-read: first occurrences moved into them")
+        read_blocks(extra)
+    studies, cond_df = merge_blocks([frames[n] for n in sorted(frames)])
+    if not full:
+        studies = studies[studies['study_key'].isin(upsert)]
+        if not cond_df.empty:
+            cond_df = cond_df[cond_df['study_key'].isin(upsert)]
+
+    with engine.begin() as conn:
+        if full:
+            forget_source_state(conn, keep=path)
+            conn.execute(text("TRUNCATE TABLE study_conditions, conditions, studies RESTART IDENTITY CASCADE;"))
+            write_tables(conn, studies, cond_df)
+        else:
+            apply_incremental(conn, studies, cond_df, deleted)
+        save_source_state(conn, path, scan, block_keys)
+    logging.info(f"Applied: {len(studies):,} studies upserted, {len(deleted):,} deleted")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# RESUMABLE LOAD (PER-CHUNK COMMITS + LEDGER + QUARANTINE)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def ensure_ledger(conn):
+    conn.execute(text(LEDGER_SQL.read_text(encoding='utf-8')))
+
+
+def shadow_tables_exist(conn, suffix: str = SHADOW_SUFFIX) -> bool:
+    found = conn.execute(text(
+        "SELECT COUNT(*) FROM pg_tables WHERE schemaname = 'public' AND tablename = ANY(:names)"
+    ), {'names': [f"{t}{suffix}" for t in LOAD_TABLES]}).scalar()
+    return found == len(LOAD_TABLES)
+
+
+def start_or_resume_run(conn, path: str, fingerprint: str) -> tuple:
+    """
+    Returns (run_id, done_offsets). Continues the latest unpublished run for
+    this fingerprint if its shadow tables are still there, else starts a new one.
+    """
+    row = conn.execute(text("""
+        SELECT run_id FROM load_runs
+        WHERE source_fingerprint = :fp AND chunk_rows = :rows AND status <> 'published'
+        ORDER BY run_id DESC LIMIT 1
+    """), {'fp': fingerprint, 'rows': CHUNK_ROWS}).first()
+
+    if row and shadow_tables_exist(conn):
+        run_id = row[0]
+        done = set(conn.execute(text("SELECT chunk_offset FROM load_chunks WHERE run_id = :r"),
+                                {'r': run_id}).scalars())
+        conn.execute(text("UPDATE load_runs SET status = 'running' WHERE run_id = :r"), {'r': run_id})
+        logging.info(f"Resuming run {run_id}: {len(done)} chunk(s) already committed")
+        return run_id, done
+
+    run_id = conn.execute(text("""
+        INSERT INTO load_runs (source_path, source_fingerprint, chunk_rows)
+        VALUES (:p, :fp, :rows) RETURNING run_id
+    """), {'p': str(path), 'fp': fingerprint, 'rows': CHUNK_ROWS}).scalar()
+    # Staging = the shadow tables, with keys in place so chunks can be checked against each other
+    create_shadow_tables(conn)
+    finish_shadow_tables(conn, analyze=False)
+    logging.info(f"Started run {run_id}")
+    return run_id, set()
+
+
+def quarantine_rows(conn, run_id: int, offset: int, rows: pd.DataFrame, reason: str):
+    records = json.loads(rows.to_json(orient='records', date_format='iso'))
+    conn.execute(text("""
+        INSERT INTO load_quarantine (run_id, chunk_offset, study_key, reason, row_data)
+        VALUES (:run_id, :offset, :study_key, :reason, CAST(:row_data AS JSONB))
+    """), [
+        {'run_id': run_id, 'offset': offset, 'study_key': r.get('study_key'),
+         'reason': reason, 'row_data': json.dumps(r)}
+        for r in records
+    ])
+
+
+def insert_or_quarantine(conn, rows: pd.DataFrame, table: str, run_id: int, offset: int) -> pd.DataFrame:
+    """
+    Inserts `rows` under a savepoint. If the database rejects the batch, splits
+    it in halves until the offending rows are isolated, and quarantines them.
+    Returns the rows that were inserted.
+    """
+    if rows.empty:
+        return rows
+    savepoint = conn.begin_nested()
     try:
+        rows.to_sql(table, conn, if_exists='append', index=False)
+        savepoint.commit()
+        return rows
+    except DBAPIError as e:
+        savepoint.rollback()
+        if len(rows) == 1:
+            quarantine_rows(conn, run_id, offset, rows, str(e.orig).strip().splitlines()[0])
+            return rows.iloc[0:0]
+    mid = len(rows) // 2
+    return pd.concat([
+        insert_or_quarantine(conn, rows.iloc[:mid], table, run_id, offset),
+        insert_or_quarantine(conn, rows.iloc[mid:], table, run_id, offset),
+    ])
+
+
+def load_chunk(conn, run_id: int, offset: int, chunk: pd.DataFrame, suffix: str = SHADOW_SUFFIX,
+               tokenizer=None) -> tuple:
+    """Transforms and writes one CSV chunk plus its ledger row. Returns (loaded, quarantined)."""
+    studies, cond_df = transform(chunk, tokenizer)
+
+    # Keep-first deduplication across chunks: drop keys an earlier chunk already loaded
+    existing = set(conn.execute(text(f"SELECT study_key FROM studies{suffix} WHERE study_key = ANY(:keys)"),
+                                {'keys': studies['study_key'].tolist()}).scalars())
+    studies = studies[~studies['study_key'].isin(existing)]
+
+    loaded = insert_or_quarantine(conn, studies, f"studies{suffix}", run_id, offset)
+    quarantined = len(studies) - len(loaded)
+
+    if not cond_df.empty:
+        cond_df = cond_df[cond_df['study_key'].isin(loaded['study_key'])]
+        names = cond_df['condition_name'].drop_duplicates()
+        known = set(conn.execute(text(f"SELECT condition_name FROM conditions{suffix} WHERE condition_name = ANY(:n)"),
+                                 {'n': names.tolist()}).scalars())
+        names[~names.isin(known)].to_frame().to_sql(f"conditions{suffix}", conn, if_exists='append', index=False)
+        cond_map = pd.read_sql(
+            text(f"SELECT id, condition_name FROM conditions{suffix} WHERE condition_name = ANY(:n)"),
+            conn, params={'n': names.tolist()}
+        ).set_index('condition_name')['id']
+        relations = cond_df.assign(condition_id=cond_df['condition_name'].map(cond_map))
+        relations[['study_key', 'condition_id']].dropna().drop_duplicates().to_sql(
+            f"study_conditions{suffix}", conn, if_exists='append', index=False)
+
+    # This chunk's sketch commits (or not) together with its rows
+    save_load_sketch(conn, f"run-{run_id}", offset, 'resume', loaded, cond_df)
+
+    conn.execute(text("""
+        INSERT INTO load_chunks (run_id, chunk_offset, rows_read, rows_loaded, rows_quarantined)
+        VALUES (:r, :o, :read, :loaded, :q)
+    """), {'r': run_id, 'o': offset, 'read': len(chunk), 'loaded': len(loaded), 'q': quarantined})
+    return len(loaded), quarantined
+
+
+def load_data_resumable(engine, csv_path: str, reader: str = 'pandas', tokenizer=None):
+    """
+    Chunked load into the shadow tables with one commit per chunk, then publish
+    by swapping them in. A rerun on the same file skips the committed chunks.
+    """
+    fingerprint = source_fingerprint(csv_path)
+    with engine.begin() as conn:
+        ensure_ledger(conn)
+        run_id, done = start_or_resume_run(conn, csv_path, fingerprint)
+
+    total_loaded = total_quarantined = 0
+    try:
+        for number, chunk in enumerate(iter_source_frames(csv_path, CHUNK_ROWS, reader)):
+            offset = number * CHUNK_ROWS
+            if offset in done:
+                logging.info(f"Chunk @{offset:,}: already committed, skipping")
+                continue
+            with engine.begin() as conn:
+                loaded, quarantined = load_chunk(conn, run_id, offset, chunk, tokenizer=tokenizer)
+            total_loaded += loaded
+            total_quarantined += quarantined
+            logging.info(f"Chunk @{offset:,}: {loaded:,} rows loaded, {quarantined:,} quarantined")
+
+        # Publish
         with engine.begin() as conn:
-            # Clean (development only)
-            conn.execute(text("TRUNCATE TABLE study_conditions, conditions, studies RESTART IDENTITY CASCADE;"))
+            forget_source_state(conn)
+            for table in LOAD_TABLES:
+                conn.execute(text(f"ANALYZE {table}{SHADOW_SUFFIX}"))
+        swap_shadow_tables(engine)
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE load_runs SET status = 'published', finished_at = CURRENT_TIMESTAMP "
+                              "WHERE run_id = :r"), {'r': run_id})
+            sketches = load_script('sketches')
+            merged = sketches.merge_parts(conn, f"run-{run_id}")
+            sketches.save_sketch(conn, f"run-{run_id}", sketches.MERGED_PART, 'resume', merged)
+    except Exception:
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE load_runs SET status = 'failed' WHERE run_id = :r"), {'r': run_id})
+        logging.error(f"Run {run_id} failed; rerun to resume from the last committed chunk")
+        raise
+
+    if total_quarantined:
+        logging.warning(f"{total_quarantined:,} rows quarantined (see load_quarantine, run_id={run_id})")
+    logging.info(f"Run {run_id} published: {total_loaded:,} rows loaded in this attempt")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# SCHEMA V3 (SMALLINT DIMENSIONS)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def encode_dimension(values: pd.Series, dim: pd.DataFrame) -> pd.Series:
+    """
+    Text codes → dimension ids through pandas category codes (one hash lookup
+    per distinct value, not per row). `dim` has columns id, code.
+    Nulls and codes missing from `dim` become <NA>.
+    """
+    positions = pd.Categorical(values, categories=dim['code']).codes
+    ids = pd.Series(dim['id'].to_numpy(), dtype='Int16').reindex(positions)
+    return ids.set_axis(values.index)
+
+
+def ensure_v3_schema(conn):
+    """Creates schema v3 from 03-create.sql the first time it is used"""
+    if conn.execute(text(f"SELECT to_regclass('{V3_SCHEMA}.studies')")).scalar() is None:
+        logging.info(f"Creating schema {V3_SCHEMA} ({V3_CREATE_SQL.name})")
+        conn.exec_driver_sql(V3_CREATE_SQL.read_text(encoding='utf-8'))
+
+
+def encode_dimensions(conn, studies: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replaces each DIMENSIONS column with its <column>_id. Values not yet in an
+    open dimension are inserted first; unknown values of a closed dimension
+    (overall_status) raise before anything is written to studies.
+    """
+    studies = studies.copy()
+    for col, table in DIMENSIONS.items():
+        if col not in studies.columns:
+            continue
+        codes = studies[col].dropna().unique().tolist()
+        if col not in CLOSED_DIMENSIONS and codes:
+            conn.execute(text(f"""
+                INSERT INTO {V3_SCHEMA}.{table} (code) SELECT unnest(CAST(:codes AS TEXT[]))
+                ON CONFLICT (code) DO NOTHING
+            """), {'codes': sorted(codes)})
+        dim = pd.read_sql(f"SELECT id, code FROM {V3_SCHEMA}.{table} ORDER BY id", conn)
+        ids = encode_dimension(studies[col], dim)
+        unknown = studies[col].notna() & ids.isna()
+        if unknown.any():
+            raise ValueError(
+                f"{unknown.sum()} rows with {col} values missing from {V3_SCHEMA}.{table}: "
+                f"{sorted(studies.loc[unknown, col].unique())}"
+            )
+        studies[f"{col}_id"] = ids
+        studies = studies.drop(columns=col)
+    return studies
+
+
+def key_to_bigint(keys: pd.Series) -> pd.Series:
+    """16-hex-char study keys → the same 64 bits as signed BIGINT (lpad(to_hex(k), 16, '0') reverses it)"""
+    raw = bytes.fromhex(''.join(keys))
+    return pd.Series(np.frombuffer(raw, dtype='>i8').astype(np.int64), index=keys.index)
+
 
-            # Unique conditions
-            if not cond_df.empty:
-                unique_cond = cond_df[['condition_name']].drop_duplicates()
-                unique_cond.to_sql('conditions', conn, if_exists='append', index=False)
-                cond_map = pd.read_sql("SELECT id, condition_name FROM conditions", conn).set_index('condition_name')['id']
-                cond_df['condition_id'] = cond_df['condition_name'].map(cond_map)
+def normalize_org_names(names: pd.Series) -> pd.Series:
+    """Trims and collapses internal whitespace, once per distinct name"""
+    unique = pd.Series(names.dropna().unique())
+    cleaned = unique.str.strip().str.replace(r'\s+', ' ', regex=True)
+    return names.map(dict(zip(unique, cleaned)))
 
-                # Studies
-                studies.to_sql('studies', conn, if_exists='append', index=False)
 
-                # Relationships
-                relations = cond_df[['study_key', 'condition_id']].dropna()
-                if not relations.empty:
-                    relations.to_sql('study_conditions', conn, if_exists='append', index=False)
+def encode_organizations(conn, studies: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds v3.organizations from the distinct (org_name, org_class_id) pairs
+    (the table is empty: load_data_v3 truncates it) and replaces both columns
+    with org_id. IDs are assigned client-side, so no read-back is needed.
+    """
+    studies = studies.assign(org_name=normalize_org_names(studies['org_name']))
+    orgs = studies[['org_name', 'org_class_id']].drop_duplicates().reset_index(drop=True)
+    orgs.insert(0, 'id', range(1, len(orgs) + 1))
+    orgs.to_sql('organizations', conn, schema=V3_SCHEMA, if_exists='append', index=False)
+    conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{V3_SCHEMA}.organizations', 'id'), "
+                      f"{len(orgs) + 1}, false)"))
+    logging.info(f"Organizations: {len(orgs):,} distinct (name, class) pairs")
+
+    org_ids = orgs.rename(columns={'id': 'org_id'})
+    studies = studies.merge(org_ids, on=['org_name', 'org_class_id'], how='left')
+    return studies.drop(columns=['org_name', 'org_class_id'])
+
+
+def condition_id_arrays(study_keys: pd.Series, cond_df: pd.DataFrame) -> tuple:
+    """
+    Numbers the distinct condition names 1..n (pd.factorize, first appearance)
+    and returns (conditions [id, condition_name], relations [study_key,
+    condition_id], sorted condition_ids list per entry of `study_keys`, []
+    for studies without conditions).
+    """
+    if cond_df.empty:
+        return (pd.DataFrame(columns=['id', 'condition_name']),
+                pd.DataFrame(columns=['study_key', 'condition_id']),
+                pd.Series([[] for _ in range(len(study_keys))], index=study_keys.index))
+    codes, names = pd.factorize(cond_df['condition_name'])
+    conditions = pd.DataFrame({'id': range(1, len(names) + 1), 'condition_name': names})
+    relations = pd.DataFrame({'study_key': cond_df['study_key'].to_numpy(), 'condition_id': codes + 1}).drop_duplicates()
+    per_study = relations.groupby('study_key')['condition_id'].agg(lambda ids: sorted(ids.tolist()))
+    arrays = study_keys.map(per_study)
+    arrays = arrays.map(lambda ids: ids if isinstance(ids, list) else [])
+    return conditions, relations, arrays
+
+
+def load_data_v3(engine, studies: pd.DataFrame, cond_df: pd.DataFrame):
+    """
+    TRUNCATE + reload of schema v3 in one transaction. Condition IDs are
+    assigned client-side so each study's condition_ids array is filled from
+    cond_df before the studies are written (no UPDATE pass afterwards).
+    """
+    with engine.begin() as conn:
+        ensure_v3_schema(conn)
+        ensure_ledger(conn)
+        forget_source_state(conn)
+        conn.execute(text(f"TRUNCATE TABLE {V3_SCHEMA}.study_conditions, {V3_SCHEMA}.conditions, "
+                          f"{V3_SCHEMA}.studies, {V3_SCHEMA}.organizations RESTART IDENTITY CASCADE"))
+        studies = encode_organizations(conn, encode_dimensions(conn, studies))
+        conditions, relations, studies['condition_ids'] = condition_id_arrays(studies['study_key'], cond_df)
+        studies['study_key'] = key_to_bigint(studies['study_key'])
+        relations['study_key'] = key_to_bigint(relations['study_key'])
+
+        # FK-safe order: conditions → studies → relationships
+        conditions.to_sql('conditions', conn, schema=V3_SCHEMA, if_exists='append', index=False)
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{V3_SCHEMA}.conditions', 'id'), "
+                          f"{len(conditions) + 1}, false)"))
+        studies.to_sql('studies', conn, schema=V3_SCHEMA, if_exists='append', index=False)
+        relations.to_sql('study_conditions', conn, schema=V3_SCHEMA, if_exists='append', index=False)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def load_data(mode: str = 'truncate', schema: str = 'v2', csv_path: str = None, db_url: str = None,
+              profiler=None, reader: str = 'pandas', vocabulary: str = None):
+    """
+    mode='truncate': TRUNCATE + reload the live tables in one transaction (readers block)
+    mode='swap':     build <table>_new off to the side and swap it in (readers never wait)
+    mode='resume':   like swap, but committed chunk by chunk and resumable (see load_data_resumable)
+    mode='incremental': skip unchanged inputs, apply only changed blocks (see load_data_incremental)
+    schema='v3':     load the dimension-table layout of 03-create.sql instead (truncate only)
+    csv_path / db_url default to CSV_PATH / DB_URL.
+    reader='arrow':  parse the CSV with pyarrow.csv (multi-threaded, Arrow string columns)
+    vocabulary:      term list file, or 'db' for the conditions table: known condition names
+                     containing commas are kept whole (condition_tokenizer.py)
+    profiler: a profiling.Profiler; stages read / transform / write (+ swap, sketch)
+    """
+    stage = profiler.stage if profiler else _no_stage
+    csv_path = csv_path or CSV_PATH
+    db_url = db_url or DB_URL
+    logging.info(f"Starting data load (mode: {mode}, schema: {schema}, reader: {reader})...")
+    if schema == V3_SCHEMA and mode != 'truncate':
+        raise ValueError("Schema v3 is loaded with --mode truncate only")
+    if reader not in READERS:
+        raise ValueError(f"Unknown reader {reader!r}: expected one of {', '.join(READERS)}")
+    tokenizer = load_script('tokenizer').load_tokenizer(vocabulary, db_url) if vocabulary else None
+
+    if mode in ('resume', 'incremental'):
+        engine = create_engine(db_url)
+        lock_conn = acquire_load_lock(engine)
+        try:
+            with stage(mode):
+                if mode == 'resume':
+                    load_data_resumable(engine, csv_path, reader, tokenizer)
+                else:
+                    load_data_incremental(engine, csv_path, reader, tokenizer)
+        finally:
+            release_load_lock(lock_conn)
+        return
+
+    # 1. Read CSV (or ClinicalTrials.gov XML when csv_path ends in .xml)
+    try:
+        with stage('read'):
+            df = read_source(csv_path, reader)
+        logging.info(f"Source read → {len(df):,} rows")
+    except Exception as e:
+        logging.error(f"Error reading CSV: {e}")
+        return
+
+    # 2-5. Normalize, deduplicate, map statuses, extract conditions
+    with stage('transform'):
+        studies, cond_df = transform(df, tokenizer)
+
+    # 6. Load to PostgreSQL
+    load_id = f"{mode}-{pd.Timestamp.now():%Y%m%d%H%M%S%f}"
+    engine = create_engine(db_url)
+    lock_conn = acquire_load_lock(engine)
+    try:
+        if schema == V3_SCHEMA:
+            with stage('write'):
+                load_data_v3(engine, studies, cond_df)
+        elif mode == 'swap':
+            with stage('write'), engine.begin() as conn:
+                create_shadow_tables(conn)
+                write_tables(conn, studies, cond_df, suffix=SHADOW_SUFFIX)
+                finish_shadow_tables(conn)
+                # Forgotten before the swap: if the swap fails, the next incremental load is just a full one
+                ensure_ledger(conn)
+                forget_source_state(conn)
+            logging.info("Shadow tables built, swapping in...")
+            with stage('swap'):
+                swap_shadow_tables(engine)
+            with stage('sketch'), engine.begin() as conn:
+                ensure_ledger(conn)
+                save_load_sketch(conn, load_id, load_script('sketches').MERGED_PART, mode, studies, cond_df)
+        else:
+            with stage('write'), engine.begin() as conn:
+                # Clean (development only)
+                ensure_ledger(conn)
+                forget_source_state(conn)
+                conn.execute(text("TRUNCATE TABLE study_conditions, conditions, studies RESTART IDENTITY CASCADE;"))
+                write_tables(conn, studies, cond_df)
+                with stage('sketch'):
+                    save_load_sketch(conn, load_id, load_script('sketches').MERGED_PART, mode, studies, cond_df)
 
         logging.info("Load completed successfully ✓")
     except Exception as e:
         logging.error(f"Error in PostgreSQL: {e}")
         raise
+    finally:
+        release_load_lock(lock_conn)
 
 
 if __name__ == "__main__":
-    load_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load clinical trials CSV into PostgreSQL")
+    parser.add_argument('--mode', choices=['truncate', 'swap', 'resume', 'incremental'], default='truncate',
+                        help="truncate: reload in place (default); swap: blue/green reload via shadow tables; "
+                             "resume: chunked, resumable blue/green reload; "
+                             "incremental: skip unchanged files, reprocess only changed blocks")
+    parser.add_argument('--schema', choices=['v2', 'v3'], default='v2',
+                        help="v2: 02-create.sql (default); v3: 03-create.sql, SMALLINT dimension tables")
+    parser.add_argument('--source', default=CSV_PATH, help="CSV or XML file (default: CSV_PATH)")
+    parser.add_argument('--db-url', default=DB_URL)
+    parser.add_argument('--reader', choices=READERS, default='pandas',
+                        help="CSV parser: pandas read_csv (default) or arrow (pyarrow.csv, multi-threaded)")
+    parser.add_argument('--vocabulary', help="known condition names kept whole: term list file (one per line) "
+                                             "or 'db' for the conditions table")
+    parser.add_argument('--profile', choices=['full', 'sample'],
+                        help="per-stage profiles (profiling.py): full = cProfile + tracemalloc, sample = stacks only")
+    parser.add_argument('--profile-dir', default='profiles', help="parent of the run directories (default profiles)")
+    parser.add_argument('--profile-rate', type=float, default=1.0, help="fraction of runs profiled (default 1)")
+    args = parser.parse_args()
+    profiler = (load_script('profiling').maybe_profiler(args.profile, args.profile_dir, args.profile_rate, f"load-{args.mode}")
+                if args.profile else None)
+    with profiler or contextlib.nullcontext():
+        load_data(args.mode, args.schema, args.source, args.db_url, profiler, args.reader, args.vocabulary)
@@ -0,0 +1,178 @@
+-- =============================================================================
+-- 03-create.sql
+-- Database schema for clinical trials - Version 3 (schema "v3")
+-- Same data as v2 (02-create.sql), narrower storage
+-- =============================================================================
+
+-- Main design reasons:
+-- 1. overall_status, phase, study_type, org_class and primary_purpose repeat a
+--    handful of distinct values on every row. They move to small lookup tables
+--    (dim_*) referenced by SMALLINT keys: 2 bytes per row instead of a varlena
+--    string, narrower indexes, and GROUP BY on integers instead of collated text.
+-- 2. Allowed statuses are the rows of dim_status (FK) instead of a long IN-list
+--    CHECK: accepting a new status is an INSERT, not an ALTER of a 500k-row table.
+--    The loader adds unseen phases / study types / classes / purposes itself.
+-- 3. Fixed-width columns first, to avoid alignment padding in the heap tuple.
+-- 4. Views (v_studies, v_studies_with_conditions) expose the text values with
+--    the v2 column names, so existing queries work by pointing at the views.
+-- 5. ~28k organizations repeat across 500k studies: org_name / org_class live
+--    once in `organizations` (names whitespace-normalized by the loader) and
+--    studies reference them with a 4-byte org_id. Org rankings group by org_name
+--    (one name can have an org_id per org class).
+-- 6. study_key keeps the same 64 bits as v2 but is stored as BIGINT (8 bytes,
+--    integer comparisons) instead of VARCHAR(16) (17 bytes, collation-aware),
+--    in studies and in the ~1M-row study_conditions. The views show the v2 hex
+--    text: lpad(to_hex(study_key), 16, '0'). See database/bench_study_key.py.
+-- 7. studies.condition_ids (INTEGER[], GIN index) repeats study_conditions per
+--    study, filled by the loader from the same in-memory frame. "Studies with
+--    all / any of these conditions" is condition_ids @> / && ARRAY[...] on one
+--    table, and v_studies_with_conditions no longer aggregates over the join.
+--    study_conditions stays as the normalized source of truth (FKs, per-
+--    condition queries).
+--
+-- Lives in its own schema so it can be loaded next to v2:
+--   psql -U migx_user -d clinical_db -f database/03-create.sql
+--   python database/02-upload.py --schema v3
+-- =============================================================================
+
+CREATE SCHEMA IF NOT EXISTS v3;
+
+DROP VIEW  IF EXISTS v3.v_studies_with_conditions, v3.v_studies;
+DROP TABLE IF EXISTS v3.study_conditions, v3.conditions, v3.studies, v3.organizations CASCADE;
+DROP TABLE IF EXISTS v3.dim_status, v3.dim_phase, v3.dim_study_type,
+                     v3.dim_org_class, v3.dim_primary_purpose CASCADE;
+
+-- Dimension tables (code = the value stored as text in v2)
+CREATE TABLE v3.dim_status (
+    id      SMALLSERIAL PRIMARY KEY,
+    code    VARCHAR(50) NOT NULL UNIQUE
+);
+
+CREATE TABLE v3.dim_phase (
+    id      SMALLSERIAL PRIMARY KEY,
+    code    VARCHAR(50) NOT NULL UNIQUE
+);
+
+CREATE TABLE v3.dim_study_type (
+    id      SMALLSERIAL PRIMARY KEY,
+    code    VARCHAR(50) NOT NULL UNIQUE
+);
+
+CREATE TABLE v3.dim_org_class (
+    id      SMALLSERIAL PRIMARY KEY,
+    code    VARCHAR(50) NOT NULL UNIQUE
+);
+
+CREATE TABLE v3.dim_primary_purpose (
+    id      SMALLSERIAL PRIMARY KEY,
+    code    VARCHAR(50) NOT NULL UNIQUE
+);
+
+-- Closed list: same values the v2 CHECK constraint accepts
+INSERT INTO v3.dim_status (code) VALUES
+    ('RECRUITING'),
+    ('NOT_YET_RECRUITING'),
+    ('ACTIVE_NOT_RECRUITING'),
+    ('ENROLLING_BY_INVITATION'),
+    ('COMPLETED'),
+    ('SUSPENDED'),
+    ('TERMINATED'),
+    ('WITHDRAWN'),
+    ('UNKNOWN'),
+    ('APPROVED_FOR_MARKETING'),
+    ('WITHHELD'),
+    ('AVAILABLE'),
+    ('NO_LONGER_AVAILABLE'),
+    ('TEMPORARILY_NOT_AVAILABLE');
+
+-- One row per distinct (org_name, org_class) pair, built by the loader
+CREATE TABLE v3.organizations (
+    id              SERIAL PRIMARY KEY,
+    org_class_id    SMALLINT REFERENCES v3.dim_org_class(id),
+    org_name        TEXT NOT NULL,
+    CONSTRAINT uq_organizations UNIQUE NULLS NOT DISTINCT (org_name, org_class_id)
+);
+
+-- Main table: clinical studies
+CREATE TABLE v3.studies (
+    study_key           BIGINT PRIMARY KEY,             -- MD5 hash of unique fields (64 bits)
+    overall_status_id   SMALLINT NOT NULL REFERENCES v3.dim_status(id),
+    study_type_id       SMALLINT NOT NULL REFERENCES v3.dim_study_type(id),
+    phase_id            SMALLINT REFERENCES v3.dim_phase(id),
+    primary_purpose_id  SMALLINT REFERENCES v3.dim_primary_purpose(id),
+    org_id              INTEGER NOT NULL REFERENCES v3.organizations(id),
+    start_date          DATE,
+    enrollment          INTEGER,
+    created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    condition_ids       INTEGER[] NOT NULL DEFAULT '{}',    -- sorted ids, = study_conditions
+    brief_title         TEXT NOT NULL,
+    full_title          TEXT,
+    responsible_party   VARCHAR(100),
+    standard_age        TEXT
+);
+
+-- Table of unique conditions (normalization)
+CREATE TABLE v3.conditions (
+    id              SERIAL PRIMARY KEY,
+    condition_name  TEXT NOT NULL UNIQUE,
+    created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Many-to-many relationship table
+CREATE TABLE v3.study_conditions (
+    study_key       BIGINT REFERENCES v3.studies(study_key) ON DELETE CASCADE,
+    condition_id    INTEGER REFERENCES v3.conditions(id) ON DELETE CASCADE,
+    PRIMARY KEY (study_key, condition_id)
+);
+
+-- Indexes (same columns as v2, now 2-byte keys)
+CREATE INDEX idx_v3_studies_status      ON v3.studies(overall_status_id);
+CREATE INDEX idx_v3_studies_phase       ON v3.studies(phase_id);
+CREATE INDEX idx_v3_studies_study_type  ON v3.studies(study_type_id);
+CREATE INDEX idx_v3_studies_start_date  ON v3.studies(start_date);
+CREATE INDEX idx_v3_studies_org         ON v3.studies(org_id);
+CREATE INDEX idx_v3_studies_conditions  ON v3.studies USING GIN (condition_ids);
+
+-- Compatibility view: v2 column names and text values
+CREATE VIEW v3.v_studies AS
+SELECT
+    lpad(to_hex(s.study_key), 16, '0') AS study_key,
+    s.brief_title,
+    s.full_title,
+    o.org_name,
+    oc.code AS org_class,
+    s.responsible_party,
+    st.code AS overall_status,
+    ty.code AS study_type,
+    ph.code AS phase,
+    s.start_date,
+    s.standard_age,
+    pp.code AS primary_purpose,
+    s.enrollment,
+    s.created_at
+FROM v3.studies s
+JOIN v3.organizations o             ON o.id = s.org_id
+JOIN v3.dim_status st               ON st.id = s.overall_status_id
+JOIN v3.dim_study_type ty           ON ty.id = s.study_type_id
+LEFT JOIN v3.dim_phase ph           ON ph.id = s.phase_id
+LEFT JOIN v3.dim_org_class oc       ON oc.id = o.org_class_id
+LEFT JOIN v3.dim_primary_purpose pp ON pp.id = s.primary_purpose_id;
+
+-- Built on condition_ids: names are looked up per returned row through the
+-- conditions PK, with no join + GROUP BY over study_conditions
+CREATE VIEW v3.v_studies_with_conditions AS
+SELECT
+    lpad(to_hex(s.study_key), 16, '0') AS study_key,
+    s.brief_title,
+    st.code AS overall_status,
+    ph.code AS phase,
+    ty.code AS study_type,
+    s.start_date,
+    (SELECT string_agg(c.condition_name, ' | ')
+     FROM v3.conditions c
+     WHERE c.id = ANY(s.condition_ids)) AS conditions_list,
+    s.condition_ids
+FROM v3.studies s
+JOIN v3.dim_status st           ON st.id = s.overall_status_id
+JOIN v3.dim_study_type ty       ON ty.id = s.study_type_id
+LEFT JOIN v3.dim_phase ph       ON ph.id = s.phase_id;
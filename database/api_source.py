@@ -0,0 +1,298 @@
+# =============================================================================
+# api_source.py
+# API source: ClinicalTrials.gov API v2 (paginated JSON) → PostgreSQL
+#
+# Page tokens are sequential (the next token is at the end of each page), so a
+# single listing can't be prefetched. The listing is split into shards (one
+# per overall status) that paginate independently and concurrently over a
+# keep-alive connection pool, bounded by a semaphore.
+#
+# Each page is decoded incrementally with ijson while it arrives and only the
+# fields the loader needs are kept, already under the normalized column names.
+# Pages are handed to the loader's transform() in chunks while later pages are
+# still in flight, and upserted (same delta path as --mode incremental).
+# After each committed chunk the next page token of every shard is saved to a
+# state file, so a failed run resumes where it stopped. Replaying a page is
+# harmless: rows are upserted by study_key.
+#
+# Run:  python database/api_source.py --query cancer
+# =============================================================================
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+import ijson
+import pandas as pd
+from sqlalchemy import create_engine
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+
+upload = load_script('upload')
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+API_URL    = "https://clinicaltrials.gov/api/v2/studies"
+DB_URL     = upload.DB_URL
+STATE_PATH = "api_state.json"
+
+PAGE_SIZE   = 1000        # API maximum
+CONCURRENCY = 4           # requests in flight (and pooled keep-alive connections)
+QUEUE_PAGES = 16          # decoded pages waiting for the loader (backpressure)
+CHUNK_ROWS  = 50_000      # rows per transform + commit
+READ_BYTES  = 64 << 10
+RETRIES     = 5
+TIMEOUT_S   = 60
+
+# One shard per overall status: together they cover the whole listing once
+SHARD_STATUSES = sorted(upload.VALID_STATUSES | {'AVAILABLE'})
+
+# JSON path inside each study → normalized column (single-valued fields)
+FIELD_PATHS = {
+    'protocolSection.identificationModule.briefTitle':             'brief_title',
+    'protocolSection.identificationModule.officialTitle':          'full_title',
+    'protocolSection.identificationModule.organization.fullName':  'org_name',
+    'protocolSection.identificationModule.organization.class':     'org_class',
+    'protocolSection.sponsorCollaboratorsModule.responsibleParty.type': 'responsible_party',
+    'protocolSection.statusModule.overallStatus':                  'overall_status',
+    'protocolSection.statusModule.startDateStruct.date':           'start_date',
+    'protocolSection.designModule.studyType':                      'study_type',
+    'protocolSection.designModule.designInfo.primaryPurpose':      'primary_purpose',
+}
+
+# Arrays, joined the way the CSV stores them
+MULTI_PATHS = {
+    'protocolSection.designModule.phases':        ('phase', '|'),
+    'protocolSection.eligibilityModule.stdAges':  ('standard_age', ', '),
+    'protocolSection.conditionsModule.conditions': ('conditions', '|'),
+}
+
+COLUMNS = list(FIELD_PATHS.values()) + [col for col, _ in MULTI_PATHS.values()]
+
+# ijson prefixes of the same fields
+_FIELD_PREFIXES = {f"studies.item.{path}": col for path, col in FIELD_PATHS.items()}
+_MULTI_PREFIXES = {f"studies.item.{path}.item": spec for path, spec in MULTI_PATHS.items()}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+class PageDecoder:
+    """
+    Incremental decoder for one API page. feed() the body as it arrives;
+    close() returns (rows, next_page_token). Only the mapped fields of each
+    study are kept, so a page never exists as a full Python object.
+    """
+
+    def __init__(self):
+        self._events = ijson.sendable_list()
+        self._coro = ijson.parse_coro(self._events)
+        self._row = None
+        self.rows = []
+        self.next_token = None
+
+    def feed(self, data: bytes):
+        self._coro.send(data)
+        self._drain()
+
+    def close(self) -> tuple:
+        self._coro.close()
+        self._drain()
+        return self.rows, self.next_token
+
+    def _drain(self):
+        for prefix, event, value in self._events:
+            if prefix == 'studies.item':
+                if event == 'start_map':
+                    self._row = {}
+                elif event == 'end_map':
+                    self.rows.append(self._finish(self._row))
+                    self._row = None
+            elif self._row is not None:
+                if prefix in _FIELD_PREFIXES and event == 'string':
+                    self._row[_FIELD_PREFIXES[prefix]] = value
+                elif prefix in _MULTI_PREFIXES and event == 'string':
+                    self._row.setdefault(_MULTI_PREFIXES[prefix][0], []).append(value)
+            elif prefix == 'nextPageToken' and event == 'string':
+                self.next_token = value
+        del self._events[:]
+
+    @staticmethod
+    def _finish(row: dict) -> dict:
+        for col, sep in MULTI_PATHS.values():
+            if col in row:
+                row[col] = sep.join(row[col])
+        return row
+
+
+def load_state(state_path: str) -> dict:
+    """{shard: {'token': next page token or None, 'done': bool}} of an unfinished run"""
+    if not state_path or not os.path.exists(state_path):
+        return {}
+    with open(state_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state_path: str, state: dict):
+    """Atomic write (rename), so a crash never leaves a half-written state file"""
+    tmp = f"{state_path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, state_path)
+
+
+async def fetch_page(session, sem, url: str, params: dict) -> tuple:
+    """GET one page and decode it while it streams in; retries with backoff"""
+    for attempt in range(RETRIES):
+        try:
+            async with sem:
+                async with session.get(url, params=params) as resp:
+                    resp.raise_for_status()
+                    decoder = PageDecoder()
+                    async for data in resp.content.iter_chunked(READ_BYTES):
+                        decoder.feed(data)
+                    return decoder.close()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ijson.JSONError) as e:
+            if attempt == RETRIES - 1:
+                raise
+            delay = 0.5 * 2 ** attempt
+            logging.warning(f"Page request failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def fetch_shard(session, sem, queue, url: str, params: dict, shard: str, token):
+    """Paginates one shard from `token`, queueing (shard, next_token, rows) per page"""
+    while True:
+        page_params = dict(params, pageSize=PAGE_SIZE, format='json')
+        if token:
+            page_params['pageToken'] = token
+        rows, token = await fetch_page(session, sem, url, page_params)
+        await queue.put((shard, token, rows))
+        if not token:
+            return
+
+
+async def ingest(url: str, shards: dict, state: dict, handle_chunk, chunk_rows: int = CHUNK_ROWS) -> int:
+    """
+    Fetches every shard concurrently and calls handle_chunk(df, tokens) (in a
+    worker thread, so fetching continues meanwhile) for every `chunk_rows`
+    rows. `tokens` maps each shard in the chunk to its next page token (None
+    once finished). Shards marked done in `state` are skipped; the others
+    start from their saved token. Returns the number of rows handled.
+    """
+    queue = asyncio.Queue(maxsize=QUEUE_PAGES)
+    sem = asyncio.Semaphore(CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT_S)
+    total = 0
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        fetchers = [
+            asyncio.create_task(fetch_shard(session, sem, queue, url, params, shard,
+                                            state.get(shard, {}).get('token')))
+            for shard, params in shards.items() if not state.get(shard, {}).get('done')
+        ]
+
+        async def produce():
+            try:
+                await asyncio.gather(*fetchers)
+            finally:
+                await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        rows, tokens = [], {}
+        try:
+            while True:
+                item = await queue.get()
+                if item is not None:
+                    shard, token, page_rows = item
+                    rows.extend(page_rows)
+                    tokens[shard] = token
+                if rows and (item is None or len(rows) >= chunk_rows):
+                    df = pd.DataFrame(rows, columns=COLUMNS, dtype=str)
+                    await asyncio.to_thread(handle_chunk, df, tokens)
+                    total += len(rows)
+                    rows, tokens = [], {}
+                elif tokens and item is None:
+                    await asyncio.to_thread(handle_chunk, pd.DataFrame(columns=COLUMNS, dtype=str), tokens)
+                if item is None:
+                    break
+            await producer                  # re-raises a failed shard
+        finally:
+            for task in fetchers:
+                task.cancel()
+            producer.cancel()
+    return total
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def load_from_api(query: str = None, url: str = API_URL, db_url: str = DB_URL, state_path: str = STATE_PATH) -> int:
+    """
+    Upserts every study of the listing (optionally filtered by condition
+    `query`). Studies deleted upstream are not removed. Resumes from
+    `state_path` if a previous run failed; the file is removed on success.
+    """
+    logging.info("Starting API load...")
+    base = {'fields': ','.join(list(FIELD_PATHS) + list(MULTI_PATHS))}
+    if query:
+        base['query.cond'] = query
+    shards = {status: dict(base, **{'filter.overallStatus': status}) for status in SHARD_STATUSES}
+
+    state = load_state(state_path)
+    if state:
+        done = sum(1 for s in state.values() if s.get('done'))
+        logging.info(f"Resuming from {state_path}: {done}/{len(shards)} shard(s) already finished")
+
+    engine = create_engine(db_url)
+    lock_conn = upload.acquire_load_lock(engine)
+
+    def handle_chunk(df: pd.DataFrame, tokens: dict):
+        if not df.empty:
+            studies, cond_df = upload.transform(df)
+            with engine.begin() as conn:
+                upload.apply_incremental(conn, studies, cond_df)
+        # Tokens are saved only after the chunk is committed
+        for shard, token in tokens.items():
+            state[shard] = {'token': token, 'done': token is None}
+        save_state(state_path, state)
+        logging.info(f"Chunk committed: {len(df):,} rows")
+
+    start = time.perf_counter()
+    try:
+        total = asyncio.run(ingest(url, shards, state, handle_chunk))
+    except Exception as e:
+        logging.error(f"API load failed, rerun to resume from {state_path}: {e}")
+        raise
+    finally:
+        upload.release_load_lock(lock_conn)
+
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    logging.info(f"API load completed: {total:,} rows in {time.perf_counter() - start:.1f}s ✓")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load studies from the ClinicalTrials.gov API v2")
+    parser.add_argument('--query', help="condition filter (query.cond), e.g. cancer")
+    parser.add_argument('--url', default=API_URL, help="API endpoint (e.g. a local mock server)")
+    parser.add_argument('--state', default=STATE_PATH, help="resume state file")
+    args = parser.parse_args()
+    load_from_api(args.query, args.url, DB_URL, args.state)
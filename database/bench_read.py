@@ -0,0 +1,136 @@
+# =============================================================================
+# bench_read.py
+# Benchmark: CSV readers of 02-upload.py (--reader pandas | arrow)
+#
+# Generates synthetic CSVs (synthetic_data.py) and reads each one with every
+# reader in a fresh Python process, then runs transform() on the result. No
+# database is needed. Reported per size and reader:
+#   - parse seconds (read_source) and transform seconds
+#   - memory held by the DataFrame (memory_usage(deep=True)): Python str
+#     objects for pandas, Arrow buffers for arrow
+#   - peak RSS of the process (parse + transform)
+#   - parse speed-up and memory ratio of every reader against pandas
+#
+# Run:  python database/bench_read.py --sizes 100000 500000
+#       python database/bench_read.py --csv clin_trials.csv
+# =============================================================================
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+
+upload    = load_script('upload')
+synthetic = load_script('synthetic')
+bench     = load_script('bench')
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+SIZES   = [100_000, 500_000]
+READERS = list(upload.READERS)
+SEED    = 42
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run_one(csv_path: str, reader: str) -> dict:
+    """One read + transform in this process"""
+    rss_before = bench.peak_rss_mb()
+    start = time.perf_counter()
+    df = upload.read_source(csv_path, reader)
+    read_s = time.perf_counter() - start
+    frame_mb = df.memory_usage(deep=True).sum() / 2**20
+    start = time.perf_counter()
+    studies, cond_df = upload.transform(df)
+    return {
+        'rows': len(df),
+        'read_s': round(read_s, 3),
+        'frame_mb': round(frame_mb, 1),
+        'transform_s': round(time.perf_counter() - start, 3),
+        'studies': len(studies),
+        'conditions': len(cond_df),
+        'rss_before_mb': rss_before,
+        'peak_rss_mb': bench.peak_rss_mb(),
+    }
+
+
+def run_in_subprocess(csv_path: str, reader: str) -> dict:
+    """run_one() in a fresh interpreter, so ru_maxrss is this reader's peak only"""
+    result = subprocess.run([sys.executable, __file__, 'one', '--csv', csv_path, '--reader', reader],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{reader} read of {csv_path} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(runs: list) -> list:
+    """Adds each run's parse speed-up and memory ratio against the pandas run of the same file"""
+    baseline = {r['csv']: r for r in runs if r['reader'] == 'pandas'}
+    for r in runs:
+        base = baseline.get(r['csv'])
+        r['read_speedup'] = round(base['read_s'] / r['read_s'], 2) if base and r['read_s'] else None
+        r['frame_ratio'] = round(r['frame_mb'] / base['frame_mb'], 2) if base and base['frame_mb'] else None
+    return runs
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run_benchmark(sizes=SIZES, readers=READERS, csv_path: str = None, seed: int = SEED,
+                  out_path: str = None) -> list:
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        files = ([(None, csv_path)] if csv_path else
+                 [(size, synthetic.write_csv(str(Path(tmp) / f"studies_{size}.csv"), size, seed)) for size in sizes])
+        for size, path in files:
+            logging.info(f"{path} ({Path(path).stat().st_size / 2**20:.1f} MB)")
+            for reader in readers:
+                runs.append({'csv': Path(path).name, 'size': size, 'reader': reader,
+                             **run_in_subprocess(path, reader)})
+    compare(runs)
+
+    logging.info(f"{'rows':>9} {'reader':<7} {'read_s':>7} {'speedup':>7} {'frame_MB':>9} {'ratio':>6} "
+                 f"{'transform_s':>11} {'RSS_MB':>7}")
+    for r in runs:
+        logging.info(f"{r['rows']:>9} {r['reader']:<7} {r['read_s']:>7} {str(r['read_speedup']):>7} "
+                     f"{r['frame_mb']:>9} {str(r['frame_ratio']):>6} {r['transform_s']:>11} {str(r['peak_rss_mb']):>7}")
+    if out_path:
+        Path(out_path).write_text(json.dumps(runs, indent=2) + '\n', encoding='utf-8')
+        logging.info(f"Results written to {out_path}")
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse time and memory of the 02-upload.py CSV readers")
+    sub = parser.add_subparsers(dest='command')
+    one = sub.add_parser('one', help="one read + transform in this process, prints its metrics as JSON")
+    one.add_argument('--csv', required=True)
+    one.add_argument('--reader', choices=READERS, required=True)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="studies per generated CSV")
+    parser.add_argument('--readers', nargs='+', choices=READERS, default=READERS)
+    parser.add_argument('--csv', help="benchmark this CSV instead of generated ones")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--out', help="also write the results as JSON")
+    args = parser.parse_args()
+
+    if args.command == 'one':
+        logging.disable(logging.INFO)
+        print(json.dumps(run_one(args.csv, args.reader)))
+    else:
+        run_benchmark(args.sizes, args.readers, args.csv, args.seed, args.out)
@@ -0,0 +1,205 @@
+# =============================================================================
+# condition_tokenizer.py
+# Dictionary-driven condition tokenizer (02-upload.py --vocabulary)
+#
+# extract_conditions() splits the Conditions cell on every comma and pipe, so
+# MeSH-style names such as "Carcinoma, Non-Small-Cell Lung" end up as several
+# conditions. ConditionTokenizer compiles the known vocabulary (a term list or
+# the conditions table) into one Aho-Corasick automaton (pyahocorasick) and
+# matches the whole column in a single linear pass:
+#   - cells and terms are lowercased and every fragment is wrapped in START /
+#     END markers ("a, b" → "\x02a\x03,\x02b\x03"), so a term only matches
+#     whole fragments, never part of one
+#   - matches are leftmost-longest and non-overlapping (iter_long): with both
+#     "carcinoma" and "carcinoma, non-small-cell lung" known, the longer wins
+#   - text no term covers falls back to the separator split
+# Only terms that contain a separator are compiled: a single-fragment term is
+# exactly what the split produces anyway, so the automaton stays small and
+# most of the column still goes through the column-wise split.
+# The cells are joined into one string (CELL between them), so the automaton
+# runs once, in C, over the whole column instead of once per cell.
+#
+# Run:  python database/condition_tokenizer.py --source clin_trials.csv --vocabulary mesh_terms.txt
+#       python database/condition_tokenizer.py --source clin_trials.csv --vocabulary db   (conditions table)
+# 'db' only helps once a load with a term list file has stored names with
+# separators: the plain split never does, and then nothing is compiled.
+# =============================================================================
+
+import argparse
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+
+import ahocorasick
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import create_engine, text
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+START, END, CELL = '\x02', '\x03', '\x00'       # fragment start / end, cell boundary
+SEPARATORS   = r'\s*([,\|\x00])\s*'             # separators (and CELL) with the whitespace around them
+MIN_LENGTH   = 3                                # shorter names are dropped, as by the split
+DB_VOCABULARY = 'db'                            # --vocabulary db: the target database's conditions table
+MANY_CONDITIONS = 10                            # "Studies with >10 conditions" of the quality report
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def mark(values) -> str:
+    """
+    The strings of `values` (Series or list) as one string, CELL between them:
+    lowercased, the whitespace around separators removed and every fragment
+    wrapped in START / END. Joining first means each Arrow kernel (and the
+    RE2 regex) runs once over the whole column instead of once per cell.
+    """
+    values = pa.array(values, type=pa.string(), from_pandas=True)
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    offsets = pa.array([0, len(values)], type=pa.int32())
+    joined = pc.binary_join(pa.ListArray.from_arrays(offsets, values.fill_null('')), CELL)
+    joined = pc.utf8_lower(pc.utf8_trim_whitespace(joined))
+    marked = pc.replace_substring_regex(joined, SEPARATORS, END + r'\1' + START)
+    return START + marked[0].as_py() + END
+
+
+def read_terms(path: str) -> list:
+    """Term list file: one condition name per line, '#' comments and blank lines ignored"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def vocabulary_from_db(db_url: str) -> list:
+    engine = create_engine(db_url)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT condition_name FROM conditions")).scalars().all()
+    finally:
+        engine.dispose()
+
+
+class ConditionTokenizer:
+    """Aho-Corasick automaton over the multi-fragment terms of a vocabulary"""
+
+    def __init__(self, terms):
+        self.automaton = ahocorasick.Automaton()
+        names = {term.strip().lower() for term in terms}
+        names = sorted(n for n in names if len(n) >= MIN_LENGTH and re.search(r'[,\|]', n))
+        for name, key in zip(names, mark(names).split(CELL) if names else []):
+            self.automaton.add_word(key, (len(key), name))
+        if len(self.automaton):
+            self.automaton.make_automaton()
+
+    def __len__(self):
+        return len(self.automaton)
+
+    def tokenize(self, cells: pd.Series) -> tuple:
+        """
+        Finds the known terms of `cells` in one pass. Returns (rest, matches):
+        `rest` is `cells` with every matched term cut out (what is left goes to
+        the separator split) and `matches` a DataFrame [row, condition_name],
+        rows being positions in `cells`.
+        """
+        empty = pd.DataFrame({'row': pd.Series(dtype='int64'), 'condition_name': pd.Series(dtype=object)})
+        if not len(self.automaton) or cells.empty:
+            return cells, empty
+        column = mark(cells)
+
+        rows, names, pieces, row, position = [], [], [], 0, 0
+        for end, (length, name) in self.automaton.iter_long(column):
+            start = end - length + 1
+            row += column.count(CELL, position, start)
+            pieces += [column[position:start], '|']
+            position = end + 1
+            rows.append(row)
+            names.append(name)
+        if not rows:
+            return cells, empty
+        pieces.append(column[position:])
+
+        cut = ''.join(pieces).split(CELL)
+        matched = sorted(set(rows))
+        rest = cells.copy()
+        rest.iloc[matched] = [cut[i].replace(START, '').replace(END, '') for i in matched]
+        return rest, pd.DataFrame({'row': rows, 'condition_name': names})
+
+
+def load_tokenizer(vocabulary: str, db_url: str = None) -> ConditionTokenizer:
+    """ConditionTokenizer from a term list file, or from the conditions table with vocabulary='db'"""
+    start = time.perf_counter()
+    terms = vocabulary_from_db(db_url) if vocabulary == DB_VOCABULARY else read_terms(vocabulary)
+    tokenizer = ConditionTokenizer(terms)
+    logging.info(f"Condition vocabulary: {len(terms):,} terms, {len(tokenizer):,} with separators compiled "
+                 f"({time.perf_counter() - start:.2f}s)")
+    if not len(tokenizer):
+        # The split never stores a name with a separator, so only a load with a term list file fills the table with them
+        hint = (" The conditions table only holds such names after a load with a term list file "
+                "(--vocabulary FILE)." if vocabulary == DB_VOCABULARY else "")
+        logging.warning(f"Condition vocabulary {vocabulary!r} has no term with a comma or pipe: "
+                        f"conditions are split exactly as without --vocabulary.{hint}")
+    return tokenizer
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def compare_tokenizers(source: str, vocabulary: str, db_url: str = None, reader: str = 'pandas') -> dict:
+    """
+    extract_conditions() of one source with the separator split and with the
+    vocabulary: seconds, studies/s, condition rows and studies with more than
+    MANY_CONDITIONS conditions for each, and the most frequent terms matched.
+    """
+    upload = load_script('upload')
+    tokenizer = load_tokenizer(vocabulary, db_url or upload.DB_URL)
+    df = upload.read_source(source, reader)
+    df = upload.normalize_column_names(df)
+    df['study_key'] = pd.RangeIndex(len(df)).astype(str)
+
+    results = {}
+    for name, tok in (('split', None), ('vocabulary', tokenizer)):
+        start = time.perf_counter()
+        cond_df = upload.extract_conditions(df, tok)
+        seconds = time.perf_counter() - start
+        per_study = cond_df.groupby('study_key').size() if not cond_df.empty else pd.Series(dtype='int64')
+        results[name] = {
+            'seconds': round(seconds, 3),
+            'studies_per_s': round(len(df) / seconds) if seconds else None,
+            'condition_rows': len(cond_df),
+            'distinct_conditions': cond_df['condition_name'].nunique() if not cond_df.empty else 0,
+            f'studies_over_{MANY_CONDITIONS}': int((per_study > MANY_CONDITIONS).sum()),
+        }
+        logging.info(f"{name:<10} {seconds:>7.2f}s {results[name]['studies_per_s']:>10,} studies/s "
+                     f"{len(cond_df):>10,} rows  {results[name][f'studies_over_{MANY_CONDITIONS}']:>7,} "
+                     f"studies with >{MANY_CONDITIONS} conditions")
+
+    _, matches = tokenizer.tokenize(df['conditions'].reset_index(drop=True))
+    results['top_terms'] = matches['condition_name'].value_counts().head(10).to_dict()
+    for term, n in results['top_terms'].items():
+        logging.info(f"  {n:>8,}  {term}")
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)-7s | %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    parser = argparse.ArgumentParser(description="Separator split vs vocabulary tokenizer on one source file")
+    parser.add_argument('--source', required=True, help="CSV or XML file")
+    parser.add_argument('--vocabulary', required=True, help="term list file (one name per line) or 'db'")
+    parser.add_argument('--db-url', help="database of --vocabulary db (default: DB_URL of 02-upload.py)")
+    parser.add_argument('--reader', choices=['pandas', 'arrow'], default='pandas')
+    args = parser.parse_args()
+    compare_tokenizers(args.source, args.vocabulary, args.db_url, args.reader)
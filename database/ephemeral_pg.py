@@ -0,0 +1,205 @@
+# =============================================================================
+# ephemeral_pg.py
+# Throwaway PostgreSQL databases for benchmarks and plan checks
+#
+# EphemeralPostgres runs initdb in a temporary directory, starts the server on
+# a free local port (trust auth, unix socket in the same directory) and removes
+# everything on exit. It needs the PostgreSQL server binaries (initdb, pg_ctl):
+# taken from $PG_BIN, `pg_config --bindir` or the PATH. initdb refuses to run
+# as root; in containers that only have root, point the tools at an existing
+# server instead and use scratch_database(), which creates and drops a
+# temporary database on it.
+#
+# Both yield a SQLAlchemy URL with the 02-create.sql schema already applied.
+#
+# Run:  python database/ephemeral_pg.py          (starts a cluster, prints its URL, waits for Enter)
+# =============================================================================
+
+import argparse
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+DATABASE     = "clinical_db"
+SUPERUSER    = "postgres"
+SCHEMA_FILES = [Path(__file__).resolve().parent / "02-create.sql",
+                Path(__file__).resolve().parent / "02-ledger.sql"]
+
+# A throwaway cluster does not need to survive a crash; these are overridden
+# per run with `settings` (e.g. fsync=on to measure a durable load)
+DEFAULT_SETTINGS = {
+    'fsync': 'off',
+    'full_page_writes': 'off',
+    'synchronous_commit': 'off',
+    'shared_buffers': '128MB',
+    'max_wal_size': '1GB',
+}
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(levelname)-7s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def find_bin_dir(bin_dir: str = None) -> Path:
+    """Directory holding initdb/pg_ctl: argument, $PG_BIN, pg_config --bindir, then the PATH"""
+    candidates = [bin_dir, os.environ.get('PG_BIN')]
+    if shutil.which('pg_config'):
+        out = subprocess.run(['pg_config', '--bindir'], capture_output=True, text=True)
+        candidates.append(out.stdout.strip() if out.returncode == 0 else None)
+    if shutil.which('initdb'):
+        candidates.append(str(Path(shutil.which('initdb')).parent))
+    for candidate in candidates:
+        if candidate and (Path(candidate) / 'initdb').exists() and (Path(candidate) / 'pg_ctl').exists():
+            return Path(candidate)
+    raise RuntimeError("PostgreSQL server binaries not found: set PG_BIN to the directory with initdb and pg_ctl")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def apply_schema(db_url: str, files=SCHEMA_FILES):
+    """Runs the schema scripts (several statements per file) in one transaction"""
+    engine = create_engine(db_url)
+    with engine.begin() as conn:
+        for path in files:
+            conn.exec_driver_sql(Path(path).read_text(encoding='utf-8'))
+    engine.dispose()
+
+
+class EphemeralPostgres:
+    """
+    Local cluster living in a temporary directory for the duration of a `with`
+    block. `url` points at `database`, created empty with the schema applied.
+    """
+
+    def __init__(self, bin_dir: str = None, database: str = DATABASE, settings: dict = None,
+                 schema_files=SCHEMA_FILES):
+        self.bin_dir = find_bin_dir(bin_dir)
+        self.database = database
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.schema_files = schema_files
+        self.port = None
+        self.root = None
+
+    @property
+    def data_dir(self) -> Path:
+        return self.root / 'data'
+
+    @property
+    def url(self) -> str:
+        return f"postgresql://{SUPERUSER}@127.0.0.1:{self.port}/{self.database}"
+
+    @property
+    def admin_url(self) -> str:
+        """Maintenance database of the cluster, for scratch_database() or server-wide checks"""
+        return f"postgresql://{SUPERUSER}@127.0.0.1:{self.port}/postgres"
+
+    def _run(self, *args):
+        result = subprocess.run([str(self.bin_dir / args[0]), *args[1:]], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{args[0]} failed: {result.stderr.strip() or result.stdout.strip()}")
+        return result.stdout
+
+    def start(self):
+        if hasattr(os, 'geteuid') and os.geteuid() == 0:
+            raise RuntimeError("initdb cannot run as root: run as an unprivileged user, "
+                               "or use an existing server (scratch_database / --db-url)")
+        self.root = Path(tempfile.mkdtemp(prefix='migx-pg-'))
+        self.port = free_port()
+        try:
+            self._run('initdb', '-D', str(self.data_dir), '-U', SUPERUSER, '-A', 'trust',
+                      '-E', 'UTF8', '--no-locale', '--no-sync')
+            with open(self.data_dir / 'postgresql.conf', 'a') as f:
+                f.write(f"\nport = {self.port}\nlisten_addresses = '127.0.0.1'\n"
+                        f"unix_socket_directories = '{self.root}'\n")
+                for key, value in self.settings.items():
+                    f.write(f"{key} = '{value}'\n")
+            self._run('pg_ctl', '-D', str(self.data_dir), '-l', str(self.root / 'server.log'), '-w', 'start')
+            admin = create_engine(self.admin_url, isolation_level='AUTOCOMMIT')
+            with admin.connect() as conn:
+                conn.exec_driver_sql(f'CREATE DATABASE "{self.database}"')
+            admin.dispose()
+            apply_schema(self.url, self.schema_files)
+        except Exception:
+            self.stop()
+            raise
+        logging.info(f"Ephemeral PostgreSQL started on port {self.port} ({self.root})")
+        return self
+
+    def stop(self):
+        if self.root is None:
+            return
+        if (self.data_dir / 'postmaster.pid').exists():
+            subprocess.run([str(self.bin_dir / 'pg_ctl'), '-D', str(self.data_dir), '-m', 'immediate', '-w', 'stop'],
+                           capture_output=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextmanager
+def scratch_database(admin_url: str, schema_files=SCHEMA_FILES, prefix: str = 'migx_scratch'):
+    """
+    Temporary database on an existing server (the role in `admin_url` needs
+    CREATEDB). Yields its URL; the database is dropped on exit.
+    """
+    name = f"{prefix}_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(admin_url, isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        conn.exec_driver_sql(f"CREATE DATABASE \"{name}\" TEMPLATE template0 ENCODING 'UTF8'")
+    url = make_url(admin_url).set(database=name).render_as_string(hide_password=False)
+    try:
+        apply_schema(url, schema_files)
+        logging.info(f"Scratch database {name} created")
+        yield url
+    finally:
+        with admin.connect() as conn:
+            conn.exec_driver_sql(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        admin.dispose()
+
+
+@contextmanager
+def throwaway_database(db_url: str = None, bin_dir: str = None, settings: dict = None):
+    """Scratch database on `db_url`'s server when given, otherwise a fresh ephemeral cluster"""
+    if db_url:
+        with scratch_database(db_url) as url:
+            yield url
+    else:
+        with EphemeralPostgres(bin_dir, settings=settings) as pg:
+            yield pg.url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start a throwaway PostgreSQL with the clinical schema")
+    parser.add_argument('--pg-bin', help="directory with initdb/pg_ctl (default: $PG_BIN, pg_config, PATH)")
+    args = parser.parse_args()
+    with EphemeralPostgres(args.pg_bin) as pg:
+        print(pg.url)
+        input("Press Enter to stop and remove the cluster...")
@@ -0,0 +1,440 @@
+# =============================================================================
+# ingest_worker.py
+# Long-lived ingest worker: applies delta files dropped into an inbox directory
+#
+# Scheduled runs of 02-upload.py pay a cold start every time (imports, a new
+# engine, every lookup rebuilt). With many small delta files per day that
+# dominates, so this worker stays up and keeps everything warm:
+#
+# - the inbox is polled and a file is picked up once its size and mtime have
+#   not changed for DEBOUNCE_SECONDS (still being copied otherwise); hidden
+#   and *.part / *.tmp files are ignored
+# - one connection pool for the whole process (pre-ping, survives restarts)
+# - in-memory condition_name → id map and set of known study_keys: new studies
+#   are plain INSERTs with their condition ids resolved in memory, known ones
+#   go through the upsert of --mode incremental (apply_incremental). The caches
+#   are reloaded when a table is rewritten (truncate / swap load changes its
+#   filenode); if they are stale anyway (another writer), the INSERT fails, the
+#   file is re-applied with the upsert path and the caches are reloaded
+# - each file is one transaction under the loaders' advisory lock; applied
+#   files move to inbox/done, failed ones to inbox/failed (+ .error.txt);
+#   connection errors (database restart, network drop) are not failures of the
+#   file: it stays queued and is retried, like when the lock is busy
+# - GET /metrics (JSON): queue depth, lag of the oldest waiting file, lag from
+#   arrival to commit, files/studies applied and studies/s over recent files
+# - SIGINT / SIGTERM: the current file is finished, then the worker exits
+# - --key-index FILE: studies already loaded with the same content (key_index.py,
+#   on-disk key index + Bloom filter) are dropped before touching PostgreSQL,
+#   and the applied ones are recorded after the commit
+#
+# Delta files have the columns of the source CSV (or XML). They add or update
+# studies; studies missing from a delta are not deleted.
+#
+# Run:  python database/ingest_worker.py --inbox inbox --metrics-port 8081
+#       python database/ingest_worker.py --inbox inbox --once      (apply what is there and exit)
+# =============================================================================
+
+import argparse
+import json
+import logging
+import shutil
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+
+upload = load_script('upload')
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+DB_URL            = upload.DB_URL
+INBOX_DIR         = "inbox"
+DONE_DIR          = "done"          # inside the inbox
+FAILED_DIR        = "failed"
+SUFFIXES          = ('.csv', '.xml')
+IGNORED_SUFFIXES  = ('.part', '.tmp')
+
+POLL_SECONDS      = 1.0
+DEBOUNCE_SECONDS  = 2.0             # unchanged size + mtime for this long = complete
+LOCK_RETRY_SECONDS = 5.0            # another load holds the advisory lock
+DB_RETRY_SECONDS  = 10.0            # database unreachable (restart, network): files stay queued
+POOL_SIZE         = 2
+THROUGHPUT_WINDOW = 20              # files in the studies/s average
+
+HOST         = "127.0.0.1"
+METRICS_PORT = 8081
+
+FILENODES_SQL = """
+    SELECT pg_relation_filenode('studies'), pg_relation_filenode('conditions'),
+           pg_relation_filenode('study_conditions')
+"""
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+class DropDirectory:
+    """Files of the inbox that stopped changing (debounce on size + mtime)"""
+
+    def __init__(self, inbox: str, debounce: float = DEBOUNCE_SECONDS):
+        self.inbox = Path(inbox)
+        self.debounce = debounce
+        self.pending = {}       # path → ((size, mtime_ns), monotonic time it was last seen changing)
+        self.arrived = {}       # path → mtime (seconds since epoch) of the first sighting
+
+    def candidates(self) -> list:
+        return [p for p in self.inbox.iterdir()
+                if p.is_file() and not p.name.startswith('.')
+                and p.suffix.lower() in SUFFIXES and not p.name.lower().endswith(IGNORED_SUFFIXES)]
+
+    def scan(self, now: float = None) -> list:
+        """Paths ready to apply, oldest first; updates the pending set"""
+        now = time.monotonic() if now is None else now
+        ready, present = [], set()
+        for path in self.candidates():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            present.add(path)
+            signature = (st.st_size, st.st_mtime_ns)
+            seen = self.pending.get(path)
+            if seen is None or seen[0] != signature:
+                self.pending[path] = (signature, now)
+                self.arrived.setdefault(path, st.st_mtime)
+            elif now - seen[1] >= self.debounce:
+                ready.append(path)
+        for path in set(self.pending) - present:
+            self.forget(path)
+        return sorted(ready, key=lambda p: (self.arrived[p], p.name))
+
+    def forget(self, path: Path):
+        self.pending.pop(path, None)
+        self.arrived.pop(path, None)
+
+    def oldest_arrival(self):
+        return min(self.arrived.values()) if self.arrived else None
+
+
+class IngestMetrics:
+    """Counters read by the /metrics endpoint (thread-safe)"""
+
+    def __init__(self, window: int = THROUGHPUT_WINDOW):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.files_applied = 0
+        self.files_failed = 0
+        self.studies_applied = 0
+        self.studies_skipped = 0
+        self.queue_depth = 0
+        self.oldest_arrival = None
+        self.last_commit_lag_s = None
+        self.last_file = None
+        self.recent = deque(maxlen=window)     # (studies, seconds) of the last files
+        self.cache_sizes = {}
+
+    def queue(self, depth: int, oldest_arrival):
+        with self.lock:
+            self.queue_depth, self.oldest_arrival = depth, oldest_arrival
+
+    def applied(self, name: str, studies: int, seconds: float, arrival: float, skipped: int = 0):
+        with self.lock:
+            self.files_applied += 1
+            self.studies_applied += studies
+            self.studies_skipped += skipped
+            self.recent.append((studies, seconds))
+            self.last_file = name
+            self.last_commit_lag_s = round(time.time() - arrival, 3)
+
+    def failed(self, name: str):
+        with self.lock:
+            self.files_failed += 1
+            self.last_file = name
+
+    def snapshot(self, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        with self.lock:
+            busy = sum(s for _, s in self.recent)
+            return {
+                'uptime_s': round(now - self.started, 1),
+                'queue_depth': self.queue_depth,
+                'lag_s': round(now - self.oldest_arrival, 3) if self.oldest_arrival else 0.0,
+                'last_commit_lag_s': self.last_commit_lag_s,
+                'files_applied': self.files_applied,
+                'files_failed': self.files_failed,
+                'studies_applied': self.studies_applied,
+                'studies_skipped': self.studies_skipped,
+                'studies_per_s': round(sum(n for n, _ in self.recent) / busy, 1) if busy else None,
+                'last_file': self.last_file,
+                'cache': dict(self.cache_sizes),
+            }
+
+
+class WarmCaches:
+    """condition_name → id and the set of loaded study_keys, valid for one generation of the tables"""
+
+    def __init__(self):
+        self.condition_ids = {}
+        self.study_keys = set()
+        self.generation = None
+
+    def ensure_fresh(self, conn):
+        generation = tuple(conn.execute(text(FILENODES_SQL)).first())
+        if generation != self.generation:
+            self.reload(conn, generation)
+
+    def reload(self, conn, generation=None):
+        start = time.perf_counter()
+        self.condition_ids = dict(conn.execute(text("SELECT condition_name, id FROM conditions")).all())
+        self.study_keys = set(conn.execute(text("SELECT study_key FROM studies")).scalars())
+        self.generation = generation or tuple(conn.execute(text(FILENODES_SQL)).first())
+        logging.info(f"Caches loaded: {len(self.condition_ids):,} conditions, {len(self.study_keys):,} study keys "
+                     f"({time.perf_counter() - start:.2f}s)")
+
+    def invalidate(self):
+        self.generation = None
+
+    def sizes(self) -> dict:
+        return {'conditions': len(self.condition_ids), 'study_keys': len(self.study_keys)}
+
+
+def resolve_condition_ids(conn, caches: WarmCaches, names) -> dict:
+    """Ids of the names missing from the cache: inserted if new, looked up if another writer added them"""
+    missing = [n for n in names if n not in caches.condition_ids]
+    if not missing:
+        return {}
+    resolved = dict(conn.execute(text("""
+        INSERT INTO conditions (condition_name) SELECT unnest(CAST(:names AS text[]))
+        ON CONFLICT (condition_name) DO NOTHING
+        RETURNING condition_name, id
+    """), {'names': missing}).all())
+    others = [n for n in missing if n not in resolved]
+    if others:
+        resolved.update(conn.execute(text("SELECT condition_name, id FROM conditions WHERE condition_name = ANY(:n)"),
+                                     {'n': others}).all())
+    return resolved
+
+
+def apply_delta(conn, caches: WarmCaches, studies, cond_df) -> dict:
+    """
+    Applies one transformed file with the caches. Returns the new condition ids
+    (to add to the cache once the transaction commits) and the counts.
+    """
+    known = studies['study_key'].isin(caches.study_keys)
+    changed, new = studies[known], studies[~known]
+    has_conditions = not cond_df.empty
+
+    if not changed.empty:
+        changed_cond = cond_df[cond_df['study_key'].isin(changed['study_key'])] if has_conditions else cond_df
+        upload.apply_incremental(conn, changed, changed_cond)
+
+    resolved, links = {}, 0
+    if not new.empty:
+        new.to_sql('studies', conn, if_exists='append', index=False)
+        if has_conditions:
+            new_cond = cond_df[cond_df['study_key'].isin(new['study_key'])]
+            resolved = resolve_condition_ids(conn, caches, new_cond['condition_name'].unique())
+            ids = new_cond['condition_name'].map(caches.condition_ids)
+            ids = ids.fillna(new_cond['condition_name'].map(resolved)).astype('int64')
+            relations = new_cond.assign(condition_id=ids)[['study_key', 'condition_id']].drop_duplicates()
+            relations.to_sql('study_conditions', conn, if_exists='append', index=False)
+            links = len(relations)
+    return {'condition_ids': resolved, 'new': len(new), 'updated': len(changed), 'links': links}
+
+
+def is_connection_error(e: Exception) -> bool:
+    """Transient database errors (lost or refused connection): retry the file instead of failing it"""
+    return isinstance(e, DBAPIError) and (e.connection_invalidated or isinstance(e, OperationalError))
+
+
+def move_to(path: Path, folder: Path) -> Path:
+    folder.mkdir(exist_ok=True)
+    target = folder / path.name
+    if target.exists():
+        target = folder / f"{path.stem}.{time.strftime('%Y%m%d%H%M%S')}{path.suffix}"
+    shutil.move(str(path), str(target))
+    return target
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/health':
+            self.send_json(200, {'status': 'ok'})
+        elif self.path.split('?')[0] == '/metrics':
+            self.send_json(200, self.metrics.snapshot())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def send_json(self, code: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        logging.debug(f"{self.address_string()} {fmt % args}")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+class IngestWorker:
+    def __init__(self, inbox: str = INBOX_DIR, db_url: str = DB_URL, debounce: float = DEBOUNCE_SECONDS,
+                 poll: float = POLL_SECONDS, key_index: str = None):
+        self.inbox = Path(inbox)
+        self.inbox.mkdir(parents=True, exist_ok=True)
+        self.drop = DropDirectory(inbox, debounce)
+        self.poll = poll
+        self.engine = create_engine(db_url, pool_size=POOL_SIZE, pool_pre_ping=True)
+        self.caches = WarmCaches()
+        self.metrics = IngestMetrics()
+        self.stop_event = threading.Event()
+        self.retry_at = 0.0
+        self.key_index = load_script('keys').KeyIndex(key_index) if key_index else None
+
+    def apply_file(self, path: Path) -> bool:
+        """One file in one transaction; False when the load lock is busy (the file stays queued)"""
+        start = time.perf_counter()
+        studies, cond_df = upload.transform(upload.read_source(str(path)))
+        skipped = 0
+        if self.key_index is not None:
+            total = len(studies)
+            studies, cond_df, hashes, _ = load_script('keys').drop_loaded(self.key_index, studies, cond_df)
+            skipped = total - len(studies)
+            if studies.empty:
+                self.metrics.applied(path.name, 0, time.perf_counter() - start,
+                                     self.drop.arrived.get(path, time.time()), skipped)
+                logging.info(f"{path.name}: all {skipped:,} studies already loaded, nothing to apply")
+                return True
+        try:
+            lock_conn = upload.acquire_load_lock(self.engine)
+        except RuntimeError as e:
+            logging.info(f"{path.name}: {e}; retrying in {LOCK_RETRY_SECONDS:.0f}s")
+            return False
+        try:
+            try:
+                with self.engine.begin() as conn:
+                    self.caches.ensure_fresh(conn)
+                    result = apply_delta(conn, self.caches, studies, cond_df)
+                self.caches.condition_ids.update(result['condition_ids'])
+                self.caches.study_keys.update(studies['study_key'])
+            except IntegrityError as e:
+                logging.warning(f"{path.name}: caches out of date ({str(e.orig).strip().splitlines()[0]}); "
+                                f"applying with the upsert path")
+                with self.engine.begin() as conn:
+                    upload.apply_incremental(conn, studies, cond_df)
+                self.caches.invalidate()
+                result = {'new': None, 'updated': None, 'links': None}
+        finally:
+            upload.release_load_lock(lock_conn)
+        if self.key_index is not None:
+            self.key_index.record(studies['study_key'], hashes, str(path.resolve()))
+
+        seconds = time.perf_counter() - start
+        self.metrics.applied(path.name, len(studies), seconds, self.drop.arrived.get(path, time.time()), skipped)
+        self.metrics.cache_sizes = self.caches.sizes()
+        detail = (f"{result['new']:,} new, {result['updated']:,} updated, {result['links']:,} links of new studies"
+                  if result['new'] is not None else "upsert path")
+        detail += f", {skipped:,} already loaded" if skipped else ""
+        logging.info(f"{path.name}: {len(studies):,} studies ({detail}) in {seconds:.2f}s, "
+                     f"lag {self.metrics.last_commit_lag_s:.1f}s")
+        return True
+
+    def process_ready(self) -> int:
+        applied = 0
+        for path in self.drop.scan():
+            if self.stop_event.is_set() or time.monotonic() < self.retry_at:
+                break
+            try:
+                if not self.apply_file(path):
+                    self.retry_at = time.monotonic() + LOCK_RETRY_SECONDS
+                    break
+                move_to(path, self.inbox / DONE_DIR)
+                applied += 1
+            except Exception as e:
+                if is_connection_error(e):
+                    logging.warning(f"{path.name}: database unavailable ({e.__class__.__name__}); "
+                                    f"retrying in {DB_RETRY_SECONDS:.0f}s")
+                    self.retry_at = time.monotonic() + DB_RETRY_SECONDS
+                    break
+                logging.error(f"{path.name}: failed, moved to {FAILED_DIR}/ ({e.__class__.__name__}: {e})")
+                target = move_to(path, self.inbox / FAILED_DIR)
+                target.with_name(target.name + '.error.txt').write_text(f"{e.__class__.__name__}: {e}\n",
+                                                                        encoding='utf-8')
+                self.metrics.failed(path.name)
+            self.drop.forget(path)
+        self.metrics.queue(len(self.drop.pending), self.drop.oldest_arrival())
+        return applied
+
+    def stop(self, *_):
+        if not self.stop_event.is_set():
+            logging.info("Stop requested: finishing the current file")
+        self.stop_event.set()
+
+    def run(self, once: bool = False, metrics_port: int = None):
+        server = None
+        if metrics_port:
+            MetricsHandler.metrics = self.metrics
+            server = ThreadingHTTPServer((HOST, metrics_port), MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            logging.info(f"Metrics on http://{HOST}:{metrics_port}/metrics")
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+
+        if once:
+            # Nothing is still being copied in this mode: take every file as it is
+            self.drop.debounce = 0
+        logging.info(f"Watching {self.inbox.resolve()} (debounce {self.drop.debounce}s)")
+        try:
+            if once:
+                self.drop.scan()
+                self.process_ready()
+            while not once and not self.stop_event.is_set():
+                self.process_ready()
+                self.stop_event.wait(self.poll)
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+            self.engine.dispose()
+            if self.key_index is not None:
+                self.key_index.close()
+            logging.info(f"Ingest worker stopped: {json.dumps(self.metrics.snapshot())}")
+        return self.metrics.snapshot()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply delta files dropped into an inbox directory")
+    parser.add_argument('--inbox', default=INBOX_DIR)
+    parser.add_argument('--db-url', default=DB_URL)
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help="seconds a file must stay unchanged before it is applied")
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS)
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help="0 disables the metrics endpoint")
+    parser.add_argument('--once', action='store_true', help="apply the files already in the inbox and exit")
+    parser.add_argument('--key-index', help="key_index.py file: skip studies already loaded with the same content")
+    args = parser.parse_args()
+    IngestWorker(args.inbox, args.db_url, args.debounce, args.poll, args.key_index).run(args.once, args.metrics_port)
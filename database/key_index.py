@@ -0,0 +1,311 @@
+# =============================================================================
+# key_index.py
+# Persistent study_key index: every key ever loaded, with its content hash and
+# source file, for deduplication across files (and files larger than RAM)
+#
+# transform() only removes duplicates inside one DataFrame. This index keeps
+# the keys of everything loaded so far on disk, so each new file or chunk can
+# be checked against all of history without PostgreSQL and without holding
+# the keys in memory:
+#
+# - SQLite (standard library) with the file memory-mapped (PRAGMA mmap_size):
+#   a WITHOUT ROWID table keyed by study_key → content hash, source, seen_at
+# - a Bloom filter next to it (<index>.bloom, numpy memmap). study_key is
+#   already a 64-bit hash, so its two 32-bit halves give the k bit positions
+#   (double hashing) with no rehashing. Most new keys are rejected by the
+#   filter alone; only filter hits are looked up in SQLite (batched)
+# - bits are set before the SQLite commit, so a crash can only leave extra
+#   bits (false positives), never missing ones. The filter is rebuilt from
+#   SQLite if it is missing or outgrows its capacity
+#
+# A row is a duplicate when its key is in the index with the same content hash
+# (study_history.py hash: loaded columns + sorted conditions). A known key
+# with a different hash is a change and is kept.
+#
+# Run:  python database/key_index.py add clin_trials.csv drop_01.csv          (record files as loaded)
+#       python database/key_index.py dedupe drop_02.csv --out drop_02.new.csv (rows not loaded before)
+#       python database/key_index.py stats
+# =============================================================================
+
+import argparse
+import logging
+import math
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+
+history = load_script('history')
+upload  = history.upload
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+INDEX_PATH      = "study_keys.sqlite"
+CAPACITY        = 10_000_000        # keys the Bloom filter is sized for (rebuilt 2x larger beyond)
+FALSE_POSITIVE  = 0.01
+MMAP_BYTES      = 256 << 20
+LOOKUP_BATCH    = 900               # keys per IN (...) lookup (under SQLite's variable limit)
+CHUNK_ROWS      = 50_000            # source rows per chunk for add / dedupe
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS study_keys (
+        study_key    TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        source       TEXT NOT NULL,
+        seen_at      REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def bloom_size(capacity: int, false_positive: float = FALSE_POSITIVE) -> tuple:
+    """(bits, hash functions) for `capacity` keys at the given false positive rate"""
+    bits = math.ceil(-capacity * math.log(false_positive) / math.log(2) ** 2)
+    bits = (bits + 7) // 8 * 8
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+class BloomFilter:
+    """Bit array in a memory-mapped file; positions from the two halves of the 64-bit study_key"""
+
+    def __init__(self, path: str, bits: int, hashes: int, create: bool = False):
+        self.path, self.bits, self.hashes = Path(path), bits, hashes
+        if create or not self.path.exists():
+            np.zeros(bits // 8, dtype=np.uint8).tofile(self.path)
+        self.array = np.memmap(self.path, dtype=np.uint8, mode='r+', shape=(bits // 8,))
+
+    def positions(self, keys) -> np.ndarray:
+        """(n, k) bit positions of the hex keys"""
+        values = np.array([int(k, 16) for k in keys], dtype=np.uint64).reshape(-1, 1)
+        h1 = values & np.uint64(0xFFFFFFFF)
+        h2 = (values >> np.uint64(32)) | np.uint64(1)
+        return (h1 + np.arange(self.hashes, dtype=np.uint64) * h2) % np.uint64(self.bits)
+
+    def add(self, keys):
+        if len(keys):
+            pos = self.positions(keys).ravel()
+            np.bitwise_or.at(self.array, pos >> np.uint64(3), (1 << (pos & np.uint64(7))).astype(np.uint8))
+
+    def might_contain(self, keys) -> np.ndarray:
+        if not len(keys):
+            return np.zeros(0, dtype=bool)
+        pos = self.positions(keys)
+        return ((self.array[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+    def flush(self):
+        self.array.flush()
+
+    def close(self):
+        self.flush()
+        del self.array
+
+
+class KeyIndex:
+    """study_key → (content_hash, source) on disk, with a Bloom filter in front"""
+
+    def __init__(self, path: str = INDEX_PATH, capacity: int = CAPACITY):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA_SQL)
+        self.lookups = self.bloom_hits = 0
+        meta = dict(self.conn.execute("SELECT name, value FROM meta"))
+        # Number of keys, kept in meta with every record() (counted once for indexes that predate it)
+        if 'key_count' in meta:
+            self.count = int(meta['key_count'])
+        else:
+            self.count = self.conn.execute("SELECT COUNT(*) FROM study_keys").fetchone()[0]
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('key_count', ?)", (str(self.count),))
+        bloom_path = self.path.with_name(self.path.name + '.bloom')
+        if 'bloom_bits' in meta and bloom_path.exists():
+            self.bloom = BloomFilter(bloom_path, int(meta['bloom_bits']), int(meta['bloom_hashes']))
+            self.capacity = int(meta['bloom_capacity'])
+        else:
+            self.rebuild_bloom(max(capacity, 2 * self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.bloom.close()
+        self.conn.close()
+
+    def rebuild_bloom(self, capacity: int):
+        """New filter sized for `capacity` keys, filled by streaming the stored keys"""
+        start = time.perf_counter()
+        bits, hashes = bloom_size(capacity)
+        if getattr(self, 'bloom', None) is not None:
+            self.bloom.close()
+        self.bloom = BloomFilter(self.path.with_name(self.path.name + '.bloom'), bits, hashes, create=True)
+        cursor = self.conn.execute("SELECT study_key FROM study_keys")
+        while rows := cursor.fetchmany(100_000):
+            self.bloom.add([r[0] for r in rows])
+        self.bloom.flush()
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                  [('bloom_bits', str(bits)), ('bloom_hashes', str(hashes)),
+                                   ('bloom_capacity', str(capacity))])
+        self.capacity = capacity
+        logging.info(f"Bloom filter: {bits / 8 / 2**20:.1f} MB, {hashes} hashes, capacity {capacity:,} keys "
+                     f"({time.perf_counter() - start:.2f}s)")
+
+    def lookup(self, keys) -> dict:
+        """key → stored content hash, for the given keys that are in the index"""
+        keys = list(keys)
+        candidates = [k for k, hit in zip(keys, self.bloom.might_contain(keys)) if hit]
+        self.lookups += len(keys)
+        self.bloom_hits += len(candidates)
+        return self._stored(candidates)
+
+    def _stored(self, candidates: list) -> dict:
+        """key → content hash of the candidates found in SQLite (batched IN lookups)"""
+        found = {}
+        for i in range(0, len(candidates), LOOKUP_BATCH):
+            batch = candidates[i:i + LOOKUP_BATCH]
+            found.update(self.conn.execute(
+                f"SELECT study_key, content_hash FROM study_keys WHERE study_key IN ({','.join('?' * len(batch))})",
+                batch))
+        return found
+
+    def classify(self, keys, hashes) -> np.ndarray:
+        """Per row: 'new' (key never seen), 'changed' (other content hash) or 'duplicate'"""
+        stored = self.lookup(keys)
+        return np.array(['new' if k not in stored else 'duplicate' if stored[k] == h else 'changed'
+                         for k, h in zip(keys, hashes)], dtype=object)
+
+    def record(self, keys, hashes, source: str):
+        """Stores (or updates) keys with their content hash and source"""
+        keys, hashes = list(keys), list(hashes)
+        # New keys: the filter rejects most of them, only its hits are looked up
+        distinct = list(dict.fromkeys(keys))
+        hits = [k for k, hit in zip(distinct, self.bloom.might_contain(distinct)) if hit]
+        new = len(distinct) - len(self._stored(hits))
+        if self.count + new > self.capacity:
+            self.rebuild_bloom(2 * (self.count + new))
+        # Bits first: a crash before the commit only leaves false positives
+        self.bloom.add(keys)
+        self.bloom.flush()
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO study_keys (study_key, content_hash, source, seen_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (study_key) DO UPDATE SET
+                    content_hash = excluded.content_hash, source = excluded.source, seen_at = excluded.seen_at
+                WHERE content_hash <> excluded.content_hash
+            """, [(k, h, source, now) for k, h in zip(keys, hashes)])
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('key_count', ?)", (str(self.count + new),))
+        self.count += new
+
+    def stats(self) -> dict:
+        meta = dict(self.conn.execute("SELECT name, value FROM meta"))
+        return {
+            'keys': len(self),
+            'sources': self.conn.execute("SELECT COUNT(DISTINCT source) FROM study_keys").fetchone()[0],
+            'bloom_mb': round(int(meta['bloom_bits']) / 8 / 2**20, 1),
+            'bloom_hashes': int(meta['bloom_hashes']),
+            'bloom_capacity': int(meta['bloom_capacity']),
+            'index_mb': round(self.path.stat().st_size / 2**20, 1),
+        }
+
+
+def study_hashes(studies: pd.DataFrame, cond_df: pd.DataFrame) -> pd.Series:
+    """Content hash of each transformed study (same as study_versions.content_hash)"""
+    return history.content_hashes(studies, history.conditions_lists(studies, cond_df))
+
+
+def drop_loaded(index: KeyIndex, studies: pd.DataFrame, cond_df: pd.DataFrame) -> tuple:
+    """
+    Removes the studies already loaded with the same content. Returns
+    (studies, cond_df, hashes of the kept studies, counts per class).
+    """
+    hashes = study_hashes(studies, cond_df)
+    kinds = index.classify(studies['study_key'].tolist(), hashes.tolist())
+    keep = kinds != 'duplicate'
+    counts = {kind: int((kinds == kind).sum()) for kind in ('new', 'changed', 'duplicate')}
+    studies = studies[keep]
+    if not cond_df.empty:
+        cond_df = cond_df[cond_df['study_key'].isin(studies['study_key'])]
+    return studies, cond_df, hashes[keep], counts
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def process_file(index: KeyIndex, source: str, out_path: str = None, record: bool = True,
+                 chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Streams a source file chunk by chunk against the index: each chunk's rows
+    are classified, the new / changed ones are written to `out_path` (source
+    columns unchanged) and recorded, so later chunks see them as well.
+    """
+    start = time.perf_counter()
+    totals = {'rows': 0, 'new': 0, 'changed': 0, 'duplicate': 0}
+    written = False
+    name = str(Path(source).resolve())
+    for chunk in upload.iter_source_frames(source, chunk_rows):
+        studies, cond_df = upload.transform(chunk.copy())
+        kept, _, hashes, counts = drop_loaded(index, studies, cond_df)
+        totals['rows'] += len(chunk)
+        for kind, n in counts.items():
+            totals[kind] += n
+        if out_path:
+            # transform() keeps the source row labels: the first row of each kept study
+            chunk.loc[kept.index].to_csv(out_path, mode='a' if written else 'w', header=not written, index=False)
+            written = True
+        if record:
+            index.record(kept['study_key'], hashes, name)
+    totals['in_file_duplicates'] = totals['rows'] - totals['new'] - totals['changed'] - totals['duplicate']
+    totals['seconds'] = round(time.perf_counter() - start, 2)
+    logging.info(f"{Path(source).name}: {totals['rows']:,} rows → {totals['new']:,} new, {totals['changed']:,} changed, "
+                 f"{totals['duplicate']:,} already loaded, {totals['in_file_duplicates']:,} repeated in the file "
+                 f"({totals['seconds']}s)")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent study_key index for cross-file deduplication")
+    parser.add_argument('--index', default=INDEX_PATH, help=f"SQLite file (default {INDEX_PATH})")
+    sub = parser.add_subparsers(dest='command', required=True)
+    a = sub.add_parser('add', help="record the studies of these files as loaded")
+    a.add_argument('sources', nargs='+')
+    d = sub.add_parser('dedupe', help="write the rows of a file that are new or changed")
+    d.add_argument('source')
+    d.add_argument('--out', required=True)
+    d.add_argument('--no-record', action='store_true', help="only check, do not add the kept rows")
+    sub.add_parser('stats')
+    args = parser.parse_args()
+
+    with KeyIndex(args.index) as index:
+        if args.command == 'add':
+            for source in args.sources:
+                process_file(index, source)
+        elif args.command == 'dedupe':
+            process_file(index, args.source, args.out, record=not args.no_record)
+        else:
+            print(index.stats())
@@ -0,0 +1,153 @@
+# =============================================================================
+# loadtest_read_service.py
+# Load test for read_service.py against a local database
+#
+# Each worker thread keeps one keep-alive HTTP connection and walks a few
+# pages (keyset cursor) of "studies for condition X filtered by status/phase".
+# Reports p50 / p90 / p99 latency and requests/sec.
+#
+# Run:  python database/loadtest_read_service.py --concurrency 8 --duration 30
+# =============================================================================
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import random
+import threading
+import time
+from urllib.parse import quote, urlencode, urlparse
+
+# Logging configuration
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(levelname)-7s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+BASE_URL = "http://127.0.0.1:8080"
+
+# Frequent conditions / filters from analytics_report.md
+CONDITIONS = ['healthy', 'breast cancer', 'obesity', 'diabetes mellitus, type 2', 'asthma']
+STATUSES   = [None, 'COMPLETED', 'RECRUITING']
+PHASES     = [None, 'PHASE2', 'PHASE3']
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) over an already sorted list"""
+    if not sorted_values:
+        return float('nan')
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def build_path(condition, status, phase, after, limit) -> str:
+    params = {'limit': limit}
+    if status:
+        params['status'] = status
+    if phase:
+        params['phase'] = phase
+    if after:
+        params['after'] = after
+    prefix = f"/conditions/{quote(condition, safe='')}/studies" if condition else "/studies"
+    return f"{prefix}?{urlencode(params)}"
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    total = len(latencies)
+    return {
+        'requests':   total,
+        'errors':     errors,
+        'elapsed_s':  round(elapsed, 2),
+        'rps':        round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms':     round(percentile(latencies, 50) * 1000, 2),
+        'p90_ms':     round(percentile(latencies, 90) * 1000, 2),
+        'p99_ms':     round(percentile(latencies, 99) * 1000, 2),
+        'max_ms':     round(latencies[-1] * 1000, 2) if latencies else float('nan'),
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def worker(base_url: str, deadline: float, pages: int, limit: int, seed: int,
+           latencies: list, errors: list, lock: threading.Lock):
+    rnd = random.Random(seed)
+    url = urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    local_lat, local_err = [], 0
+
+    while time.perf_counter() < deadline:
+        condition = rnd.choice(CONDITIONS + [None])
+        status, phase = rnd.choice(STATUSES), rnd.choice(PHASES)
+        after = None
+        for _ in range(pages):
+            path = build_path(condition, status, phase, after, limit)
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                body = resp.read()
+                local_lat.append(time.perf_counter() - start)
+                if resp.status != 200:
+                    local_err += 1
+                    break
+                after = json.loads(body).get('next_after')
+            except (OSError, http.client.HTTPException):
+                local_err += 1
+                conn.close()
+                conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+                break
+            if not after:
+                break
+
+    conn.close()
+    with lock:
+        latencies.extend(local_lat)
+        errors.append(local_err)
+
+
+def run_load_test(base_url: str = BASE_URL, concurrency: int = 8, duration: float = 30.0,
+                  pages: int = 3, limit: int = 100) -> dict:
+    logging.info(f"Load test → {base_url} | {concurrency} workers | {duration:.0f}s | {pages} pages x {limit}")
+    latencies, errors, lock = [], [], threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(target=worker, args=(base_url, deadline, pages, limit, i, latencies, errors, lock))
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = summarize(latencies, sum(errors), time.perf_counter() - start)
+
+    logging.info(
+        f"{stats['requests']:,} requests | {stats['rps']} req/s | "
+        f"p50 {stats['p50_ms']} ms | p90 {stats['p90_ms']} ms | p99 {stats['p99_ms']} ms | "
+        f"max {stats['max_ms']} ms | errors {stats['errors']}"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for the read service")
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds")
+    parser.add_argument('--pages', type=int, default=3, help="pages followed per query")
+    parser.add_argument('--limit', type=int, default=100, help="page size")
+    args = parser.parse_args()
+    run_load_test(args.url, args.concurrency, args.duration, args.pages, args.limit)
@@ -0,0 +1,226 @@
+# =============================================================================
+# parquet_analytics.py
+# Embedded analytics backend: transformed tables → Parquet → DuckDB
+#
+# Runs the named queries of analytics/queries.sql without PostgreSQL. The
+# source (CSV or XML) goes through the loader's transform() and the three
+# tables (studies, conditions, study_conditions) are written as Parquet files;
+# DuckDB exposes them as views with the same names, so the SQL runs unchanged
+# on a vectorized, in-process engine (ad hoc exploration, CI).
+#
+# `compare` runs every query on both backends, checks the results match and
+# prints the timings side by side (PostgreSQL must be loaded from the same
+# source).
+#
+# Run:  python database/parquet_analytics.py export --source clin_trials.csv --out parquet
+#       python database/parquet_analytics.py run --parquet parquet --query 2
+#       python database/parquet_analytics.py compare --parquet parquet
+# =============================================================================
+
+import argparse
+import datetime
+import decimal
+import logging
+import math
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+
+upload  = load_script('upload')
+catalog = load_script('catalog')
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+DB_URL       = upload.DB_URL
+PARQUET_DIR  = "parquet"
+QUERIES_PATH = catalog.QUERIES_PATH
+COMPRESSION  = "zstd"
+REPEAT       = 5
+
+# Numeric results are compared with this tolerance: NUMERIC (PostgreSQL) and
+# DECIMAL/DOUBLE (DuckDB) come back as different Python types
+ABS_TOL = 1e-6
+
+# Parquet column types matching 02-create.sql (everything else stays string)
+STUDY_TYPES = {'start_date': pa.date32()}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def build_tables(studies: pd.DataFrame, cond_df: pd.DataFrame) -> dict:
+    """
+    Same three tables write_tables() produces: condition ids are numbered in
+    first-seen order, like the SERIAL ids of a fresh load.
+    """
+    if cond_df.empty:
+        cond_df = pd.DataFrame(columns=['study_key', 'condition_name'])
+    codes, names = pd.factorize(cond_df['condition_name'])
+    conditions = pd.DataFrame({'id': pd.array(range(1, len(names) + 1), dtype='int32'),
+                               'condition_name': names})
+    relations = pd.DataFrame({'study_key': cond_df['study_key'].to_numpy(),
+                              'condition_id': (codes + 1).astype('int32')})
+    return {
+        'studies': studies,
+        'conditions': conditions,
+        'study_conditions': relations.drop_duplicates(),
+    }
+
+
+def write_parquet(df: pd.DataFrame, path: Path, types: dict = None) -> int:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for col, typ in (types or {}).items():
+        if col in table.column_names:
+            idx = table.column_names.index(col)
+            table = table.set_column(idx, col, table.column(col).cast(typ))
+    pq.write_table(table, path, compression=COMPRESSION)
+    return path.stat().st_size
+
+
+def connect_duckdb(parquet_dir: str):
+    """In-memory DuckDB with one view per Parquet table, named like the PostgreSQL tables"""
+    con = duckdb.connect()
+    for table in upload.LOAD_TABLES:
+        path = Path(parquet_dir) / f"{table}.parquet"
+        con.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{path.as_posix()}')")
+    return con
+
+
+def normalize_value(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def results_match(left: list, right: list, abs_tol: float = ABS_TOL) -> bool:
+    """
+    Same rows regardless of order (several queries order by counts with ties,
+    and UNION ALL has no order); numbers compared with `abs_tol`.
+    """
+    if len(left) != len(right):
+        return False
+
+    def sort_key(row):
+        return tuple((v is None, str(round(v, 1)) if isinstance(v, float) else str(v)) for v in row)
+
+    for a, b in zip(sorted(left, key=sort_key), sorted(right, key=sort_key)):
+        if len(a) != len(b):
+            return False
+        for x, y in zip(a, b):
+            if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+                if not math.isclose(x, y, abs_tol=abs_tol):
+                    return False
+            elif x != y:
+                return False
+    return True
+
+
+def time_query(run, sql: str, repeat: int = REPEAT) -> tuple:
+    """(rows, median ms); the first run is a warm-up"""
+    rows = run(sql)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(sql)
+        timings.append((time.perf_counter() - start) * 1000)
+    return [tuple(normalize_value(v) for v in row) for row in rows], round(statistics.median(timings), 1)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def export_parquet(source_path: str, out_dir: str = PARQUET_DIR) -> dict:
+    """Reads + transforms the source and writes one Parquet file per table"""
+    start = time.perf_counter()
+    studies, cond_df = upload.transform(upload.read_source(source_path))
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    sizes = {}
+    for table, df in build_tables(studies, cond_df).items():
+        types = STUDY_TYPES if table == 'studies' else None
+        sizes[table] = write_parquet(df, out / f"{table}.parquet", types)
+        logging.info(f"{table}: {len(df):,} rows → {out / f'{table}.parquet'} ({sizes[table] / 2**20:.1f} MB)")
+    logging.info(f"Parquet export completed in {time.perf_counter() - start:.1f}s ✓")
+    return sizes
+
+
+def run_queries(parquet_dir: str = PARQUET_DIR, names=None, queries_path=QUERIES_PATH) -> dict:
+    """{name: DataFrame} of the named queries run on DuckDB over the Parquet files"""
+    con = connect_duckdb(parquet_dir)
+    results = {}
+    for query in catalog.load_queries(queries_path):
+        if names and query['name'] not in names:
+            continue
+        results[query['name']] = con.execute(query['sql']).df()
+    con.close()
+    return results
+
+
+def compare_backends(parquet_dir: str = PARQUET_DIR, db_url: str = DB_URL,
+                     queries_path=QUERIES_PATH, repeat: int = REPEAT) -> list:
+    """Runs every named query on PostgreSQL and DuckDB; returns parity + timings per query"""
+    con = connect_duckdb(parquet_dir)
+    engine = create_engine(db_url)
+    report = []
+    with engine.connect() as conn:
+        for query in catalog.load_queries(queries_path):
+            pg_rows, pg_ms = time_query(lambda sql: conn.exec_driver_sql(sql).fetchall(), query['sql'], repeat)
+            dk_rows, dk_ms = time_query(lambda sql: con.execute(sql).fetchall(), query['sql'], repeat)
+            report.append({'name': query['name'], 'title': query['title'], 'rows': len(pg_rows),
+                           'match': results_match(pg_rows, dk_rows), 'postgres_ms': pg_ms, 'duckdb_ms': dk_ms})
+    con.close()
+
+    logging.info(f"{'query':>6} {'rows':>6} {'match':>6} {'postgres_ms':>12} {'duckdb_ms':>10}  title")
+    for r in report:
+        logging.info(f"{r['name']:>6} {r['rows']:>6} {str(r['match']):>6} {r['postgres_ms']:>12} "
+                     f"{r['duckdb_ms']:>10}  {r['title']}")
+    mismatched = [r['name'] for r in report if not r['match']]
+    if mismatched:
+        logging.warning(f"Results differ for queries: {', '.join(mismatched)}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the analytics queries on Parquet with DuckDB")
+    sub = parser.add_subparsers(dest='command', required=True)
+    e = sub.add_parser('export', help="transform a CSV/XML source into Parquet tables")
+    e.add_argument('--source', default=upload.CSV_PATH)
+    e.add_argument('--out', default=PARQUET_DIR)
+    r = sub.add_parser('run', help="run named queries on DuckDB and print the results")
+    r.add_argument('--parquet', default=PARQUET_DIR)
+    r.add_argument('--query', action='append', help="query name (default: all)")
+    r.add_argument('--queries', default=str(QUERIES_PATH))
+    c = sub.add_parser('compare', help="parity and timings against PostgreSQL")
+    c.add_argument('--parquet', default=PARQUET_DIR)
+    c.add_argument('--queries', default=str(QUERIES_PATH))
+    c.add_argument('--db-url', default=DB_URL)
+    c.add_argument('--repeat', type=int, default=REPEAT)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_parquet(args.source, args.out)
+    elif args.command == 'run':
+        for name, df in run_queries(args.parquet, args.query, args.queries).items():
+            print(f"\n-- {name}\n{df.to_string(index=False)}")
+    else:
+        compare_backends(args.parquet, args.db_url, args.queries, args.repeat)
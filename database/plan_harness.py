@@ -0,0 +1,333 @@
+# =============================================================================
+# plan_harness.py
+# Query-plan regression harness for analytics/queries.sql
+#
+# Loads a synthetic dataset of configurable size (synthetic_data.py, through
+# the loader's transform() + write_tables()) into a throwaway PostgreSQL
+# (ephemeral_pg.py) and runs EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) for each
+# named query. Timings, buffer counts and plan shapes (node types, relations
+# and indexes, no costs) are compared with a stored baseline:
+#
+#   PLAN CHANGED   the shape differs from the baseline (only compared when the
+#                  server has the same major version as the baseline's: the
+#                  planner changes between majors)
+#   SLOWER         median execution time above SLOWER_RATIO x baseline
+#                  (and at least SLOWER_MIN_MS more)
+#   MORE BUFFERS   shared buffers touched above BUFFERS_RATIO x baseline
+#
+# The index advisor looks at the join keys of every plan: a column used in a
+# Hash/Merge join condition on a sequentially scanned table that is not the
+# leading column of any index is reported, with the CREATE INDEX to add
+# (--try-indexes builds each one in the throwaway database and re-runs the
+# affected queries). Exit code 1 when a regression is flagged.
+#
+# Run:  python database/plan_harness.py --rows 100000
+#       python database/plan_harness.py --rows 100000 --update-baseline
+#       python database/plan_harness.py --db-url postgresql://user:pw@localhost:5434/postgres --try-indexes
+# =============================================================================
+
+import argparse
+import json
+import logging
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+
+upload    = load_script('upload')
+catalog   = load_script('catalog')
+synthetic = load_script('synthetic')
+ephemeral = load_script('ephemeral')
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+ROWS          = 100_000
+SEED          = 42
+REPEAT        = 3
+QUERIES_PATH  = catalog.QUERIES_PATH
+BASELINE_PATH = Path(__file__).resolve().parents[1] / "analytics" / "plan_baseline.json"
+
+SLOWER_RATIO  = 1.5
+SLOWER_MIN_MS = 5.0
+BUFFERS_RATIO = 1.5
+
+EXPLAIN = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+
+# Plan keys holding join conditions; "alias.column" references inside them
+JOIN_CONDITIONS = ('Hash Cond', 'Merge Cond')
+COLUMN_RE = re.compile(r'\b([a-z_][a-z0-9_]*)\.([a-z_][a-z0-9_]*)\b')
+
+INDEXES_SQL = """
+    SELECT t.relname AS table_name, i.relname AS index_name, x.indisprimary AS is_primary,
+           array_agg(a.attname ORDER BY k.ord) AS columns
+    FROM pg_index x
+    JOIN pg_class t ON t.oid = x.indrelid
+    JOIN pg_class i ON i.oid = x.indexrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+    WHERE n.nspname = 'public'
+    GROUP BY t.relname, i.relname, x.indisprimary
+"""
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def iter_nodes(node: dict):
+    yield node
+    for child in node.get('Plans', []):
+        yield from iter_nodes(child)
+
+
+def node_label(node: dict) -> str:
+    """'Hash Join[Left]', 'Hashed Aggregate', 'Seq Scan on studies', 'Index Scan using idx on t', ..."""
+    label = node['Node Type']
+    if label == 'Aggregate' and node.get('Strategy'):
+        label = f"{node['Strategy']} Aggregate"
+    if node.get('Join Type'):
+        label += f"[{node['Join Type']}]"
+    if node.get('Index Name'):
+        label += f" using {node['Index Name']}"
+    if node.get('Relation Name'):
+        label += f" on {node['Relation Name']}"
+    return label
+
+
+def plan_shape(node: dict) -> str:
+    """Plan tree without costs, rows or worker counts: stable across runs of the same plan"""
+    children = [plan_shape(child) for child in node.get('Plans', [])]
+    return node_label(node) + (f"({', '.join(children)})" if children else '')
+
+
+def join_columns(plan: dict) -> set:
+    """{(table, column)} used as join keys on tables read with a sequential scan"""
+    nodes = list(iter_nodes(plan))
+    aliases = {n['Alias']: n['Relation Name'] for n in nodes if 'Relation Name' in n and 'Alias' in n}
+    seq_scanned = {n['Relation Name'] for n in nodes if n['Node Type'] == 'Seq Scan'}
+    used = set()
+    for n in nodes:
+        for key in JOIN_CONDITIONS:
+            for alias, column in COLUMN_RE.findall(n.get(key, '')):
+                table = aliases.get(alias)
+                if table in seq_scanned:
+                    used.add((table, column))
+    return used
+
+
+def suggest_indexes(plans: dict, indexes: dict) -> list:
+    """
+    `plans`: {query name: plan}; `indexes`: {table: [{'name', 'columns', 'primary'}]}.
+    A join key that leads no index gets one; when it is part of a composite
+    primary key, the suggestion is that key reordered so the index also covers
+    the other side of the relationship (study_conditions: condition_id, study_key).
+    """
+    wanted = {}
+    for name, plan in plans.items():
+        for table, column in sorted(join_columns(plan)):
+            table_indexes = indexes.get(table, [])
+            if any(ix['columns'][0] == column for ix in table_indexes):
+                continue
+            primary = next((ix['columns'] for ix in table_indexes if ix['primary']), [])
+            columns = [column] + [c for c in primary if c != column] if column in primary else [column]
+            wanted.setdefault((table, tuple(columns)), []).append(name)
+    return [{
+        'table': table,
+        'columns': list(columns),
+        'queries': queries,
+        'sql': f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})",
+    } for (table, columns), queries in sorted(wanted.items())]
+
+
+def explain(conn, sql: str) -> dict:
+    return conn.exec_driver_sql(EXPLAIN + sql).scalar()[0]
+
+
+def measure(conn, sql: str, repeat: int = REPEAT) -> dict:
+    """Median execution/planning time over `repeat` runs (after a warm-up); shape + buffers of the last"""
+    explain(conn, sql)
+    runs = [explain(conn, sql) for _ in range(repeat)]
+    last = runs[-1]['Plan']
+    return {
+        'shape': plan_shape(last),
+        'execution_ms': round(statistics.median(r['Execution Time'] for r in runs), 2),
+        'planning_ms': round(statistics.median(r['Planning Time'] for r in runs), 2),
+        'buffers': last.get('Shared Hit Blocks', 0) + last.get('Shared Read Blocks', 0),
+        'temp_blocks': last.get('Temp Read Blocks', 0) + last.get('Temp Written Blocks', 0),
+        'rows': last.get('Actual Rows', 0),
+        'plan': last,
+    }
+
+
+def server_major(version: str) -> str:
+    """'16.2' → '16', '15.4 (Debian 15.4-1)' → '15', '9.6.24' → '9.6' (two-part majors before 10)"""
+    match = re.match(r'(\d+)(?:\.(\d+))?', version or '')
+    if not match:
+        return None
+    major, minor = match.groups()
+    return major if int(major) >= 10 or minor is None else f"{major}.{minor}"
+
+
+def compare_to_baseline(results: dict, baseline: dict, slower_ratio: float = SLOWER_RATIO,
+                        slower_min_ms: float = SLOWER_MIN_MS, buffers_ratio: float = BUFFERS_RATIO,
+                        server_version: str = None) -> dict:
+    """
+    {query name: [flag, ...]} for every query with a regression against the
+    baseline. Shapes are not compared when `server_version` is of another
+    major version than the baseline's.
+    """
+    same_major = (server_version is None or baseline.get('server_version') is None
+                  or server_major(server_version) == server_major(baseline['server_version']))
+    flags = {}
+    for name, current in results.items():
+        before = baseline.get('queries', {}).get(name)
+        if before is None:
+            continue
+        found = []
+        if same_major and current['shape'] != before['shape']:
+            found.append('PLAN CHANGED')
+        if (current['execution_ms'] > before['execution_ms'] * slower_ratio
+                and current['execution_ms'] - before['execution_ms'] >= slower_min_ms):
+            found.append('SLOWER')
+        if current['buffers'] > before['buffers'] * buffers_ratio:
+            found.append('MORE BUFFERS')
+        if found:
+            flags[name] = found
+    return flags
+
+
+def load_synthetic(db_url: str, rows: int, seed: int = SEED):
+    """Generates `rows` studies and loads them with the loader's own transform + write path"""
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = synthetic.write_csv(str(Path(tmp) / 'synthetic.csv'), rows, seed)
+        studies, cond_df = upload.transform(upload.read_source(csv_path))
+    engine = create_engine(db_url)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE TABLE study_conditions, conditions, studies RESTART IDENTITY CASCADE"))
+        upload.write_tables(conn, studies, cond_df)
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql("VACUUM ANALYZE")
+    engine.dispose()
+    logging.info(f"Synthetic dataset loaded: {len(studies):,} studies, {len(cond_df):,} condition links "
+                 f"({time.perf_counter() - start:.1f}s)")
+
+
+def current_indexes(conn) -> dict:
+    indexes = {}
+    for row in conn.execute(text(INDEXES_SQL)).mappings():
+        indexes.setdefault(row['table_name'], []).append(
+            {'name': row['index_name'], 'columns': list(row['columns']), 'primary': row['is_primary']})
+    return indexes
+
+
+def try_indexes(conn, suggestions: list, queries: list, results: dict, repeat: int = REPEAT) -> list:
+    """Builds each suggested index, re-measures the queries it was suggested for, drops it again"""
+    by_name = {q['name']: q for q in queries}
+    report = []
+    for suggestion in suggestions:
+        index_name = suggestion['sql'].split()[2]
+        conn.exec_driver_sql(suggestion['sql'])
+        conn.exec_driver_sql(f"ANALYZE {suggestion['table']}")
+        for name in suggestion['queries']:
+            after = measure(conn, by_name[name]['sql'], repeat)
+            report.append({'index': index_name, 'query': name,
+                           'before_ms': results[name]['execution_ms'], 'after_ms': after['execution_ms'],
+                           'used': index_name in after['shape']})
+        conn.exec_driver_sql(f"DROP INDEX {index_name}")
+        conn.exec_driver_sql(f"ANALYZE {suggestion['table']}")
+    return report
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run_harness(rows: int = ROWS, db_url: str = None, baseline_path=BASELINE_PATH, update_baseline: bool = False,
+                with_index_trial: bool = False, queries_path=QUERIES_PATH, repeat: int = REPEAT,
+                seed: int = SEED) -> dict:
+    """
+    Loads the dataset into a throwaway database (`db_url`: scratch database on
+    that server, default: ephemeral cluster), measures every named query and
+    compares with the baseline. Returns results, flags and index suggestions.
+    """
+    queries = catalog.load_queries(queries_path)
+    with ephemeral.throwaway_database(db_url) as url:
+        load_synthetic(url, rows, seed)
+        engine = create_engine(url)
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            server_version = conn.exec_driver_sql("SHOW server_version").scalar()
+            results = {q['name']: measure(conn, q['sql'], repeat) for q in queries}
+            suggestions = suggest_indexes({name: r['plan'] for name, r in results.items()}, current_indexes(conn))
+            trials = try_indexes(conn, suggestions, queries, results, repeat) if with_index_trial else []
+        engine.dispose()
+
+    baseline_path = Path(baseline_path)
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8')) if baseline_path.exists() else {}
+    if baseline and (baseline.get('rows'), baseline.get('seed')) != (rows, seed):
+        logging.warning(f"Baseline was recorded with rows={baseline.get('rows')} seed={baseline.get('seed')}; "
+                        f"this run used rows={rows} seed={seed}: timings are not comparable")
+    if baseline and server_major(server_version) != server_major(baseline.get('server_version')):
+        logging.warning(f"Baseline was recorded on PostgreSQL {baseline.get('server_version')}, this server is "
+                        f"{server_version}: plan shapes are not compared (re-record with --update-baseline)")
+    flags = compare_to_baseline(results, baseline, server_version=server_version)
+
+    titles = {q['name']: q['title'] for q in queries}
+    logging.info(f"{'query':>6} {'exec_ms':>9} {'base_ms':>9} {'plan_ms':>8} {'buffers':>8}  flags / title")
+    for name, r in results.items():
+        base = baseline.get('queries', {}).get(name, {})
+        logging.info(f"{name:>6} {r['execution_ms']:>9} {base.get('execution_ms', '-'):>9} {r['planning_ms']:>8} "
+                     f"{r['buffers']:>8}  {' '.join(flags.get(name, [])) or 'ok'} - {titles[name]}")
+        if 'PLAN CHANGED' in flags.get(name, []):
+            logging.warning(f"  query {name} baseline plan: {base['shape']}")
+            logging.warning(f"  query {name} current plan:  {r['shape']}")
+    for s in suggestions:
+        logging.info(f"Index suggestion (queries {', '.join(s['queries'])}): {s['sql']};")
+    for t in trials:
+        logging.info(f"  {t['index']} on query {t['query']}: {t['before_ms']} ms → {t['after_ms']} ms "
+                     f"({'used' if t['used'] else 'not used by the planner'})")
+
+    if update_baseline:
+        baseline_path.write_text(json.dumps({
+            'rows': rows,
+            'seed': seed,
+            'server_version': server_version,
+            'queries': {name: {k: v for k, v in r.items() if k != 'plan'} for name, r in results.items()},
+        }, indent=2) + '\n', encoding='utf-8')
+        logging.info(f"Baseline written to {baseline_path} ✓")
+    elif flags:
+        logging.warning(f"Plan regressions in queries: {', '.join(flags)}")
+    elif baseline:
+        logging.info("No plan regressions against the baseline ✓")
+    return {'results': results, 'flags': flags, 'suggestions': suggestions, 'trials': trials}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the analytics queries against a plan baseline")
+    parser.add_argument('--rows', type=int, default=ROWS, help="synthetic studies to load")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--queries', default=str(QUERIES_PATH))
+    parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    parser.add_argument('--update-baseline', action='store_true', help="record this run as the new baseline")
+    parser.add_argument('--try-indexes', action='store_true', help="build each suggested index and re-measure")
+    parser.add_argument('--db-url', help="existing server to create a scratch database on "
+                                         "(default: start an ephemeral cluster)")
+    args = parser.parse_args()
+    outcome = run_harness(args.rows, args.db_url, args.baseline, args.update_baseline, args.try_indexes,
+                          args.queries, args.repeat, args.seed)
+    sys.exit(1 if outcome['flags'] and not args.update_baseline else 0)
@@ -0,0 +1,238 @@
+# =============================================================================
+# profiling.py
+# Opt-in per-stage profiles for the loader and the quality report (--profile)
+#
+# A Profiler wraps named pipeline stages (read, transform, write, ...) and
+# writes everything into one run directory:
+#   - stacks.collapsed / <stage>.collapsed: sampled Python stacks in collapsed
+#     format, one "frame;frame;frame count" line per stack, with the stage as
+#     the root frame (flamegraph.pl, speedscope, inferno)
+#   - summary.json: wall / CPU seconds and samples per stage (+ peak traced
+#     memory and top allocation sites in full mode)
+# Modes:
+#   - full:   cProfile per stage (<stage>.pstats, for snakeviz / pstats) and
+#             tracemalloc snapshots around each stage (<stage>.alloc.txt: top
+#             allocation sites by net size), plus stacks every 5 ms. The run
+#             takes ~6x longer (cProfile + tracemalloc): for investigations
+#   - sample: stacks only, every 20 ms from a background thread; overhead within
+#             run-to-run noise, meant to stay enabled in production for a fraction of
+#             runs (--profile-rate 0.05 = one run in 20)
+#
+# Used by 02-upload.py and 02-dataquality.py:
+#   python database/02-upload.py --mode swap --profile full
+#   python database/02-dataquality.py --fast --profile sample --profile-rate 0.05
+#   flamegraph.pl profiles/<run>/stacks.collapsed > flame.svg
+# =============================================================================
+
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+MODES          = ('full', 'sample')
+PROFILE_DIR    = "profiles"
+INTERVALS      = {'full': 0.005, 'sample': 0.02}     # seconds between stack samples
+TRACE_FRAMES   = 1                                    # tracemalloc depth: sites are reported by line (10 is ~3x slower)
+TOP_ALLOCATIONS = 25                                  # allocation sites listed per stage
+TOP_FUNCTIONS  = 15                                   # cProfile entries in summary.json
+NO_STAGE       = "(no stage)"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def frame_label(code) -> str:
+    """'function (file.py:line)'; ';' is the collapsed-format separator"""
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(';', ':')
+
+
+def safe_name(stage: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', stage).strip('_') or 'stage'
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a daemon thread"""
+
+    def __init__(self, interval: float, label, thread_id: int = None):
+        self.interval = interval
+        self.label = label                  # callable: current stage name
+        self.thread_id = thread_id or threading.get_ident()
+        self.counts = Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(frame_label(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            self.counts[(self.label(),) + tuple(reversed(stack))] += 1
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+
+def top_allocations(before, after, limit: int = TOP_ALLOCATIONS) -> list:
+    """Allocation sites with the largest net growth between two tracemalloc snapshots"""
+    stats = after.compare_to(before, 'lineno')
+    return [{'site': f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+             'size_kb': round(s.size_diff / 1024, 1), 'count': s.count_diff}
+            for s in stats[:limit] if s.size_diff > 0]
+
+
+def top_functions(profile: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> list:
+    """Functions with the highest cumulative time of a stage's cProfile"""
+    profile.create_stats()
+    rows = sorted(profile.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:limit]
+    return [{'function': f"{name} ({Path(file).name}:{line})", 'calls': nc, 'tottime_s': round(tt, 4),
+             'cumtime_s': round(ct, 4)}
+            for (file, line, name), (_, nc, tt, ct, _) in rows]
+
+
+class Profiler:
+    """
+    Per-stage profiles of one run. Use as a context manager around the run;
+    stages are either `with profiler.stage(name):` blocks or sequential
+    `profiler.begin(name)` calls (each one ends the previous stage).
+    """
+
+    def __init__(self, mode: str = 'sample', out_dir: str = PROFILE_DIR, label: str = 'run'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}: expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.label = label
+        self.run_dir = Path(out_dir) / f"{safe_name(label)}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.stages = []                    # summaries, in the order the stages ended
+        self.active = []                    # open stages (nested stage() blocks)
+        self.sampler = StackSampler(INTERVALS[mode], self.current_stage)
+        self.started_tracemalloc = False
+
+    def current_stage(self) -> str:
+        return self.active[-1]['name'] if self.active else NO_STAGE
+
+    def __enter__(self):
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.started = time.perf_counter()
+        if self.mode == 'full' and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self.started_tracemalloc = True
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        while self.active:
+            self.end()
+        self.sampler.stop()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        self.write()
+        return False
+
+    def begin(self, name: str):
+        """Ends the current top-level stage (if any) and starts `name`"""
+        while self.active:
+            self.end()
+        self.start_stage(name)
+
+    def end(self):
+        self.finish_stage(self.active.pop())
+
+    @contextmanager
+    def stage(self, name: str):
+        entry = self.start_stage(name)
+        try:
+            yield self
+        finally:
+            if entry in self.active:
+                self.active.remove(entry)
+                self.finish_stage(entry)
+
+    def start_stage(self, name: str) -> dict:
+        if self.active:
+            name = f"{self.active[-1]['name']}/{name}"
+        entry = {'name': name, 'wall': time.perf_counter(), 'cpu': time.process_time(), 'profile': None,
+                 'snapshot': None}
+        if self.mode == 'full':
+            if not self.active:
+                # one cProfile at a time: nested stages are part of their parent's profile
+                entry['profile'] = cProfile.Profile()
+                entry['profile'].enable()
+            tracemalloc.reset_peak()
+            entry['snapshot'] = tracemalloc.take_snapshot()
+        self.active.append(entry)
+        return entry
+
+    def finish_stage(self, entry: dict):
+        summary = {
+            'stage': entry['name'],
+            'wall_s': round(time.perf_counter() - entry['wall'], 3),
+            'cpu_s': round(time.process_time() - entry['cpu'], 3),
+        }
+        name = safe_name(entry['name'])
+        if entry['profile'] is not None:
+            entry['profile'].disable()
+            entry['profile'].dump_stats(str(self.run_dir / f"{name}.pstats"))
+            summary['top_functions'] = top_functions(entry['profile'])
+        if entry['snapshot'] is not None:
+            summary['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            allocations = top_allocations(entry['snapshot'], tracemalloc.take_snapshot())
+            summary['top_allocations'] = allocations[:5]
+            (self.run_dir / f"{name}.alloc.txt").write_text(
+                f"# {entry['name']}: net growth by allocation site, peak traced {summary['peak_traced_mb']} MB\n"
+                + "".join(f"{a['size_kb']:>12,.1f} KB {a['count']:>9,} blocks  {a['site']}\n" for a in allocations),
+                encoding='utf-8')
+        self.stages.append(summary)
+        logging.info(f"[profile] {entry['name']}: {summary['wall_s']}s wall, {summary['cpu_s']}s CPU")
+
+    def write(self):
+        counts = self.sampler.counts
+        by_stage = Counter()
+        for stack, n in counts.items():
+            by_stage[stack[0]] += n
+        lines = [f"{';'.join(stack)} {n}\n" for stack, n in sorted(counts.items())]
+        (self.run_dir / "stacks.collapsed").write_text("".join(lines), encoding='utf-8')
+        for stage in by_stage:
+            (self.run_dir / f"{safe_name(stage)}.collapsed").write_text(
+                "".join(f"{';'.join(s[1:])} {n}\n" for s, n in sorted(counts.items()) if s[0] == stage),
+                encoding='utf-8')
+        for summary in self.stages:
+            summary['samples'] = by_stage.get(summary['stage'], 0)
+        (self.run_dir / "summary.json").write_text(json.dumps({
+            'label': self.label, 'mode': self.mode, 'argv': sys.argv,
+            'sample_interval_s': self.sampler.interval,
+            'wall_s': round(time.perf_counter() - self.started, 3),
+            'samples': sum(counts.values()),
+            'stages': self.stages,
+        }, indent=2) + '\n', encoding='utf-8')
+        logging.info(f"[profile] {self.mode} profile written to {self.run_dir}")
+
+
+def maybe_profiler(mode: str = None, out_dir: str = PROFILE_DIR, rate: float = 1.0, label: str = 'run'):
+    """A Profiler for this run, or None when `mode` is unset or the run is not drawn (probability `rate`)"""
+    if not mode or random.random() >= rate:
+        return None
+    return Profiler(mode, out_dir, label)
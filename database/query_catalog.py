@@ -0,0 +1,87 @@
+# =============================================================================
+# query_catalog.py
+# Named queries parsed from the analytics SQL files
+#
+# analytics/queries.sql (and queries_v3.sql) are written for psql: numbered
+# sections between "-- ===" banners, each with one or more statements. This
+# module turns a file into a list of named queries ("1", "2", ..., "11.1",
+# "11.2" when a section has several statements) so other tools can run the
+# same SQL without copying it. Comment-only sections are skipped.
+#
+# Run:  python database/query_catalog.py analytics/queries.sql
+# =============================================================================
+
+import argparse
+import re
+from pathlib import Path
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+QUERIES_PATH = Path(__file__).resolve().parents[1] / "analytics" / "queries.sql"
+
+BANNER_RE  = re.compile(r'^--\s*={10,}\s*$')
+SECTION_RE = re.compile(r'^--\s*(\d+)\.\s+(.+?)\s*$')
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def strip_comment(line: str) -> str:
+    """Removes a trailing -- comment (outside single-quoted strings)"""
+    in_string = False
+    for i, ch in enumerate(line):
+        if ch == "'":
+            in_string = not in_string
+        elif not in_string and line.startswith('--', i):
+            return line[:i].rstrip()
+    return line.rstrip()
+
+
+def split_sections(text: str) -> list:
+    """[(number, title, [statement, ...])] in file order"""
+    sections, current, buffer = [], None, []
+    previous = ''
+    for line in text.splitlines():
+        stripped = line.strip()
+        header = SECTION_RE.match(stripped)
+        if header and BANNER_RE.match(previous):
+            current = (header.group(1), header.group(2), [])
+            sections.append(current)
+            buffer = []
+        elif stripped.startswith('--') or not stripped:
+            pass
+        else:
+            code = strip_comment(line)
+            buffer.append(code)
+            if code.endswith(';'):
+                statement = '\n'.join(buffer).strip().rstrip(';').strip()
+                buffer = []
+                if current is not None and statement:
+                    current[2].append(statement)
+        previous = stripped
+    return sections
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def load_queries(path=QUERIES_PATH) -> list:
+    """[{'name', 'title', 'sql'}] for every statement of the file"""
+    queries = []
+    for number, title, statements in split_sections(Path(path).read_text(encoding='utf-8')):
+        for i, sql in enumerate(statements, start=1):
+            name = number if len(statements) == 1 else f"{number}.{i}"
+            queries.append({'name': name, 'title': title, 'sql': sql})
+    return queries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the named queries of an analytics SQL file")
+    parser.add_argument('path', nargs='?', default=str(QUERIES_PATH))
+    args = parser.parse_args()
+    for query in load_queries(args.path):
+        print(f"{query['name']:>5}  {query['title']}")
@@ -0,0 +1,274 @@
+# =============================================================================
+# study_history.py
+# Snapshot history: keeps study_versions (02-history.sql) from periodic full
+# snapshots of the source, with valid-from / valid-to date ranges
+#
+# Each snapshot is transformed like a normal load (02-upload.py transform())
+# and every study gets a content hash (loaded columns + sorted conditions).
+# The diff against the previous snapshot is a streaming sort-merge over
+# study_key: the snapshot's (key, hash) pairs, sorted in memory, against the
+# current versions read in key order from the partial index (server-side
+# cursor, batches of FETCH_ROWS). PostgreSQL never compares the two tables.
+# The diff gives:
+#   - new:       key only in the snapshot     → version opened
+#   - changed:   same key, different hash     → version closed + new one opened
+#   - removed:   key only in the history      → version closed
+#   - unchanged: same key, same hash          → nothing written
+# The same diff is applied to the live tables (apply_incremental of
+# --mode incremental), so unchanged studies cost no writes there either; the
+# first snapshot replaces the live tables.
+# Snapshot dates must increase; a snapshot identical to the last one
+# (fingerprint) is skipped.
+#
+# Run:  python database/study_history.py --source snapshot_2026-10-01.csv --date 2026-10-01
+#       python database/study_history.py --as-of 2026-06-30          (studies valid on that date)
+# =============================================================================
+
+import argparse
+import hashlib
+import logging
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+
+upload = load_script('upload')
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+DB_URL      = upload.DB_URL
+HISTORY_SQL = Path(__file__).resolve().parent / "02-history.sql"
+
+FETCH_ROWS  = 10_000        # current versions per round trip while merging
+
+# Columns fingerprinted into content_hash, in order (those present in the snapshot)
+HASHED_COLUMNS = [c for c in upload.STUDY_COLUMNS if c != 'study_key']
+
+CURRENT_VERSIONS_SQL = """
+    SELECT study_key, content_hash FROM study_versions
+    WHERE upper_inf(valid)
+    ORDER BY study_key
+"""
+
+VERSION_COLUMNS = HASHED_COLUMNS + ['conditions_list']
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def ensure_history(conn):
+    conn.exec_driver_sql(HISTORY_SQL.read_text(encoding='utf-8'))
+
+
+def conditions_lists(studies: pd.DataFrame, cond_df: pd.DataFrame) -> pd.Series:
+    """Sorted, de-duplicated condition names of each study, ' | ' separated (None without conditions)"""
+    if cond_df.empty:
+        return pd.Series(None, index=studies.index, dtype=object)
+    lists = (cond_df.drop_duplicates(['study_key', 'condition_name'])
+                    .sort_values('condition_name')
+                    .groupby('study_key')['condition_name'].agg(' | '.join))
+    return studies['study_key'].map(lists)
+
+
+def content_hashes(studies: pd.DataFrame, conditions: pd.Series) -> pd.Series:
+    """
+    16-byte blake2b (hex) of the hashed columns and the conditions list of
+    each study. Missing values hash as '', dates as YYYY-MM-DD, so the same
+    study hashes the same in every snapshot.
+    """
+    parts = []
+    for col in HASHED_COLUMNS:
+        if col not in studies.columns:
+            continue
+        values = studies[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime('%Y-%m-%d')
+        parts.append(values.fillna('').astype(str))
+    parts.append(conditions.fillna(''))
+    source = parts[0]
+    for part in parts[1:]:
+        source = source + '\x1f' + part
+    return pd.Series([hashlib.blake2b(s.encode('utf-8'), digest_size=16).hexdigest() for s in source],
+                     index=studies.index)
+
+
+def _ordered(pairs, side: str):
+    """Passes (key, hash) pairs through, raising if the keys are not strictly increasing"""
+    previous = None
+    for key, digest in pairs:
+        if previous is not None and key <= previous:
+            raise ValueError(f"{side} keys are not sorted and unique: {previous!r} then {key!r}")
+        previous = key
+        yield key, digest
+
+
+def diff_snapshots(previous, current):
+    """
+    Sort-merge of two (study_key, content_hash) streams, both in increasing
+    key order (byte order). Yields (op, study_key) with op one of 'new',
+    'changed', 'removed', 'unchanged'. Only one pair of each side is held.
+    """
+    old, new = _ordered(previous, 'previous'), _ordered(current, 'current')
+    a, b = next(old, None), next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield 'removed', a[0]
+            a = next(old, None)
+        elif a is None or b[0] < a[0]:
+            yield 'new', b[0]
+            b = next(new, None)
+        else:
+            yield ('unchanged' if a[1] == b[1] else 'changed'), b[0]
+            a, b = next(old, None), next(new, None)
+
+
+def iter_current_versions(conn, fetch_rows: int = FETCH_ROWS):
+    """(study_key, content_hash) of the open versions, in key order, through a server-side cursor"""
+    result = conn.execute(text(CURRENT_VERSIONS_SQL),
+                          execution_options={'stream_results': True, 'max_row_buffer': fetch_rows})
+    for partition in result.partitions(fetch_rows):
+        yield from partition
+
+
+def last_snapshot(conn):
+    return conn.execute(text("""
+        SELECT snapshot_id, snapshot_date, source_fingerprint FROM study_snapshots
+        ORDER BY snapshot_date DESC LIMIT 1
+    """)).mappings().first()
+
+
+def record_snapshot(conn, snapshot_date, path: str, fingerprint: str, counts: dict) -> int:
+    return conn.execute(text("""
+        INSERT INTO study_snapshots (snapshot_date, source_path, source_fingerprint, studies,
+                                     inserted, changed, removed, unchanged)
+        VALUES (:d, :p, :fp, :studies, :new, :changed, :removed, :unchanged)
+        RETURNING snapshot_id
+    """), {'d': snapshot_date, 'p': path, 'fp': fingerprint, **counts}).scalar()
+
+
+def write_versions(conn, snapshot_id: int, snapshot_date, versions: pd.DataFrame, closed: list):
+    """Closes the open versions of `closed` keys on snapshot_date and opens `versions`"""
+    if closed:
+        conn.execute(text("""
+            UPDATE study_versions SET valid = daterange(lower(valid), :d)
+            WHERE study_key = ANY(:keys) AND upper_inf(valid)
+        """), {'d': snapshot_date, 'keys': closed})
+    if not versions.empty:
+        rows = versions.assign(valid=f"[{snapshot_date:%Y-%m-%d},)", snapshot_id=snapshot_id)
+        rows.to_sql('study_versions', conn, if_exists='append', index=False)
+
+
+def studies_as_of(engine, day) -> pd.DataFrame:
+    """The version of every study valid on `day` (GiST index on the range)"""
+    return pd.read_sql(text(f"""
+        SELECT study_key, {", ".join(VERSION_COLUMNS)}, lower(valid) AS valid_from, upper(valid) AS valid_to
+        FROM study_versions WHERE valid @> CAST(:d AS date)
+        ORDER BY study_key
+    """), engine, params={'d': day})
+
+
+def study_history(engine, study_key: str) -> pd.DataFrame:
+    """Every version of one study, oldest first"""
+    return pd.read_sql(text(f"""
+        SELECT lower(valid) AS valid_from, upper(valid) AS valid_to, content_hash, {", ".join(VERSION_COLUMNS)}
+        FROM study_versions WHERE study_key = :k
+        ORDER BY lower(valid)
+    """), engine, params={'k': study_key})
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def apply_snapshot(source: str, snapshot_date=None, db_url: str = DB_URL) -> dict:
+    """
+    Diffs one full snapshot against the history and applies the difference to
+    study_versions and to the live tables, in one transaction under the load
+    lock. Returns the diff counts (None if the snapshot was already loaded).
+    """
+    snapshot_date = pd.Timestamp(snapshot_date or date.today()).date()
+    path = str(Path(source).resolve())
+    start = time.perf_counter()
+    engine = create_engine(db_url)
+    lock_conn = upload.acquire_load_lock(engine)
+    try:
+        fingerprint = upload.source_fingerprint(path)
+        with engine.begin() as conn:
+            ensure_history(conn)
+            last = last_snapshot(conn)
+        if last and last['source_fingerprint'] == fingerprint:
+            logging.info(f"Same content as the snapshot of {last['snapshot_date']} → nothing to do")
+            return None
+        if last and snapshot_date <= last['snapshot_date']:
+            raise ValueError(f"Snapshot date {snapshot_date} must be after the last one ({last['snapshot_date']})")
+
+        studies, cond_df = upload.transform(upload.read_source(path))
+        studies = studies.sort_values('study_key', kind='stable').reset_index(drop=True)
+        conditions = conditions_lists(studies, cond_df)
+        hashes = content_hashes(studies, conditions)
+        logging.info(f"Snapshot {snapshot_date}: {len(studies):,} studies hashed ({time.perf_counter() - start:.2f}s)")
+
+        with engine.begin() as conn:
+            ops = {'new': [], 'changed': [], 'removed': []}
+            unchanged = 0
+            for op, key in diff_snapshots(iter_current_versions(conn), zip(studies['study_key'], hashes)):
+                if op == 'unchanged':
+                    unchanged += 1
+                else:
+                    ops[op].append(key)
+            counts = {'studies': len(studies), 'unchanged': unchanged, **{op: len(k) for op, k in ops.items()}}
+            logging.info(f"Diff: {counts['new']:,} new, {counts['changed']:,} changed, "
+                         f"{counts['removed']:,} removed, {unchanged:,} unchanged")
+
+            snapshot_id = record_snapshot(conn, snapshot_date, path, fingerprint, counts)
+            touched = studies['study_key'].isin(set(ops['new']) | set(ops['changed']))
+            versions = studies.loc[touched, ['study_key'] + [c for c in HASHED_COLUMNS if c in studies.columns]]
+            versions = versions.assign(content_hash=hashes[touched], conditions_list=conditions[touched])
+            write_versions(conn, snapshot_id, snapshot_date, versions, ops['changed'] + ops['removed'])
+
+            if last is None:
+                # First snapshot: the live tables become exactly this snapshot, as in --mode incremental
+                upload.ensure_ledger(conn)
+                upload.forget_source_state(conn)
+                conn.execute(text("TRUNCATE TABLE study_conditions, conditions, studies RESTART IDENTITY CASCADE;"))
+                upload.write_tables(conn, studies, cond_df)
+            else:
+                delta_cond = cond_df[cond_df['study_key'].isin(versions['study_key'])] if not cond_df.empty else cond_df
+                upload.apply_incremental(conn, studies[touched], delta_cond, deleted=ops['removed'])
+    finally:
+        upload.release_load_lock(lock_conn)
+        engine.dispose()
+
+    logging.info(f"Snapshot {snapshot_date} applied in {time.perf_counter() - start:.2f}s ✓")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Study version history from full snapshots")
+    parser.add_argument('--source', default=upload.CSV_PATH, help="full snapshot, CSV or XML (default: CSV_PATH)")
+    parser.add_argument('--date', help="snapshot date YYYY-MM-DD (default: today)")
+    parser.add_argument('--as-of', help="print the studies valid on this date instead of loading")
+    parser.add_argument('--study', help="print the versions of this study_key instead of loading")
+    parser.add_argument('--db-url', default=DB_URL)
+    args = parser.parse_args()
+
+    if args.as_of or args.study:
+        engine = create_engine(args.db_url)
+        df = studies_as_of(engine, args.as_of) if args.as_of else study_history(engine, args.study)
+        print(df.to_string(index=False))
+        engine.dispose()
+    else:
+        apply_snapshot(args.source, args.date, args.db_url)
@@ -0,0 +1,165 @@
+# =============================================================================
+# synthetic_data.py
+# Generator of synthetic clinical trials, shaped like clin_trials.csv
+#
+# Used by benchmarks and test harnesses that cannot ship the real dataset.
+# Value distributions loosely follow analytics_report.md (COMPLETED ~55%,
+# ~44% missing start dates, a long tail of conditions and organizations).
+#
+# Run:  python database/synthetic_data.py --rows 100000 --csv out.csv
+#       python database/synthetic_data.py --rows 5000000 --xml out.xml
+# =============================================================================
+
+import argparse
+import csv
+import logging
+import random
+from xml.sax.saxutils import escape
+
+# Logging configuration
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(levelname)-7s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+# CSV header of the source file → normalized column name (see normalize_column_names)
+CSV_COLUMNS = {
+    'Organization Full Name': 'org_name',
+    'Organization Class':     'org_class',
+    'Responsible Party':      'responsible_party',
+    'Brief Title':            'brief_title',
+    'Full Title':             'full_title',
+    'Overall Status':         'overall_status',
+    'Start Date':             'start_date',
+    'Standard Age':           'standard_age',
+    'Conditions':             'conditions',
+    'Primary Purpose':        'primary_purpose',
+    'Study Type':             'study_type',
+    'Phase':                  'phase',
+}
+
+STATUSES = [('COMPLETED', 55), ('RECRUITING', 14), ('UNKNOWN', 12), ('TERMINATED', 6),
+            ('NOT_YET_RECRUITING', 4), ('ACTIVE_NOT_RECRUITING', 4), ('WITHDRAWN', 3),
+            ('ENROLLING_BY_INVITATION', 1), ('SUSPENDED', 1)]
+PHASES       = [('', 40), ('NA', 20), ('PHASE2', 12), ('PHASE1', 10), ('PHASE3', 9),
+                ('PHASE4', 6), ('PHASE1|PHASE2', 2), ('EARLY_PHASE1', 1)]
+STUDY_TYPES  = [('INTERVENTIONAL', 77), ('OBSERVATIONAL', 22), ('EXPANDED_ACCESS', 1)]
+ORG_CLASSES  = [('OTHER', 60), ('INDUSTRY', 25), ('NIH', 5), ('OTHER_GOV', 5), ('FED', 3), ('NETWORK', 2)]
+PURPOSES     = [('TREATMENT', 55), ('', 20), ('PREVENTION', 9), ('SUPPORTIVE_CARE', 5),
+                ('BASIC_SCIENCE', 5), ('DIAGNOSTIC', 4), ('OTHER', 2)]
+AGES         = [('ADULT, OLDER_ADULT', 60), ('ADULT', 15), ('CHILD, ADULT, OLDER_ADULT', 15), ('CHILD', 10)]
+
+CONDITION_WORDS = ['cancer', 'diabetes', 'obesity', 'asthma', 'hypertension', 'healthy', 'covid-19',
+                   'depression', 'stroke', 'hiv infections', 'breast', 'lung', 'chronic', 'acute',
+                   'pain', 'heart failure', 'arthritis', 'leukemia', 'schizophrenia', 'carcinoma']
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _weighted(rnd: random.Random, choices: list) -> str:
+    values, weights = zip(*choices)
+    return rnd.choices(values, weights)[0]
+
+
+def iter_synthetic_studies(n: int, seed: int = 42, n_orgs: int = 28_000, n_conditions: int = 100_000):
+    """Yields `n` studies as dicts keyed by normalized column names"""
+    rnd = random.Random(seed)
+    for i in range(n):
+        # Zipf-like skew: a few organizations and conditions dominate
+        org = int(n_orgs * rnd.random() ** 3)
+        n_cond = min(int(rnd.expovariate(0.7)) + 1, 25)
+        conditions = []
+        for _ in range(n_cond):
+            c = int(n_conditions * rnd.random() ** 4)
+            conditions.append(f"{CONDITION_WORDS[c % len(CONDITION_WORDS)]} {c}" if c >= len(CONDITION_WORDS)
+                              else CONDITION_WORDS[c])
+        start = '' if rnd.random() < 0.44 else (
+            f"{rnd.randint(1990, 2025)}-{rnd.randint(1, 12):02d}" +
+            (f"-{rnd.randint(1, 28):02d}" if rnd.random() < 0.7 else ''))
+        yield {
+            'org_name':          f"Organization {org}",
+            'org_class':         _weighted(random.Random(org), ORG_CLASSES),   # fixed per organization
+            'responsible_party': rnd.choice(['SPONSOR', 'PRINCIPAL_INVESTIGATOR', 'SPONSOR_INVESTIGATOR']),
+            'brief_title':       f"Study {i} of {conditions[0]}",
+            'full_title':        f"A randomized study {i} evaluating treatment of {', '.join(conditions)}",
+            'overall_status':    _weighted(rnd, STATUSES),
+            'start_date':        start,
+            'standard_age':      _weighted(rnd, AGES),
+            'conditions':        ', '.join(conditions),
+            'primary_purpose':   _weighted(rnd, PURPOSES),
+            'study_type':        _weighted(rnd, STUDY_TYPES),
+            'phase':             _weighted(rnd, PHASES),
+        }
+
+
+def write_csv(path: str, n: int, seed: int = 42) -> str:
+    """Writes `n` synthetic studies with the source CSV headers"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS.keys())
+        for study in iter_synthetic_studies(n, seed):
+            writer.writerow(study[col] for col in CSV_COLUMNS.values())
+    return path
+
+
+def _title_case(value: str) -> str:
+    """'NOT_YET_RECRUITING' → 'Not yet recruiting' (the XML dumps use display labels)"""
+    return value.replace('_', ' ').capitalize()
+
+
+def write_xml(path: str, n: int, seed: int = 42) -> str:
+    """Writes `n` synthetic studies as ClinicalTrials.gov-style <clinical_study> records"""
+    months = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+              'August', 'September', 'October', 'November', 'December']
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<clinical_studies>\n')
+        for s in iter_synthetic_studies(n, seed):
+            start = ''
+            if s['start_date']:
+                parts = s['start_date'].split('-')
+                start = (f"{months[int(parts[1]) - 1]} {int(parts[2])}, {parts[0]}" if len(parts) == 3
+                         else f"{months[int(parts[1]) - 1]} {parts[0]}")
+            phase = '/'.join(p.replace('PHASE', 'Phase ').replace('EARLY_', 'Early ')
+                             for p in s['phase'].split('|')) if s['phase'] else ''
+            ages = ''.join(f"<std_age>{_title_case(a.strip())}</std_age>" for a in s['standard_age'].split(','))
+            conditions = ''.join(f"<condition>{escape(c.strip())}</condition>" for c in s['conditions'].split(','))
+            f.write(
+                "<clinical_study>"
+                f"<brief_title>{escape(s['brief_title'])}</brief_title>"
+                f"<official_title>{escape(s['full_title'])}</official_title>"
+                f"<sponsors><lead_sponsor><agency>{escape(s['org_name'])}</agency>"
+                f"<agency_class>{_title_case(s['org_class'])}</agency_class></lead_sponsor></sponsors>"
+                f"<responsible_party><responsible_party_type>{_title_case(s['responsible_party'])}"
+                f"</responsible_party_type></responsible_party>"
+                f"<overall_status>{_title_case(s['overall_status'])}</overall_status>"
+                + (f"<start_date>{start}</start_date>" if start else "")
+                + f"<study_type>{_title_case(s['study_type'])}</study_type>"
+                + (f"<phase>{phase}</phase>" if phase else "")
+                + (f"<study_design_info><primary_purpose>{_title_case(s['primary_purpose'])}"
+                   f"</primary_purpose></study_design_info>" if s['primary_purpose'] else "")
+                + f"<eligibility>{ages}</eligibility>"
+                f"{conditions}"
+                "</clinical_study>\n"
+            )
+        f.write('</clinical_studies>\n')
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic clinical trials data")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--csv', help="output CSV path")
+    parser.add_argument('--xml', help="output XML path")
+    args = parser.parse_args()
+    if args.csv:
+        logging.info(f"Wrote {write_csv(args.csv, args.rows, args.seed)} ({args.rows:,} studies)")
+    if args.xml:
+        logging.info(f"Wrote {write_xml(args.xml, args.rows, args.seed)} ({args.rows:,} studies)")
@@ -0,0 +1,189 @@
+# =============================================================================
+# upload_async.py
+# Concurrent loader: clinical trials CSV → PostgreSQL with asyncpg COPY
+#
+# Same transform as 02-upload.py, different write path:
+# - studies and conditions are COPYed at the same time on separate connections
+# - study_conditions is COPYed in parallel chunks
+# - everything lands in *_stage tables first; the live tables are only
+#   touched by one final transaction, so a failed load leaves them as they
+#   were (same all-or-nothing behavior as the engine.begin() block)
+#
+# Condition IDs are assigned client-side, so relationships do not have to
+# wait for a read-back of the generated SERIAL values.
+# =============================================================================
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+import asyncpg
+import pandas as pd
+
+try:
+    from migx._scripts import load_script
+except ImportError:     # python database/<script>.py from a checkout: migx/ sits next to database/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from migx._scripts import load_script
+
+
+upload = load_script('upload')
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+CSV_PATH = upload.CSV_PATH
+DB_URL   = upload.DB_URL
+
+PARALLEL_CHUNKS = 4          # concurrent COPY streams for study_conditions
+CHUNK_SIZE      = 250_000    # relationship rows per COPY
+
+TABLES = ['studies', 'conditions', 'study_conditions']
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def frame_to_records(df: pd.DataFrame) -> list:
+    """DataFrame → list of tuples as asyncpg expects (None for nulls, date for dates)"""
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = [d.date() if pd.notna(d) else None for d in series]
+        else:
+            values = [None if pd.isna(v) else v for v in series.tolist()]
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def assign_condition_ids(cond_df: pd.DataFrame) -> tuple:
+    """
+    Numbers unique condition names 1..n in order of first appearance.
+    Returns (conditions frame [id, condition_name], relations frame [study_key, condition_id]).
+    """
+    if cond_df.empty:
+        return (pd.DataFrame(columns=['id', 'condition_name']),
+                pd.DataFrame(columns=['study_key', 'condition_id']))
+    names = cond_df['condition_name'].drop_duplicates().reset_index(drop=True)
+    conditions = pd.DataFrame({'id': range(1, len(names) + 1), 'condition_name': names})
+    ids = pd.Series(conditions['id'].values, index=conditions['condition_name'])
+    relations = pd.DataFrame({
+        'study_key':    cond_df['study_key'].values,
+        'condition_id': cond_df['condition_name'].map(ids).values,
+    }).drop_duplicates()
+    return conditions, relations
+
+
+def chunked(records: list, size: int):
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
+
+
+async def copy_records(pool, table: str, columns: list, records: list):
+    start = time.perf_counter()
+    async with pool.acquire() as conn:
+        await conn.copy_records_to_table(table, records=records, columns=columns)
+    logging.info(f"COPY {table}: {len(records):,} rows in {time.perf_counter() - start:.1f}s")
+
+
+async def create_staging(pool):
+    """UNLOGGED copies of the live tables, with their CHECK / NOT NULL constraints"""
+    async with pool.acquire() as conn:
+        for table in TABLES:
+            await conn.execute(f"DROP TABLE IF EXISTS {table}_stage")
+            await conn.execute(
+                f"CREATE UNLOGGED TABLE {table}_stage "
+                f"(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+
+
+async def drop_staging(pool):
+    async with pool.acquire() as conn:
+        for table in TABLES:
+            await conn.execute(f"DROP TABLE IF EXISTS {table}_stage")
+
+
+async def publish(pool, study_cols: list):
+    """Moves staged rows into the live tables in a single transaction"""
+    cols = ", ".join(study_cols)
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            # A full reload makes the --mode incremental state stale (forget_source_state)
+            await conn.execute(upload.LEDGER_SQL.read_text(encoding='utf-8'))
+            await conn.execute("DELETE FROM source_files")
+            await conn.execute("TRUNCATE TABLE study_conditions, conditions, studies RESTART IDENTITY CASCADE")
+            await conn.execute(f"INSERT INTO studies ({cols}) SELECT {cols} FROM studies_stage")
+            await conn.execute("INSERT INTO conditions (id, condition_name) SELECT id, condition_name FROM conditions_stage")
+            await conn.execute("INSERT INTO study_conditions (study_key, condition_id) "
+                               "SELECT study_key, condition_id FROM study_conditions_stage")
+            # IDs were assigned client-side: move the SERIAL past them
+            await conn.execute("SELECT setval(pg_get_serial_sequence('conditions', 'id'), "
+                               "COALESCE((SELECT MAX(id) FROM conditions), 0) + 1, false)")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+async def load_data_async(csv_path: str = CSV_PATH, db_url: str = DB_URL):
+    logging.info("Starting async data load...")
+
+    # 1. Read CSV
+    try:
+        df = pd.read_csv(csv_path, dtype=str, low_memory=False)
+        logging.info(f"CSV read → {len(df):,} rows")
+    except Exception as e:
+        logging.error(f"Error reading CSV: {e}")
+        return
+
+    # 2-5. Same transform as the synchronous loader
+    studies, cond_df = upload.transform(df)
+    conditions, relations = assign_condition_ids(cond_df)
+    study_records = frame_to_records(studies)
+    relation_records = frame_to_records(relations)
+
+    # 6. Load to PostgreSQL
+    # Same advisory lock as 02-upload.py: one load at a time
+    lock_conn = await asyncpg.connect(db_url)
+    if not await lock_conn.fetchval("SELECT pg_try_advisory_lock($1)", upload.LOAD_LOCK_ID):
+        await lock_conn.close()
+        raise RuntimeError(f"Another load is already running (advisory lock {upload.LOAD_LOCK_ID} is held)")
+
+    pool = None
+    try:
+        pool = await asyncpg.create_pool(db_url, min_size=2, max_size=max(2, PARALLEL_CHUNKS))
+        await create_staging(pool)
+
+        # Independent tables at the same time
+        await asyncio.gather(
+            copy_records(pool, 'studies_stage', list(studies.columns), study_records),
+            copy_records(pool, 'conditions_stage', ['id', 'condition_name'], frame_to_records(conditions)),
+        )
+
+        # Relationships in parallel chunks
+        await asyncio.gather(*(
+            copy_records(pool, 'study_conditions_stage', ['study_key', 'condition_id'], chunk)
+            for chunk in chunked(relation_records, CHUNK_SIZE)
+        ))
+
+        await publish(pool, list(studies.columns))
+        logging.info("Load completed successfully ✓")
+    except Exception as e:
+        logging.error(f"Error in PostgreSQL: {e}")
+        raise
+    finally:
+        try:
+            if pool is not None:
+                await drop_staging(pool)
+                await pool.close()
+        finally:
+            await lock_conn.close()     # releases the advisory lock
+
+
+if __name__ == "__main__":
+    asyncio.run(load_data_async())
@@ -0,0 +1,214 @@
+# =============================================================================
+# xml_source.py
+# Streaming XML source: ClinicalTrials.gov <clinical_study> dumps → DataFrames
+#
+# The dumps are tens of GB, so no element tree or single DataFrame is ever
+# built. Records are walked with iterparse, each element is cleared as soon as
+# it has been read, and rows are yielded as fixed-size DataFrame chunks whose
+# columns are the ones normalize_column_names() produces. The chunks feed the
+# loader's transform() unchanged, with constant memory.
+#
+# Run (benchmark):  python database/xml_source.py --generate 2000000 --xml big.xml
+# =============================================================================
+
+import argparse
+import logging
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:     # Windows: no getrusage, peak memory is not reported
+    resource = None
+
+# Logging configuration
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(levelname)-7s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+RECORD_TAG = 'clinical_study'
+CHUNK_ROWS = 50_000
+
+# Normalized column → path inside <clinical_study> (single-valued fields)
+FIELD_PATHS = {
+    'brief_title':       'brief_title',
+    'full_title':        'official_title',
+    'org_name':          'sponsors/lead_sponsor/agency',
+    'org_class':         'sponsors/lead_sponsor/agency_class',
+    'responsible_party': 'responsible_party/responsible_party_type',
+    'overall_status':    'overall_status',
+    'study_type':        'study_type',
+    'phase':             'phase',
+    'start_date':        'start_date',
+    'primary_purpose':   'study_design_info/primary_purpose',
+}
+
+# Multi-valued fields, joined the way the CSV stores them
+MULTI_PATHS = {
+    'standard_age': ('eligibility/std_age', ', '),
+    'conditions':   ('condition', '|'),
+}
+
+# Display labels in the XML → codes used by the CSV (e.g. "Active, not recruiting")
+CODED_FIELDS = {'org_class', 'responsible_party', 'overall_status', 'study_type', 'primary_purpose', 'standard_age'}
+
+COLUMNS = list(FIELD_PATHS) + list(MULTI_PATHS)
+
+DATE_FORMATS = [('%B %d, %Y', '%Y-%m-%d'), ('%B %Y', '%Y-%m'), ('%Y-%m-%d', '%Y-%m-%d'), ('%Y-%m', '%Y-%m')]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def peak_rss_mb():
+    """Peak RSS of this process in MB (None on Windows)"""
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 2**20 if sys.platform == 'darwin' else 2**10
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def to_code(label: str) -> str:
+    """'Active, not recruiting' → 'ACTIVE_NOT_RECRUITING'"""
+    return re.sub(r'[^A-Z0-9]+', '_', label.upper()).strip('_')
+
+
+def to_phase(label: str) -> str:
+    """'Phase 1/Phase 2' → 'PHASE1|PHASE2', 'N/A' → 'NA'"""
+    if label.strip().upper() == 'N/A':
+        return 'NA'
+    return '|'.join(re.sub(r'\s+', '', p.upper()).replace('EARLYPHASE', 'EARLY_PHASE')
+                    for p in label.split('/') if p.strip())
+
+
+def to_iso_date(label: str) -> str:
+    """'March 15, 2004' → '2004-03-15', 'January 2004' → '2004-01' (CSV style)"""
+    label = label.strip()
+    for fmt_in, fmt_out in DATE_FORMATS:
+        try:
+            return datetime.strptime(label, fmt_in).strftime(fmt_out)
+        except ValueError:
+            continue
+    return label
+
+
+def record_to_row(elem) -> dict:
+    """One <clinical_study> element → dict with the normalized column names"""
+    row = {}
+    for col, path in FIELD_PATHS.items():
+        value = elem.findtext(path)
+        row[col] = value.strip() if value and value.strip() else None
+    for col, (path, sep) in MULTI_PATHS.items():
+        values = [e.text.strip() for e in elem.iterfind(path) if e.text and e.text.strip()]
+        if col in CODED_FIELDS:
+            values = [to_code(v) for v in values]
+        row[col] = sep.join(values) if values else None
+
+    for col in CODED_FIELDS & set(FIELD_PATHS):
+        if row[col]:
+            row[col] = to_code(row[col])
+    if row['phase']:
+        row['phase'] = to_phase(row['phase'])
+    if row['start_date']:
+        row['start_date'] = to_iso_date(row['start_date'])
+    return row
+
+
+def iter_xml_frames(xml_path: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Streams <clinical_study> records and yields DataFrames of up to
+    `chunk_rows` rows (dtype str, same columns as the normalized CSV).
+    """
+    rows = []
+    root = None
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        if root is None:
+            root = elem                      # first 'start' event is the document root
+            continue
+        if event != 'end' or elem.tag != RECORD_TAG:
+            continue
+        rows.append(record_to_row(elem))
+        # Free the record and the (now empty) reference the root keeps to it
+        elem.clear()
+        root.clear()
+        if len(rows) >= chunk_rows:
+            yield pd.DataFrame(rows, columns=COLUMNS, dtype=str)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=COLUMNS, dtype=str)
+
+
+def parse_xml_to_df(xml_path: str) -> pd.DataFrame:
+    """Whole file as one DataFrame (small files only; prefer iter_xml_frames)"""
+    frames = list(iter_xml_frames(xml_path))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS, dtype=str)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# MAIN FUNCTION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def benchmark(xml_path: str, chunk_rows: int = CHUNK_ROWS, transform=None) -> dict:
+    """
+    Streams the whole file and reports rows/s, MB/s and peak RSS. With
+    `transform` (e.g. the loader's transform()) each chunk is also transformed.
+    """
+    size_mb = Path(xml_path).stat().st_size / 1e6
+    start = time.perf_counter()
+    rows = chunks = 0
+    rss_after_first = None
+    for frame in iter_xml_frames(xml_path, chunk_rows):
+        if transform is not None:
+            transform(frame)
+        rows += len(frame)
+        chunks += 1
+        if chunks == 1:
+            rss_after_first = peak_rss_mb()
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': rows, 'chunks': chunks, 'size_mb': round(size_mb, 1), 'seconds': round(elapsed, 1),
+        'rows_per_s': round(rows / elapsed) if elapsed else 0,
+        'mb_per_s': round(size_mb / elapsed, 1) if elapsed else 0,
+        'peak_rss_mb_first_chunk': rss_after_first,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    logging.info(
+        f"{rows:,} rows / {chunks} chunks from {stats['size_mb']} MB in {stats['seconds']}s → "
+        f"{stats['rows_per_s']:,} rows/s, {stats['mb_per_s']} MB/s | peak RSS "
+        f"{stats['peak_rss_mb_first_chunk']} MB after 1st chunk, {stats['peak_rss_mb']} MB at end"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a ClinicalTrials.gov XML dump into DataFrame chunks")
+    parser.add_argument('--xml', required=True, help="XML file to read (or to create with --generate)")
+    parser.add_argument('--generate', type=int, help="first write this many synthetic studies to --xml")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--transform', action='store_true', help="also run the loader's transform() on each chunk")
+    args = parser.parse_args()
+
+    try:
+        from migx._scripts import load_script
+    except ImportError:     # python database/xml_source.py from a checkout: migx/ sits next to database/
+        sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+        from migx._scripts import load_script
+    if args.generate:
+        load_script('synthetic').write_xml(args.xml, args.generate)
+
+    transform = load_script('upload').transform if args.transform else None
+    benchmark(args.xml, args.chunk_rows, transform)
@@ -0,0 +1,26 @@
+"""
+migx: clinical trials pipeline (CSV / XML / API → PostgreSQL → analytics).
+
+The implementation lives in the database/ scripts, which keep working as
+`python database/02-upload.py ...` but cannot be imported by name. This
+package exposes them as modules, each loaded on first access and only once:
+
+    import migx
+    studies, cond_df = migx.upload.transform(df)     # database/02-upload.py
+    migx.quality.generate_fast_report()               # database/02-dataquality.py
+
+`import migx` itself only touches the standard library; pandas and SQLAlchemy
+are imported with the first script. The command line is `migx` (migx/cli.py).
+"""
+
+from migx._scripts import SCRIPTS, load_script
+
+__version__ = "0.3.0"
+
+__all__ = ['load_script', '__version__', *SCRIPTS]
+
+
+def __getattr__(name: str):
+    if name in SCRIPTS:
+        return load_script(name)
+    raise AttributeError(f"module 'migx' has no attribute {name!r}")
@@ -0,0 +1,3 @@
+from migx.cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,56 @@
+"""Loads the database/ scripts as modules of this package (migx.upload, ...), once each."""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+# Public module name → script file. The scripts load their siblings through load_script()
+# too, so each script runs once per process and migx.worker.upload is migx.upload.
+SCRIPTS = {
+    'upload':    '02-upload.py',
+    'quality':   '02-dataquality.py',
+    'catalog':   'query_catalog.py',
+    'analytics': 'parquet_analytics.py',
+    'export':    'warehouse_export.py',
+    'sketches':  'sketches.py',
+    'cohorts':   'cohort_engine.py',
+    'worker':    'ingest_worker.py',
+    'history':   'study_history.py',
+    'keys':      'key_index.py',
+    'profiling': 'profiling.py',
+    'tokenizer': 'condition_tokenizer.py',
+    'xml':       'xml_source.py',
+    'api':       'api_source.py',
+    'async_upload': 'upload_async.py',
+    'service':   'read_service.py',
+    'loadtest':  'loadtest_read_service.py',
+    'plans':     'plan_harness.py',
+    'bench':     'bench_load.py',
+    'synthetic': 'synthetic_data.py',
+    'ephemeral': 'ephemeral_pg.py',
+}
+
+_HERE = Path(__file__).resolve().parent
+
+# Installed: packaged as migx/database; from a checkout: the repository's database/
+SCRIPTS_DIR = next((d for d in (_HERE / 'database', _HERE.parent / 'database') if (d / SCRIPTS['upload']).exists()),
+                   _HERE.parent / 'database')
+
+
+def load_script(name: str):
+    """The module for `name` (see SCRIPTS), executed on first use and cached in sys.modules"""
+    qualified = f"migx.{name}"
+    if qualified in sys.modules:
+        return sys.modules[qualified]
+    if name not in SCRIPTS:
+        raise KeyError(f"Unknown script module: {name}")
+    spec = importlib.util.spec_from_file_location(qualified, str(SCRIPTS_DIR / SCRIPTS[name]))
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[qualified] = mod
+    try:
+        spec.loader.exec_module(mod)
+    except BaseException:
+        del sys.modules[qualified]
+        raise
+    setattr(sys.modules['migx'], name, mod)
+    return mod
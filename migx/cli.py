@@ -0,0 +1,193 @@
+"""
+`migx` command line: one entry point for the pipeline scripts.
+
+    migx config                                  resolved settings; exit 1 if invalid
+    migx load [--mode swap] [--reader arrow]     database/02-upload.py
+    migx quality [--fast]                        database/02-dataquality.py
+    migx analytics [--query 2] [--backend duckdb]
+    migx export [--out DIR]                      database/warehouse_export.py
+    migx worker [--inbox DIR] [--once]           database/ingest_worker.py
+    migx history [--source FILE] [--date D]      database/study_history.py
+
+Settings come from the environment (migx/config.py) and can be overridden
+with flags. `load` and `quality` take --profile full|sample (MIGX_PROFILE,
+MIGX_PROFILE_RATE, MIGX_PROFILE_DIR; database/profiling.py). Scripts are loaded inside the command that needs them, so
+`--help` and `config` never import pandas or SQLAlchemy.
+"""
+
+import argparse
+import contextlib
+import sys
+
+from migx import config as cfg
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# COMMANDS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def cmd_config(args, config) -> int:
+    print("\n".join(cfg.describe(config)))
+    problems = cfg.validate(config)
+    for problem in problems:
+        print(f"✗ {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+def make_profiler(config, label: str):
+    """A profiling.Profiler when MIGX_PROFILE / --profile is set and this run is drawn, else None"""
+    if not config.profile:
+        return None
+    from migx import profiling
+    return profiling.maybe_profiler(config.profile, config.profile_dir, float(config.profile_rate), label)
+
+
+def cmd_load(args, config) -> int:
+    from migx import upload
+    profiler = make_profiler(config, f"load-{config.load_mode}")
+    with profiler or contextlib.nullcontext():
+        upload.load_data(config.load_mode, config.schema, config.source, config.db_url, profiler, config.reader,
+                         config.vocabulary)
+    return 0
+
+
+def cmd_quality(args, config) -> int:
+    from migx import quality
+    profiler = make_profiler(config, 'quality-fast' if args.fast else 'quality')
+    with profiler or contextlib.nullcontext():
+        if args.fast:
+            passed = quality.generate_fast_report(args.sample_percent, args.method, args.seed,
+                                                  db_url=config.db_url, profiler=profiler,
+                                                  thresholds=quality.parse_thresholds(args.threshold))
+            return 0 if passed else 1
+        quality.generate_report(config.db_url, profiler)
+    return 0
+
+
+def cmd_analytics(args, config) -> int:
+    from migx import catalog
+    if args.backend == 'duckdb':
+        from migx import analytics
+        results = analytics.run_queries(config.parquet_dir, args.query, args.queries or catalog.QUERIES_PATH)
+    else:
+        import pandas as pd
+        from sqlalchemy import create_engine
+        from migx import upload
+        engine = create_engine(config.db_url or upload.DB_URL)
+        results = {q['name']: pd.read_sql(q['sql'], engine)
+                   for q in catalog.load_queries(args.queries or catalog.QUERIES_PATH)
+                   if not args.query or q['name'] in args.query}
+        engine.dispose()
+    for name, df in results.items():
+        print(f"\n-- {name}\n{df.to_string(index=False)}")
+    return 0
+
+
+def cmd_export(args, config) -> int:
+    from migx import export
+    export.export_warehouse(config.export_dir, config.db_url or export.DB_URL)
+    return 0
+
+
+def cmd_worker(args, config) -> int:
+    from migx import worker
+    ingest = worker.IngestWorker(config.inbox_dir, config.db_url or worker.DB_URL, args.debounce, args.poll,
+                                 args.key_index)
+    snapshot = ingest.run(args.once, args.metrics_port)
+    return 1 if snapshot['files_failed'] else 0
+
+
+def cmd_history(args, config) -> int:
+    from migx import history
+    if args.as_of:
+        import pandas as pd
+        from sqlalchemy import create_engine
+        engine = create_engine(config.db_url or history.DB_URL)
+        with pd.option_context('display.width', 200):
+            print(history.studies_as_of(engine, args.as_of).to_string(index=False))
+        engine.dispose()
+        return 0
+    history.apply_snapshot(config.source or history.upload.CSV_PATH, args.date, config.db_url or history.DB_URL)
+    return 0
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# PARSER
+# ──────────────────────────────────────────────────────────────────────────────
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', choices=cfg.PROFILE_MODES, help="per-stage profiles (env MIGX_PROFILE)")
+    parser.add_argument('--profile-rate', help="fraction of runs profiled (env MIGX_PROFILE_RATE, default 1)")
+    parser.add_argument('--profile-dir', help="run directories go here (env MIGX_PROFILE_DIR, default profiles)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='migx', description="Clinical trials pipeline")
+    parser.add_argument('--db-url', help="PostgreSQL URL (env MIGX_DB_URL)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    c = sub.add_parser('config', help="show the resolved settings and validate them")
+    c.set_defaults(func=cmd_config)
+
+    l = sub.add_parser('load', help="load a CSV/XML source into PostgreSQL")
+    l.add_argument('--mode', dest='load_mode', choices=cfg.LOAD_MODES, help="env MIGX_LOAD_MODE (default truncate)")
+    l.add_argument('--schema', choices=cfg.SCHEMAS, help="env MIGX_SCHEMA (default v2)")
+    l.add_argument('--source', help="CSV or XML file (env MIGX_SOURCE)")
+    l.add_argument('--reader', choices=cfg.READERS, help="CSV parser, pandas or arrow (env MIGX_READER, default pandas)")
+    l.add_argument('--vocabulary', help="condition names kept whole: term list file or 'db' (env MIGX_VOCABULARY)")
+    add_profile_arguments(l)
+    l.set_defaults(func=cmd_load)
+
+    q = sub.add_parser('quality', help="data quality report (exit 1 if the --fast gate fails)")
+    q.add_argument('--fast', action='store_true', help="sampled estimates, exact checks only near a threshold")
+    q.add_argument('--sample-percent', type=float, default=1.0)
+    q.add_argument('--method', choices=['SYSTEM', 'BERNOULLI'], default='SYSTEM')
+    q.add_argument('--seed', type=int)
+    q.add_argument('--threshold', action='append', metavar='METRIC=SHARE',
+                   help="override a --fast threshold, e.g. empty_dates=0.4 (repeatable)")
+    add_profile_arguments(q)
+    q.set_defaults(func=cmd_quality)
+
+    a = sub.add_parser('analytics', help="run the named analytics queries")
+    a.add_argument('--query', action='append', help="query name, e.g. 2 (default: all)")
+    a.add_argument('--backend', choices=['postgres', 'duckdb'], default='postgres')
+    a.add_argument('--parquet', dest='parquet_dir', help="Parquet tables for --backend duckdb (env MIGX_PARQUET_DIR)")
+    a.add_argument('--queries', help="SQL file (default analytics/queries.sql)")
+    a.set_defaults(func=cmd_analytics)
+
+    e = sub.add_parser('export', help="export the loaded studies to Parquet, partitioned by start year")
+    e.add_argument('--out', dest='export_dir', help="output directory (env MIGX_EXPORT_DIR)")
+    e.set_defaults(func=cmd_export)
+
+    w = sub.add_parser('worker', help="apply delta files dropped into an inbox directory (long-lived)")
+    w.add_argument('--inbox', dest='inbox_dir', help="directory to watch (env MIGX_INBOX_DIR)")
+    w.add_argument('--debounce', type=float, default=2.0, help="seconds a file must stay unchanged")
+    w.add_argument('--poll', type=float, default=1.0)
+    w.add_argument('--metrics-port', type=int, default=8081, help="0 disables the metrics endpoint")
+    w.add_argument('--once', action='store_true', help="apply the files already in the inbox and exit")
+    w.add_argument('--key-index', help="on-disk key index: skip studies already loaded with the same content")
+    w.set_defaults(func=cmd_worker)
+
+    h = sub.add_parser('history', help="apply a full snapshot to the study version history")
+    h.add_argument('--source', help="full snapshot, CSV or XML (env MIGX_SOURCE)")
+    h.add_argument('--date', help="snapshot date YYYY-MM-DD (default: today)")
+    h.add_argument('--as-of', help="print the studies valid on this date instead")
+    h.set_defaults(func=cmd_history)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    overrides = {name: getattr(args, name, None) for name in cfg.ENV_VARS}
+    config = cfg.from_env().merged(**overrides)
+    if args.command != 'config':
+        problems = cfg.validate(config)
+        if problems:
+            for problem in problems:
+                print(f"✗ {problem}", file=sys.stderr)
+            return 2
+    return args.func(args, config)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+"""
+Pipeline configuration from the environment.
+
+Every setting is optional: unset means the default of the script that uses it
+(DB_URL / CSV_PATH constants, ...). A `.env` file in the working directory is
+read first when python-dotenv is installed; real environment variables win.
+Only the standard library is imported here, so `migx config` can validate a
+deployment (or a scheduler can probe it) without loading pandas.
+"""
+
+import os
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from urllib.parse import urlsplit
+
+LOAD_MODES = ('truncate', 'swap', 'resume', 'incremental')
+SCHEMAS    = ('v2', 'v3')
+PROFILE_MODES = ('full', 'sample')
+READERS    = ('pandas', 'arrow')
+
+# Setting → environment variable
+ENV_VARS = {
+    'db_url':      'MIGX_DB_URL',
+    'source':      'MIGX_SOURCE',
+    'load_mode':   'MIGX_LOAD_MODE',
+    'schema':      'MIGX_SCHEMA',
+    'reader':      'MIGX_READER',
+    'vocabulary':  'MIGX_VOCABULARY',
+    'parquet_dir': 'MIGX_PARQUET_DIR',
+    'export_dir':  'MIGX_EXPORT_DIR',
+    'inbox_dir':   'MIGX_INBOX_DIR',
+    'profile':     'MIGX_PROFILE',
+    'profile_rate': 'MIGX_PROFILE_RATE',
+    'profile_dir': 'MIGX_PROFILE_DIR',
+}
+
+
+@dataclass(frozen=True)
+class Config:
+    db_url: str = None
+    source: str = None
+    load_mode: str = 'truncate'
+    schema: str = 'v2'
+    reader: str = 'pandas'
+    vocabulary: str = None
+    parquet_dir: str = 'parquet'
+    export_dir: str = 'export'
+    inbox_dir: str = 'inbox'
+    profile: str = None
+    profile_rate: str = '1'
+    profile_dir: str = 'profiles'
+
+    def merged(self, **overrides) -> 'Config':
+        """Copy with the given values replacing these (None = keep), e.g. command line flags"""
+        return Config(**{**asdict(self), **{k: v for k, v in overrides.items() if v is not None}})
+
+
+def read_dotenv(path: str = '.env'):
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    if Path(path).exists():
+        load_dotenv(path, override=False)
+
+
+def from_env(environ=None) -> Config:
+    if environ is None:
+        read_dotenv()
+        environ = os.environ
+    values = {name: environ[var] for name, var in ENV_VARS.items() if environ.get(var)}
+    return Config(**values)
+
+
+def validate(config: Config) -> list:
+    """Problems found without connecting anywhere (empty list = valid)"""
+    problems = []
+    if config.load_mode not in LOAD_MODES:
+        problems.append(f"{ENV_VARS['load_mode']}={config.load_mode!r}: expected one of {', '.join(LOAD_MODES)}")
+    if config.schema not in SCHEMAS:
+        problems.append(f"{ENV_VARS['schema']}={config.schema!r}: expected one of {', '.join(SCHEMAS)}")
+    elif config.schema == 'v3' and config.load_mode != 'truncate':
+        problems.append("schema v3 is loaded with load mode 'truncate' only")
+    if config.reader not in READERS:
+        problems.append(f"{ENV_VARS['reader']}={config.reader!r}: expected one of {', '.join(READERS)}")
+    if config.db_url:
+        url = urlsplit(config.db_url)
+        if not url.scheme.startswith('postgresql'):
+            problems.append(f"{ENV_VARS['db_url']}: expected a postgresql:// URL, got scheme {url.scheme!r}")
+        elif not (url.hostname or 'host=' in url.query) or not url.path.strip('/'):
+            problems.append(f"{ENV_VARS['db_url']}: host and database name are required")
+    if config.profile and config.profile not in PROFILE_MODES:
+        problems.append(f"{ENV_VARS['profile']}={config.profile!r}: expected one of {', '.join(PROFILE_MODES)}")
+    try:
+        if not 0 <= float(config.profile_rate) <= 1:
+            raise ValueError
+    except ValueError:
+        problems.append(f"{ENV_VARS['profile_rate']}={config.profile_rate!r}: expected a fraction between 0 and 1")
+    if config.source and not Path(config.source).exists():
+        problems.append(f"{ENV_VARS['source']}: file not found: {config.source}")
+    if config.vocabulary and config.vocabulary != 'db' and not Path(config.vocabulary).exists():
+        problems.append(f"{ENV_VARS['vocabulary']}: expected 'db' or a term list file, not found: {config.vocabulary}")
+    return problems
+
+
+def describe(config: Config) -> list:
+    """'name = value' lines for display, with the password of the URL masked"""
+    lines = []
+    for f in fields(config):
+        value = getattr(config, f.name)
+        if f.name == 'db_url' and value:
+            url = urlsplit(value)
+            if url.password:
+                value = value.replace(f":{url.password}@", ":***@", 1)
+        lines.append(f"{f.name:<12} = {value if value is not None else '(script default)'}"
+                     f"{'' if f.name not in ENV_VARS else '  [' + ENV_VARS[f.name] + ']'}")
+    return lines
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from migx import api
+
+
+def study(title, status, conditions=(), phases=()):
+    return {'protocolSection': {
+        'identificationModule': {'briefTitle': title, 'organization': {'fullName': 'ACME', 'class': 'INDUSTRY'}},
+        'statusModule': {'overallStatus': status, 'startDateStruct': {'date': '2020-01'}},
+        'designModule': {'studyType': 'INTERVENTIONAL', 'phases': list(phases)},
+        'conditionsModule': {'conditions': list(conditions), 'keywords': ['ignored']},
+    }, 'derivedSection': {'big': ['ignored'] * 50}}
+
+
+# Recorded pages: (status, page token) → body
+PAGES = {
+    ('COMPLETED', None): {'studies': [study('c1', 'COMPLETED', ['Asthma'], ['PHASE1', 'PHASE2'])], 'nextPageToken': 't2'},
+    ('COMPLETED', 't2'): {'studies': [study('c2', 'COMPLETED')], 'nextPageToken': 't3'},
+    ('COMPLETED', 't3'): {'studies': [study('c3', 'COMPLETED')]},
+    ('RECRUITING', None): {'studies': [study('r1', 'RECRUITING', ['Stroke'])]},
+}
+
+
+async def run_against_mock(state, fail_once=()):
+    failures = set(fail_once)
+    requests = []
+
+    async def handler(request):
+        key = (request.query['filter.overallStatus'], request.query.get('pageToken'))
+        requests.append(key)
+        if key in failures:
+            failures.discard(key)
+            return web.Response(status=503)
+        return web.json_response(PAGES[key])
+
+    app = web.Application()
+    app.router.add_get('/api/v2/studies', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    chunks = []
+    shards = {s: {'filter.overallStatus': s} for s in ('COMPLETED', 'RECRUITING')}
+    try:
+        await api.ingest(f"http://127.0.0.1:{port}/api/v2/studies", shards, state,
+                         lambda df, tokens: chunks.append((df, dict(tokens))), chunk_rows=2)
+    finally:
+        await runner.cleanup()
+    return chunks, requests
+
+
+def test_page_decoder_keeps_only_mapped_fields_across_split_reads():
+    body = json.dumps(PAGES[('COMPLETED', None)]).encode()
+    decoder = api.PageDecoder()
+    for i in range(0, len(body), 7):
+        decoder.feed(body[i:i + 7])
+    rows, token = decoder.close()
+    assert token == 't2'
+    assert rows == [{'brief_title': 'c1', 'org_name': 'ACME', 'org_class': 'INDUSTRY',
+                     'overall_status': 'COMPLETED', 'start_date': '2020-01', 'study_type': 'INTERVENTIONAL',
+                     'phase': 'PHASE1|PHASE2', 'conditions': 'Asthma'}]
+
+
+def test_ingest_fetches_all_shards_and_retries_failed_pages():
+    chunks, requests = asyncio.run(run_against_mock({}, fail_once=[('COMPLETED', 't2')]))
+    titles = sorted(t for df, _ in chunks for t in df['brief_title'])
+    assert titles == ['c1', 'c2', 'c3', 'r1']
+    assert requests.count(('COMPLETED', 't2')) == 2
+    final = {}
+    for _, tokens in chunks:
+        final.update(tokens)
+    assert final == {'COMPLETED': None, 'RECRUITING': None}
+    assert list(chunks[0][0].columns) == api.COLUMNS
+
+
+def test_ingest_resumes_from_saved_tokens():
+    state = {'COMPLETED': {'token': 't3', 'done': False}, 'RECRUITING': {'token': None, 'done': True}}
+    chunks, requests = asyncio.run(run_against_mock(state))
+    assert requests == [('COMPLETED', 't3')]
+    assert [t for df, _ in chunks for t in df['brief_title']] == ['c3']
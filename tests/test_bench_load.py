@@ -0,0 +1,33 @@
+import pandas as pd
+from sqlalchemy import create_engine
+
+from migx import bench
+
+
+def test_timed_writes_counts_rows_per_table_and_restores_to_sql():
+    original = pd.DataFrame.to_sql
+    engine = create_engine("sqlite://")
+    df = pd.DataFrame({'study_key': ['a', 'b', 'c']})
+
+    with engine.begin() as conn, bench.timed_writes({}) as stats:
+        df.to_sql('studies_new', conn, index=False)            # shadow table counts as studies
+        df.iloc[:1].to_sql('studies', conn, index=False)
+        df.to_sql('conditions', conn, index=False)
+
+    assert {t: s['rows'] for t, s in stats.items()} == {'studies': 4, 'conditions': 3}
+    assert all(s['write_s'] >= 0 for s in stats.values())
+    assert pd.DataFrame.to_sql is original
+
+
+def test_summarize_computes_throughput_per_table():
+    run = {'wall_s': 2.0, 'peak_rss_mb': 150.0, 'rss_before_mb': 90.0,
+           'writes': {'studies': {'rows': 1000, 'write_s': 0.5}, 'conditions': {'rows': 300, 'write_s': 0.1}}}
+    tables = {'studies': {'table_rows': 1000, 'size_mb': 0.4},
+              'conditions': {'table_rows': 300, 'size_mb': 0.1},
+              'study_conditions': {'table_rows': 0, 'size_mb': 0.0}}
+
+    r = bench.summarize(1000, 'truncate', run, tables, wal=3 * 2**20)
+
+    assert (r['wall_s'], r['studies_per_s'], r['wal_mb'], r['peak_rss_mb']) == (2.0, 500, 3.0, 150.0)
+    assert r['tables']['studies'] == {'table_rows': 1000, 'size_mb': 0.4, 'write_s': 0.5, 'rows_per_s': 2000}
+    assert r['tables']['study_conditions']['rows_per_s'] is None
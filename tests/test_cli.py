@@ -0,0 +1,68 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import migx
+from migx import cli, config
+
+
+def test_cli_help_and_config_do_not_import_pandas_or_sqlalchemy():
+    code = (
+        "import sys\n"
+        "from migx import cli\n"
+        "assert cli.main(['config']) == 0\n"
+        "print(sorted(m for m in ('pandas', 'sqlalchemy', 'numpy') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=Path(__file__).resolve().parents[1])
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_config_from_env_validation_and_masking(tmp_path):
+    source = tmp_path / "clin_trials.csv"
+    source.write_text("x\n", encoding="utf-8")
+    env = {'MIGX_DB_URL': 'postgresql://u:secret@db:5432/clinical_db', 'MIGX_SOURCE': str(source),
+           'MIGX_LOAD_MODE': 'swap', 'MIGX_EXPORT_DIR': ''}
+    conf = config.from_env(env)
+
+    assert (conf.load_mode, conf.schema, conf.export_dir) == ('swap', 'v2', 'export')
+    assert config.validate(conf) == []
+    assert any(':***@db' in line for line in config.describe(conf))
+    assert all('secret' not in line for line in config.describe(conf))
+
+    bad = conf.merged(schema='v3', db_url='mysql://db/x', source=str(tmp_path / 'missing.csv'))
+    problems = config.validate(bad)
+    assert len(problems) == 3
+    assert conf.merged(load_mode=None) == conf           # unset flags keep the environment value
+
+
+def test_cli_rejects_invalid_config_before_loading_scripts(capsys):
+    parser = cli.build_parser()
+    args = parser.parse_args(['--db-url', 'postgresql://u@h/db', 'load', '--mode', 'resume', '--schema', 'v3'])
+    assert (args.db_url, args.load_mode, args.schema) == ('postgresql://u@h/db', 'resume', 'v3')
+
+    assert cli.main(['load', '--mode', 'resume', '--schema', 'v3']) == 2
+    assert "v3" in capsys.readouterr().err
+
+
+def test_scripts_are_loaded_once_as_package_modules():
+    upload = migx.load_script('upload')
+
+    assert upload is migx.upload is sys.modules['migx.upload']
+    assert upload.__name__ == 'migx.upload'
+    try:
+        migx.not_a_module
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("unknown attributes must raise AttributeError")
+
+
+def test_scripts_share_their_siblings_with_the_package():
+    # Each script resolves its siblings through load_script(): one module object per script
+    assert migx.worker.upload is migx.upload
+    assert migx.history.upload is migx.upload
+    assert migx.keys.history is migx.history
+    assert migx.async_upload.upload is migx.upload
+    assert migx.api.upload is migx.upload
@@ -0,0 +1,48 @@
+import pandas as pd
+
+from migx import cohorts
+
+
+def sample_frames():
+    studies = pd.DataFrame({
+        'study_key':      ['d' * 16, 'a' * 16, 'c' * 16, 'b' * 16],
+        'overall_status': ['COMPLETED', 'COMPLETED', 'RECRUITING', 'COMPLETED'],
+        'phase':          ['PHASE3', None, 'PHASE3', 'PHASE2'],
+        'study_type':     ['INTERVENTIONAL', 'OBSERVATIONAL', 'INTERVENTIONAL', 'INTERVENTIONAL'],
+        'start_year':     [2018, 2010, None, 2016],
+    })
+    relations = pd.DataFrame({
+        'study_key':      ['a' * 16, 'b' * 16, 'b' * 16, 'd' * 16, 'c' * 16, 'zzz'],
+        'condition_name': ['asthma', 'diabetes', 'obesity', 'diabetes', 'café', 'asthma'],
+    })
+    return studies, relations
+
+
+def test_build_bitmaps_uses_key_order_ordinals():
+    keys, bitmaps = cohorts.build_bitmaps(*sample_frames())
+
+    assert [k.decode() for k in keys] == ['a' * 16, 'b' * 16, 'c' * 16, 'd' * 16]
+    assert list(bitmaps['status']['COMPLETED']) == [0, 1, 3]
+    assert 'None' not in bitmaps['phase'] and 'nan' not in bitmaps['start_year']
+    assert list(bitmaps['start_year']['2016']) == [1]
+    # relations to unknown studies are ignored
+    assert list(bitmaps['condition']['asthma']) == [0]
+
+
+def test_saved_index_answers_cohorts(tmp_path):
+    path = str(tmp_path / "cohorts.idx")
+    cohorts.save_index(path, *cohorts.build_bitmaps(*sample_frames()))
+
+    index = cohorts.CohortIndex(path)
+    try:
+        cohort = index.cohort(status=['COMPLETED'], study_type=['INTERVENTIONAL'],
+                              any_conditions=['diabetes', 'asthma'], year_from=2016)
+        assert index.study_keys(cohort) == ['b' * 16, 'd' * 16]
+        assert len(index.cohort(all_conditions=['diabetes', 'obesity'])) == 1
+        assert len(index.cohort(phase=['PHASE3'], no_conditions=['café'])) == 1
+        assert len(index.cohort(year_to=2015)) == 1
+        assert len(index.cohort()) == 4
+        assert len(index.cohort(any_conditions=['unknown'])) == 0
+        assert index.values('study_type') == ['INTERVENTIONAL', 'OBSERVATIONAL']
+    finally:
+        index.close()
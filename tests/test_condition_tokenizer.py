@@ -0,0 +1,44 @@
+import pandas as pd
+import pyarrow as pa
+
+from migx import tokenizer, upload
+
+
+def conditions_of(cond_df):
+    return {k: sorted(g['condition_name'].astype(str)) for k, g in cond_df.groupby('study_key')}
+
+
+def test_known_names_with_commas_are_kept_whole_and_the_rest_is_split():
+    tok = tokenizer.ConditionTokenizer(['Carcinoma, Non-Small-Cell Lung', 'Carcinoma', 'Diabetes Mellitus, Type 2',
+                                        'Lung Neoplasms'])
+    assert len(tok) == 2                # single-fragment names are what the split gives anyway
+    df = pd.DataFrame({'study_key': ['s1', 's2', 's3', 's4'], 'conditions': [
+        'Carcinoma, Non-Small-Cell Lung|Asthma',
+        'diabetes mellitus ,  type 2, Carcinoma, Non-Small-Cell Lung, Carcinoma',
+        None,
+        'Carcinoma, Non-Small-Cell Lung Cancer',        # not a known name: falls back to the split
+    ]})
+    expected = {
+        's1': ['asthma', 'carcinoma, non-small-cell lung'],
+        's2': ['carcinoma', 'carcinoma, non-small-cell lung', 'diabetes mellitus, type 2'],
+        's4': ['carcinoma', 'non-small-cell lung cancer'],
+    }
+    assert conditions_of(upload.extract_conditions(df, tok)) == expected
+    arrow_df = df.astype({'conditions': pd.ArrowDtype(pa.string())})
+    assert conditions_of(upload.extract_conditions(arrow_df, tok)) == expected
+
+
+def test_vocabulary_without_separators_gives_the_split(tmp_path, monkeypatch, caplog):
+    terms = tmp_path / "terms.txt"
+    terms.write_text("# MeSH subset\nAsthma\n\nLung Neoplasms\n", encoding="utf-8")
+    tok = tokenizer.load_tokenizer(str(terms))
+    assert len(tok) == 0
+    assert 'no term with a comma or pipe' in caplog.text
+
+    # A database loaded without a term list only holds split fragments
+    caplog.clear()
+    monkeypatch.setattr(tokenizer, 'vocabulary_from_db', lambda db_url: ['asthma', 'lung neoplasms'])
+    assert len(tokenizer.load_tokenizer('db', 'postgresql://unused')) == 0
+    assert '--vocabulary FILE' in caplog.text
+    df = pd.DataFrame({'study_key': ['s1', 's2'], 'conditions': ['Asthma, Cold|x', 'Lung Neoplasms']})
+    assert conditions_of(upload.extract_conditions(df, tok)) == conditions_of(upload.extract_conditions(df))
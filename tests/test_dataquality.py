@@ -0,0 +1,67 @@
+from migx import quality
+
+
+def test_estimate_share_wilson_interval():
+    p, low, high = quality.estimate_share([10] * 10, [100] * 10, 'BERNOULLI')
+    assert p == 0.1 and low < 0.1 < high
+
+    # No hits: the interval still has a positive upper bound
+    p, low, high = quality.estimate_share([0] * 20, [100] * 20, 'BERNOULLI')
+    assert p == 0 and low == 0 and 0 < high < 0.002
+
+
+def test_estimate_share_widens_for_clustered_pages():
+    # Same 10% overall, but all hits packed in a few pages
+    spread = quality.estimate_share([10] * 10, [100] * 10, 'SYSTEM')
+    packed = quality.estimate_share([100] + [0] * 9, [100] * 10, 'SYSTEM')
+    assert spread[0] == packed[0] == 0.1
+    assert (packed[2] - packed[1]) > (spread[2] - spread[1])
+
+
+def test_sample_counts_rejects_unknown_method():
+    try:
+        quality.sample_counts(None, 1.0, 'RANDOM')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_gate_decision_escalates_only_when_the_interval_straddles_the_threshold():
+    assert quality.gate_decision(0.001, 0.004, 0.01) == 'pass'
+    assert quality.gate_decision(0.42, 0.46, 0.05) == 'fail'        # clearly above: no exact scan
+    assert quality.gate_decision(0.008, 0.012, 0.01) == 'exact'
+
+
+def test_parse_thresholds_overrides_known_metrics_only():
+    assert quality.parse_thresholds(['empty_dates=0.4']) == {'empty_dates': 0.4}
+    assert quality.parse_thresholds(None) == {}
+    for bad in (['nope=0.1'], ['empty_dates=2']):
+        try:
+            quality.parse_thresholds(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"expected ValueError for {bad}")
+
+
+class _RecordingConn:
+    def __init__(self, row):
+        self.row, self.sql = row, []
+
+    def execute(self, statement):
+        self.sql.append(str(statement))
+        return self
+
+    def first(self):
+        return self.row
+
+
+def test_exact_shares_adds_the_num_cond_subquery_only_for_condition_metrics():
+    conn = _RecordingConn((100, 44))
+    assert quality.exact_shares(conn, ['empty_dates']) == {'empty_dates': (44, 100)}
+    assert 'study_conditions' not in conn.sql[-1]
+
+    conn = _RecordingConn((100, 3, 1))
+    quality.exact_shares(conn, ['empty_titles', 'no_conditions'])
+    assert 'study_conditions' in conn.sql[-1]
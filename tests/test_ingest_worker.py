@@ -0,0 +1,65 @@
+import os
+
+from migx import worker
+
+
+def test_drop_directory_debounces_until_files_stop_changing(tmp_path):
+    drop = worker.DropDirectory(tmp_path, debounce=2.0)
+    a = tmp_path / "a.csv"
+    a.write_text("x\n", encoding="utf-8")
+    (tmp_path / "b.csv.part").write_text("still copying", encoding="utf-8")
+    (tmp_path / ".hidden.csv").write_text("x", encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("x", encoding="utf-8")
+
+    assert drop.scan(now=100.0) == []                    # first sighting
+    assert drop.scan(now=101.0) == []                    # unchanged, but not for 2 s yet
+    a.write_text("x\ny\n", encoding="utf-8")             # still growing: the clock restarts
+    assert drop.scan(now=102.5) == []
+    assert drop.scan(now=104.0) == []
+    assert drop.scan(now=104.5) == [a]
+    assert list(drop.pending) == [a]
+
+    os.remove(a)
+    assert drop.scan(now=110.0) == [] and drop.pending == {} and drop.oldest_arrival() is None
+
+
+def test_ingest_metrics_snapshot():
+    metrics = worker.IngestMetrics(window=2)
+    metrics.started = 1000.0
+    metrics.applied("a.csv", 100, 1.0, arrival=0.0)
+    metrics.applied("b.csv", 300, 1.0, arrival=0.0)
+    metrics.applied("c.csv", 500, 1.0, arrival=0.0)      # window keeps the last two files
+    metrics.failed("d.csv")
+    metrics.queue(3, oldest_arrival=1050.0)
+
+    snap = metrics.snapshot(now=1060.0)
+    assert (snap['queue_depth'], snap['lag_s'], snap['uptime_s']) == (3, 10.0, 60.0)
+    assert (snap['files_applied'], snap['files_failed'], snap['studies_applied']) == (3, 1, 900)
+    assert snap['studies_per_s'] == 400.0
+    assert snap['last_file'] == "d.csv"
+
+
+def test_connection_errors_keep_the_file_queued_and_data_errors_fail_it(tmp_path, monkeypatch):
+    from sqlalchemy.exc import DataError, OperationalError
+    ingest = worker.IngestWorker(inbox=str(tmp_path / "inbox"), db_url=f"sqlite:///{tmp_path / 'db.sqlite'}",
+                                 debounce=0)
+    delta = ingest.inbox / "delta.csv"
+    delta.write_text("Brief Title\nA\n", encoding="utf-8")
+    ingest.drop.scan()
+
+    def database_restarting(path):
+        raise OperationalError("INSERT ...", {}, Exception("server closed the connection unexpectedly"),
+                               connection_invalidated=True)
+    monkeypatch.setattr(ingest, 'apply_file', database_restarting)
+    assert ingest.process_ready() == 0
+    assert delta.exists() and ingest.retry_at > 0 and ingest.metrics.files_failed == 0
+    assert list(ingest.drop.pending) == [delta]
+
+    def bad_value(path):
+        raise DataError("INSERT ...", {}, Exception("value too long for type character varying(16)"))
+    monkeypatch.setattr(ingest, 'apply_file', bad_value)
+    ingest.retry_at = 0.0
+    ingest.process_ready()
+    assert not delta.exists() and (ingest.inbox / "failed" / "delta.csv").exists()
+    assert ingest.metrics.files_failed == 1
+    ingest.engine.dispose()
@@ -0,0 +1,58 @@
+import hashlib
+
+import pandas as pd
+
+from migx import keys
+
+
+def _key(i):
+    return hashlib.md5(str(i).encode()).hexdigest()[:16]
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives(tmp_path):
+    bits, hashes = keys.bloom_size(10_000, 0.01)
+    assert bits % 8 == 0 and hashes == 7
+    bloom = keys.BloomFilter(tmp_path / "k.bloom", bits, hashes, create=True)
+    stored = [_key(i) for i in range(10_000)]
+    bloom.add(stored)
+    assert bloom.might_contain(stored).all()
+    assert bloom.might_contain([_key(i) for i in range(10_000, 20_000)]).mean() < 0.03
+    bloom.close()
+
+
+def test_key_index_classifies_persists_and_grows(tmp_path):
+    path = tmp_path / "keys.sqlite"
+    with keys.KeyIndex(path, capacity=100) as index:
+        index.record([_key(i) for i in range(150)], ['h'] * 150, 'a.csv')    # beyond capacity: filter rebuilt
+        assert index.stats()['bloom_capacity'] >= 300
+
+    with keys.KeyIndex(path) as index:
+        kinds = index.classify([_key(0), _key(1), _key(999)], ['h', 'other', 'h'])
+        assert kinds.tolist() == ['duplicate', 'changed', 'new']
+        assert len(index) == 150
+
+
+def test_process_file_dedupes_across_chunks_and_files(tmp_path):
+    rows = pd.DataFrame({'Brief Title': ['a', 'b', 'a', 'c'], 'Overall Status': ['COMPLETED'] * 4,
+                         'Conditions': ['flu', 'asthma', 'flu', 'cold']})
+    first, second = tmp_path / "first.csv", tmp_path / "second.csv"
+    rows.iloc[:2].to_csv(first, index=False)
+    rows.to_csv(second, index=False)
+    with keys.KeyIndex(tmp_path / "keys.sqlite") as index:
+        keys.process_file(index, str(first))
+        out = tmp_path / "second.new.csv"
+        totals = keys.process_file(index, str(second), str(out), chunk_rows=2)
+    assert (totals['new'], totals['duplicate']) == (1, 3)
+    assert pd.read_csv(out)['Brief Title'].tolist() == ['c']
+
+
+def test_key_count_is_kept_in_meta_and_counts_only_new_keys(tmp_path):
+    path = tmp_path / "keys.sqlite"
+    with keys.KeyIndex(path, capacity=100) as index:
+        index.record([_key(i) for i in range(10)], ['h'] * 10, 'a.csv')
+        index.record([_key(i) for i in range(5, 15)] + [_key(14)], ['h2'] * 11, 'b.csv')   # 5 known, 1 repeated
+        assert len(index) == 15
+
+    with keys.KeyIndex(path) as index:
+        assert len(index) == 15
+        assert dict(index.conn.execute("SELECT name, value FROM meta"))['key_count'] == '15'
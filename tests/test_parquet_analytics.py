@@ -0,0 +1,66 @@
+import pandas as pd
+
+from migx import analytics, catalog
+
+
+def test_query_catalog_names_sections_and_statements(tmp_path):
+    sql = tmp_path / "q.sql"
+    sql.write_text(
+        "-- ====================\n"
+        "-- 1. FIRST\n"
+        "-- ====================\n"
+        "SELECT 1 AS a,  -- inline\n"
+        "       '--x' AS b;\n"
+        "-- ====================\n"
+        "-- 2. COMMENT ONLY\n"
+        "-- ====================\n"
+        "-- SELECT 2;\n"
+        "-- ====================\n"
+        "-- 3. TWO STATEMENTS\n"
+        "-- ====================\n"
+        "SELECT 3;\n"
+        "SELECT 4;  -- trailing\n"
+        "-- 4. not a section (no banner)\n"
+        "SELECT 5;\n",
+        encoding="utf-8",
+    )
+    queries = catalog.load_queries(sql)
+
+    assert [q['name'] for q in queries] == ['1', '3.1', '3.2', '3.3']
+    assert queries[0]['sql'] == "SELECT 1 AS a,\n       '--x' AS b"
+    assert queries[1]['title'] == 'TWO STATEMENTS'
+    # every statement of analytics/queries.sql is found
+    assert [q['name'] for q in catalog.load_queries()] == [str(n) for n in range(1, 10)]
+
+
+def test_duckdb_runs_named_queries_over_parquet(tmp_path):
+    studies = pd.DataFrame({
+        'study_key': ['k1', 'k2', 'k3'],
+        'brief_title': ['A', 'B', 'C'],
+        'org_name': ['Org', 'Org', None],
+        'overall_status': ['COMPLETED', 'RECRUITING', 'COMPLETED'],
+        'study_type': ['INTERVENTIONAL'] * 3,
+        'phase': ['PHASE3', None, 'PHASE3'],
+        'start_date': pd.to_datetime(['2010-01-01', None, '2012-06-30']),
+    })
+    cond_df = pd.DataFrame({'study_key': ['k1', 'k2', 'k1'],
+                            'condition_name': ['asthma', 'asthma', 'obesity']})
+    for table, df in analytics.build_tables(studies, cond_df).items():
+        types = analytics.STUDY_TYPES if table == 'studies' else None
+        analytics.write_parquet(df, tmp_path / f"{table}.parquet", types)
+
+    results = analytics.run_queries(str(tmp_path), ['1', '6'])
+
+    q1 = results['1'].set_index('phase')
+    assert q1.loc['PHASE3', 'number_of_studies'] == 2
+    assert q1.loc['NOT_SPECIFIED', 'completed'] == 0
+    assert dict(zip(results['6']['num_conditions'], results['6']['number_of_studies'])) == {0: 1, 1: 1, 2: 1}
+
+
+def test_results_match_ignores_order_and_numeric_types():
+    pg = [('a', 2, 66.67), ('b', 1, 33.33)]
+    duck = [('b', 1, 33.33), ('a', 2, 66.67)]
+
+    assert analytics.results_match(pg, duck)
+    assert not analytics.results_match(pg, [('a', 2, 66.67), ('b', 1, 33.34)])
+    assert not analytics.results_match(pg, duck[:1])
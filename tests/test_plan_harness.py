@@ -0,0 +1,90 @@
+from migx import plans
+
+
+# EXPLAIN (FORMAT JSON) of query 2, trimmed to the keys the harness reads
+QUERY2_PLAN = {
+    "Node Type": "Limit", "Actual Rows": 20, "Shared Hit Blocks": 5000, "Shared Read Blocks": 656,
+    "Plans": [
+        {"Node Type": "Aggregate", "Strategy": "Sorted",
+         "Plans": [
+             {"Node Type": "Hash Join", "Join Type": "Left", "Hash Cond": "((sc.study_key)::text = (s.study_key)::text)",
+              "Plans": [
+                  {"Node Type": "Hash Join", "Join Type": "Right", "Hash Cond": "(sc.condition_id = c.id)",
+                   "Plans": [
+                       {"Node Type": "Seq Scan", "Relation Name": "study_conditions", "Alias": "sc"},
+                       {"Node Type": "Hash", "Plans": [
+                           {"Node Type": "Seq Scan", "Relation Name": "conditions", "Alias": "c"}]},
+                   ]},
+                  {"Node Type": "Hash", "Plans": [
+                      {"Node Type": "Seq Scan", "Relation Name": "studies", "Alias": "s"}]},
+              ]},
+         ]},
+    ],
+}
+
+INDEXES = {
+    'studies': [{'name': 'studies_pkey', 'columns': ['study_key'], 'primary': True}],
+    'conditions': [{'name': 'conditions_pkey', 'columns': ['id'], 'primary': True}],
+    'study_conditions': [{'name': 'study_conditions_pkey', 'columns': ['study_key', 'condition_id'], 'primary': True}],
+}
+
+
+def test_plan_shape_keeps_structure_without_costs():
+
+    assert plans.plan_shape(QUERY2_PLAN) == (
+        "Limit(Sorted Aggregate(Hash Join[Left](Hash Join[Right](Seq Scan on study_conditions, "
+        "Hash(Seq Scan on conditions)), Hash(Seq Scan on studies))))"
+    )
+    index_scan = {"Node Type": "Index Only Scan", "Index Name": "studies_pkey", "Relation Name": "studies"}
+    assert plans.node_label(index_scan) == "Index Only Scan using studies_pkey on studies"
+
+
+def test_advisor_suggests_reordered_key_for_unindexed_join_column():
+
+    assert plans.join_columns(QUERY2_PLAN) == {
+        ('study_conditions', 'study_key'), ('study_conditions', 'condition_id'),
+        ('studies', 'study_key'), ('conditions', 'id'),
+    }
+    suggestions = plans.suggest_indexes({'2': QUERY2_PLAN, '2b': QUERY2_PLAN}, INDEXES)
+    assert suggestions == [{
+        'table': 'study_conditions',
+        'columns': ['condition_id', 'study_key'],
+        'queries': ['2', '2b'],
+        'sql': "CREATE INDEX idx_study_conditions_condition_id_study_key ON study_conditions (condition_id, study_key)",
+    }]
+
+    # Once the index exists there is nothing left to suggest
+    indexes = dict(INDEXES, study_conditions=INDEXES['study_conditions'] + [
+        {'name': 'idx_sc_cond', 'columns': ['condition_id', 'study_key'], 'primary': False}])
+    assert plans.suggest_indexes({'2': QUERY2_PLAN}, indexes) == []
+
+
+def test_compare_to_baseline_flags_plan_time_and_buffer_regressions():
+    shape = plans.plan_shape(QUERY2_PLAN)
+    baseline = {'queries': {
+        '1': {'shape': 'Seq Scan on studies', 'execution_ms': 50.0, 'buffers': 100},
+        '2': {'shape': shape, 'execution_ms': 2.0, 'buffers': 100},
+        '3': {'shape': shape, 'execution_ms': 100.0, 'buffers': 100},
+    }}
+    results = {
+        '1': {'shape': 'Index Scan using idx on studies', 'execution_ms': 55.0, 'buffers': 100},
+        '2': {'shape': shape, 'execution_ms': 4.0, 'buffers': 120},       # 2x but under SLOWER_MIN_MS
+        '3': {'shape': shape, 'execution_ms': 200.0, 'buffers': 400},
+        '4': {'shape': shape, 'execution_ms': 1.0, 'buffers': 1},         # not in the baseline
+    }
+
+    assert plans.compare_to_baseline(results, baseline) == {
+        '1': ['PLAN CHANGED'],
+        '3': ['SLOWER', 'MORE BUFFERS'],
+    }
+
+
+def test_compare_to_baseline_skips_shapes_across_major_versions():
+    baseline = {'server_version': '16.2', 'queries': {
+        '1': {'shape': 'Seq Scan on studies', 'execution_ms': 50.0, 'buffers': 100}}}
+    results = {'1': {'shape': 'Index Scan using idx on studies', 'execution_ms': 50.0, 'buffers': 100}}
+
+    assert plans.server_major('15.4 (Debian 15.4-1.pgdg120+1)') == '15'
+    assert plans.server_major('9.6.24') == '9.6'
+    assert plans.compare_to_baseline(results, baseline, server_version='15.4') == {}
+    assert plans.compare_to_baseline(results, baseline, server_version='16.4') == {'1': ['PLAN CHANGED']}
@@ -0,0 +1,51 @@
+import json
+import time
+
+from migx import config as cfg
+from migx import profiling
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_sample_profile_writes_collapsed_stacks_per_stage(tmp_path, monkeypatch):
+    monkeypatch.setitem(profiling.INTERVALS, 'sample', 0.001)
+    with profiling.Profiler('sample', tmp_path, 'load-swap') as profiler:
+        with profiler.stage('transform'):
+            _busy(0.1)
+            with profiler.stage('keys'):
+                _busy(0.05)
+
+    summary = json.loads((profiler.run_dir / 'summary.json').read_text())
+    assert [s['stage'] for s in summary['stages']] == ['transform/keys', 'transform']
+    assert all(s['samples'] > 0 and s['wall_s'] > 0 for s in summary['stages'])
+    lines = (profiler.run_dir / 'stacks.collapsed').read_text().splitlines()
+    assert any(line.startswith('transform;') and '_busy (test_profiling.py' in line for line in lines)
+    stack, count = (profiler.run_dir / 'transform_keys.collapsed').read_text().splitlines()[0].rsplit(' ', 1)
+    assert int(count) > 0 and not stack.startswith('transform')
+
+
+def test_full_profile_has_pstats_and_allocation_sites(tmp_path):
+    with profiling.Profiler('full', tmp_path, 'quality') as profiler:
+        profiler.begin('allocate')
+        kept = [bytearray(1024) for _ in range(2000)]
+        profiler.begin('report')
+    assert len(kept) == 2000
+
+    files = {p.name for p in profiler.run_dir.iterdir()}
+    assert {'allocate.pstats', 'allocate.alloc.txt', 'report.pstats', 'summary.json'} <= files
+    sites = (profiler.run_dir / 'allocate.alloc.txt').read_text()
+    assert 'test_profiling.py' in sites.splitlines()[1]
+    stages = json.loads((profiler.run_dir / 'summary.json').read_text())['stages']
+    assert stages[0]['stage'] == 'allocate' and stages[0]['top_functions']
+
+
+def test_profile_rate_and_config_validation():
+    assert profiling.maybe_profiler('sample', rate=0.0) is None
+    assert profiling.maybe_profiler(None) is None
+    assert isinstance(profiling.maybe_profiler('full', rate=1.0), profiling.Profiler)
+    problems = cfg.validate(cfg.Config(profile='cprofile', profile_rate='2'))
+    assert len(problems) == 2 and 'MIGX_PROFILE=' in problems[0] and 'MIGX_PROFILE_RATE' in problems[1]
@@ -0,0 +1,46 @@
+import json
+from datetime import date
+
+import pytest
+
+from migx import loadtest, service
+
+
+def test_parse_page_params_defaults_and_caps():
+    params = service.parse_page_params({})
+    assert params == {'status': None, 'phase': None, 'after': '', 'limit': service.DEFAULT_PAGE_SIZE}
+
+    params = service.parse_page_params({'status': ['completed'], 'phase': ['phase3'],
+                                        'after': ['00ff'], 'limit': ['999999']})
+    assert params['status'] == 'COMPLETED'
+    assert params['phase'] == 'PHASE3'
+    assert params['after'] == '00ff'
+    assert params['limit'] == service.MAX_PAGE_SIZE
+
+    with pytest.raises(ValueError):
+        service.parse_page_params({'limit': ['-1']})
+
+
+def test_iter_json_page_sets_keyset_cursor_only_on_full_pages():
+    rows = [
+        ('a1', 'T1', 'Org', 'COMPLETED', 'PHASE3', 'INTERVENTIONAL', date(2020, 1, 1)),
+        ('b2', 'T2', 'Org', 'COMPLETED', None, 'INTERVENTIONAL', None),
+    ]
+    full = json.loads(b''.join(service.iter_json_page(rows, limit=2)))
+    assert [s['study_key'] for s in full['studies']] == ['a1', 'b2']
+    assert full['studies'][0]['start_date'] == '2020-01-01'
+    assert full['next_after'] == 'b2'
+
+    short = json.loads(b''.join(service.iter_json_page(rows, limit=5)))
+    assert short['count'] == 2 and short['next_after'] is None
+
+    empty = json.loads(b''.join(service.iter_json_page([], limit=5)))
+    assert empty['studies'] == [] and empty['next_after'] is None
+
+
+def test_loadtest_percentile_and_paths():
+    values = [i / 1000 for i in range(1, 101)]
+    assert loadtest.percentile(values, 50) == 0.05
+    assert loadtest.percentile(values, 99) == 0.099
+    assert loadtest.build_path('breast cancer', 'COMPLETED', None, 'ab', 10) == \
+        "/conditions/breast%20cancer/studies?limit=10&status=COMPLETED&after=ab"
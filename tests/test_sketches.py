@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from migx import sketches
+
+
+def zipf_relations(n, seed):
+    rng = np.random.default_rng(seed)
+    names = [f"cond-{i}" for i in rng.zipf(1.3, n) % 20_000]
+    return pd.DataFrame({'study_key': [f"s{seed}-{i}" for i in range(n)], 'condition_name': names})
+
+
+def test_merged_chunk_sketches_bound_the_exact_counts():
+    chunks = [zipf_relations(20_000, seed) for seed in range(4)]
+    merged = sketches.LoadSketches()
+    for rel in chunks:
+        part = sketches.LoadSketches()
+        part.conditions_top = sketches.SpaceSaving(200)
+        part.update(rel[['study_key']].assign(overall_status='COMPLETED', org_name='x'), rel)
+        merged.conditions_top.capacity = 200
+        merged.merge(part)
+
+    exact = pd.concat(chunks)['condition_name'].value_counts()
+    top = merged.top_conditions(20).set_index('condition_name')
+    true = exact.reindex(top.index)
+    assert (top['lower'] <= true).all() and (true <= top['estimate']).all()
+    assert list(top.index[:5]) == list(exact.index[:5])
+    assert merged.studies == 80_000 and merged.statuses == {'COMPLETED': 80_000}
+
+    distinct = merged.conditions_distinct
+    assert abs(distinct.estimate() - len(exact)) <= 3 * distinct.std_error() * len(exact)
+
+
+def test_hll_merge_and_serialization_round_trip():
+    a, b = sketches.LoadSketches(), sketches.LoadSketches()
+    studies = pd.DataFrame({'study_key': ['k1', 'k2', 'k3'], 'overall_status': ['COMPLETED', 'RECRUITING', 'COMPLETED'],
+                            'org_name': ['Org A', 'Org B', None]})
+    a.update(studies.iloc[:2], pd.DataFrame({'study_key': ['k1'], 'condition_name': ['asthma']}))
+    b.update(studies.iloc[2:], pd.DataFrame())
+    a.merge(b)
+
+    restored = sketches.LoadSketches.from_bytes(a.to_bytes())
+    summary = dict((metric, value) for metric, value, _ in restored.summary())
+    assert summary['Total Studies'] == 3
+    assert summary['Completed Studies'] == 2
+    assert summary['Participating Organizations'] == 2
+    assert summary['Studies with No Assigned Conditions'] == 2
+    assert restored.top_conditions(5)['condition_name'].tolist() == ['asthma']
+    assert np.array_equal(restored.conditions_freq.table, a.conditions_freq.table)
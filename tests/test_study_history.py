@@ -0,0 +1,36 @@
+import pandas as pd
+
+from migx import history
+
+
+def test_diff_snapshots_merges_sorted_streams():
+    previous = [('a', 'h1'), ('b', 'h2'), ('d', 'h4'), ('e', 'h5')]
+    current = [('b', 'h2'), ('c', 'h3'), ('d', 'h4x'), ('f', 'h6')]
+    ops = list(history.diff_snapshots(iter(previous), iter(current)))
+    assert ops == [('removed', 'a'), ('unchanged', 'b'), ('new', 'c'), ('changed', 'd'),
+                   ('removed', 'e'), ('new', 'f')]
+    assert list(history.diff_snapshots([], [('a', 'h')])) == [('new', 'a')]
+
+    try:
+        list(history.diff_snapshots([], [('b', 'h'), ('a', 'h')]))
+    except ValueError as e:
+        assert 'not sorted' in str(e)
+    else:
+        raise AssertionError("unsorted input should be rejected")
+
+
+def test_content_hash_ignores_row_and_condition_order():
+    studies = pd.DataFrame({'study_key': ['k1', 'k2'], 'brief_title': ['A', 'B'],
+                            'overall_status': ['COMPLETED', 'RECRUITING'],
+                            'start_date': pd.to_datetime(['2020-01-01', None])})
+    cond = pd.DataFrame({'study_key': ['k1', 'k1', 'k2'], 'condition_name': ['flu', 'asthma', 'flu']})
+    lists = history.conditions_lists(studies, cond)
+    assert lists.tolist() == ['asthma | flu', 'flu']
+    hashes = history.content_hashes(studies, lists)
+
+    reordered = studies.iloc[::-1].reset_index(drop=True)
+    again = history.content_hashes(reordered, history.conditions_lists(reordered, cond.iloc[::-1]))
+    assert dict(zip(studies['study_key'], hashes)) == dict(zip(reordered['study_key'], again))
+
+    changed = studies.assign(overall_status=['COMPLETED', 'COMPLETED'])
+    assert (history.content_hashes(changed, lists) == hashes).tolist() == [True, False]
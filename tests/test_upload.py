@@ -1,20 +1,13 @@
-import importlib.util
-from pathlib import Path
+import contextlib
+import types
+
 import pandas as pd
 import numpy as np
 
-
-def load_upload_module():
-    repo_root = Path(__file__).resolve().parents[1]
-    module_path = repo_root / "database" / "02-upload.py"
-    spec = importlib.util.spec_from_file_location("upload_mod", str(module_path))
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
+from migx import upload
 
 
 def test_generate_study_key_deterministic():
-    mod = load_upload_module()
     row1 = {
         'brief_title': 'Test Study',
         'full_title': 'Test Study Full',
@@ -23,27 +16,26 @@ def test_generate_study_key_deterministic():
     }
     row2 = dict(row1)
     # same content -> same key
-    k1 = mod.generate_study_key(row1)
-    k2 = mod.generate_study_key(row2)
+    k1 = upload.generate_study_key(row1)
+    k2 = upload.generate_study_key(row2)
     assert isinstance(k1, str) and len(k1) == 16
     assert k1 == k2
 
     # changing any field changes key
     row3 = dict(row1)
     row3['start_date'] = '2021-01-01'
-    k3 = mod.generate_study_key(row3)
+    k3 = upload.generate_study_key(row3)
     assert k3 != k1
 
 
 def test_extract_conditions_splitting_and_cleaning():
-    mod = load_upload_module()
     df = pd.DataFrame([
         {'study_key': 's1', 'conditions': 'Diabetes, asthma|Cold,  x '},
         {'study_key': 's2', 'conditions': None},
         {'study_key': 's3', 'conditions': 'A, bb, ccc'}
     ])
 
-    out = mod.extract_conditions(df)
+    out = upload.extract_conditions(df)
     # should contain only cleaned entries (lowercase, stripped, min length >=3)
     assert 'condition_name' in out.columns
     # s1 should produce diabetes, asthma, cold
@@ -59,13 +51,12 @@ def test_extract_conditions_splitting_and_cleaning():
 
 
 def test_normalize_statuses_mapping_and_unexpected(caplog):
-    mod = load_upload_module()
     df = pd.DataFrame({
         'overall_status': ['ENROLLING_BY_INVITATION', 'COMPLETED', 'FOO']
     })
     caplog.clear()
     caplog.set_level('WARNING')
-    out = mod.normalize_statuses(df.copy())
+    out = upload.normalize_statuses(df.copy())
     # mapping applied
     assert 'RECRUITING' in out['overall_status'].values
     # known value preserved
@@ -86,3 +77,260 @@ def test_date_conversion_coerce_to_nat():
     # invalid -> NaT
     assert pd.isna(converted[2])
     assert pd.isna(converted[3])
+
+
+def test_transform_parses_start_dates_independently_of_row_order():
+    df = pd.DataFrame({'Brief Title': ['a', 'b', 'c'], 'Overall Status': ['COMPLETED'] * 3,
+                       'Start Date': ['2004-10', '2021-01-01', 'notadate']})
+    forward, _ = upload.transform(df.copy())
+    backward, _ = upload.transform(df.iloc[::-1].copy())
+    assert forward['start_date'].tolist()[:2] == [pd.Timestamp('2004-10-01'), pd.Timestamp('2021-01-01')]
+    assert pd.isna(forward['start_date'].iloc[2])
+    assert backward.set_index('study_key')['start_date'].equals(forward.set_index('study_key')['start_date'].loc[backward['study_key']])
+
+
+def test_source_fingerprint_tracks_content(tmp_path):
+    csv_file = tmp_path / "clin_trials.csv"
+    csv_file.write_text("Brief Title,Conditions\nA,asthma\n", encoding="utf-8")
+    fp1 = upload.source_fingerprint(str(csv_file))
+    assert fp1 == upload.source_fingerprint(str(csv_file))
+
+    csv_file.write_text("Brief Title,Conditions\nB,asthma\n", encoding="utf-8")
+    assert upload.source_fingerprint(str(csv_file)) != fp1
+
+
+def test_iter_csv_blocks_cuts_only_at_record_ends():
+    import io
+    body = b'a,"multi\nline title",x\n' * 50 + b'b,plain,y\n' * 50
+    blocks = list(upload.iter_csv_blocks(io.BytesIO(body), block_bytes=64))
+    assert b''.join(data for _, data in blocks) == body
+    for offset, data in blocks:
+        assert body[offset:offset + len(data)] == data
+        assert data.endswith(b'\n') and data.count(b'"') % 2 == 0
+
+
+def test_plan_incremental_reports_keys_gone_from_the_file():
+    stored = [
+        {'block_no': 0, 'study_keys': ['k1', 'k2']},
+        {'block_no': 1, 'study_keys': ['k3', 'k4']},
+        {'block_no': 2, 'study_keys': ['k5']},
+    ]
+    # block 1 changed (k4 dropped, k2 repeated in it), block 2 no longer exists
+    upsert, extra, deleted = upload.plan_incremental(stored, {1: ['k3', 'k2']}, n_blocks=2)
+    assert deleted == {'k4', 'k5'}
+    assert upsert == {'k3'} and extra == []          # k2 keeps its first occurrence in unchanged block 0
+
+
+def test_plan_incremental_rereads_the_block_a_first_occurrence_moved_to():
+    stored = [
+        {'block_no': 0, 'study_keys': ['a']},
+        {'block_no': 1, 'study_keys': ['b', 'c']},
+        {'block_no': 2, 'study_keys': ['c', 'd']},
+    ]
+    # c left changed block 1: its first occurrence is now in unchanged block 2
+    upsert, extra, deleted = upload.plan_incremental(stored, {1: ['b']}, n_blocks=3)
+    assert upsert == {'b', 'c'} and extra == [2] and deleted == set()
+
+
+def test_encode_dimension_maps_codes_to_smallint_ids():
+    dim = pd.DataFrame({'id': [1, 2, 5], 'code': ['PHASE1', 'PHASE2', 'NA']})
+    values = pd.Series(['NA', None, 'PHASE1', 'PHASE9', 'NA'], index=[10, 11, 12, 13, 14])
+    ids = upload.encode_dimension(values, dim)
+    assert str(ids.dtype) == 'Int16'
+    assert list(ids.index) == [10, 11, 12, 13, 14]
+    assert ids[10] == 5 and ids[12] == 1 and ids[14] == 5
+    assert pd.isna(ids[11]) and pd.isna(ids[13])
+
+
+def test_normalize_org_names_trims_and_collapses_whitespace():
+    names = pd.Series(['  ACME  Pharma ', 'ACME Pharma', None, 'Mayo\tClinic'])
+    out = upload.normalize_org_names(names)
+    assert out.tolist()[:2] == ['ACME Pharma', 'ACME Pharma']
+    assert pd.isna(out[2]) and out[3] == 'Mayo Clinic'
+
+
+def test_study_key_sources_match_generate_study_key():
+    import hashlib
+    df = pd.DataFrame({'brief_title': ['A', 'B'], 'full_title': ['Full A', np.nan],
+                       'start_date': ['2020-01-01', None]})
+    keys = [hashlib.md5(s.encode('utf-8')).hexdigest()[:16] for s in upload.study_key_sources(df)]
+    assert keys == [upload.generate_study_key(row) for _, row in df.iterrows()]
+
+
+def test_check_key_collisions_ignores_duplicates_but_rejects_collisions():
+    import pytest
+    keys = pd.Series(['k1', 'k1', 'k2'])
+    upload.check_key_collisions(keys, pd.Series(['same', 'same', 'other']))
+    with pytest.raises(ValueError, match='collision'):
+        upload.check_key_collisions(keys, pd.Series(['one study', 'another study', 'other']))
+
+
+def test_key_to_bigint_keeps_the_64_bits():
+    keys = pd.Series(['0000000000000001', 'ffffffffffffffff', '8000000000000000'])
+    assert upload.key_to_bigint(keys).tolist() == [1, -1, -2**63]
+    # lpad(to_hex(k), 16, '0') in SQL is the inverse
+    assert [format(k & (2**64 - 1), '016x') for k in upload.key_to_bigint(keys)] == keys.tolist()
+
+
+def test_condition_id_arrays_match_relations():
+    cond_df = pd.DataFrame({'study_key': ['s1', 's1', 's2', 's3'],
+                            'condition_name': ['asthma', 'obesity', 'asthma', 'cold']})
+    keys = pd.Series(['s1', 's2', 's3', 's4'])
+    conditions, relations, arrays = upload.condition_id_arrays(keys, cond_df)
+    assert conditions['id'].tolist() == [1, 2, 3]
+    ids = dict(zip(conditions['condition_name'], conditions['id']))
+    assert arrays.tolist() == [sorted([ids['asthma'], ids['obesity']]), [ids['asthma']], [ids['cold']], []]
+    assert len(relations) == 4
+
+
+def test_arrow_reader_matches_read_csv_and_keeps_arrow_strings(tmp_path):
+    csv_file = tmp_path / "clin_trials.csv"
+    csv_file.write_bytes(
+        '\ufeffBrief Title,Full Title,Organization Full Name,Overall Status,Start Date,Conditions\n'
+        'Alpha,"Full, ""quoted""\ntitle",ACME,COMPLETED,2020-01,"Diabetes, Asthma|Cold"\n'
+        'Beta,,NA,RECRUITING,,\n'
+        'Gamma,G,ACME,COMPLETED,2021-02-03, x \n'.encode('utf-8'))
+    pandas_df = upload.read_source(str(csv_file), 'pandas')
+    arrow_df = upload.read_source(str(csv_file), 'arrow')
+    assert list(arrow_df.columns) == list(pandas_df.columns)
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in arrow_df.dtypes)
+    assert arrow_df.astype(object).where(arrow_df.notna(), None).equals(pandas_df.where(pandas_df.notna(), None))
+
+    # Same keys (missing cells hash as 'nan'), same rows; text stays Arrow through transform()
+    p_studies, p_cond = upload.transform(pandas_df)
+    a_studies, a_cond = upload.transform(arrow_df)
+    assert a_studies['study_key'].tolist() == p_studies['study_key'].tolist()
+    assert isinstance(a_studies['brief_title'].dtype, pd.ArrowDtype)
+    assert isinstance(a_cond['condition_name'].dtype, pd.ArrowDtype)
+    pairs = lambda c: sorted(zip(c['study_key'], c['condition_name'].astype(str)))
+    assert pairs(a_cond) == pairs(p_cond)
+    assert len(a_cond) == 3
+
+
+def test_iter_source_frames_arrow_chunks_have_exact_sizes(tmp_path):
+    csv_file = tmp_path / "clin_trials.csv"
+    csv_file.write_text("Brief Title,Conditions\n" + "".join(f"S{i},asthma\n" for i in range(25)), encoding="utf-8")
+    chunks = list(upload.iter_source_frames(str(csv_file), 10, 'arrow'))
+    assert [len(c) for c in chunks] == [10, 10, 5]
+    assert pd.concat(chunks)['Brief Title'].tolist() == [f"S{i}" for i in range(25)]
+
+
+def test_insert_or_quarantine_bisects_down_to_the_rejected_rows():
+    from sqlalchemy import create_engine, text
+    engine = create_engine("sqlite://")
+    rows = pd.DataFrame({'study_key': [f"k{i}" for i in range(8)],
+                         'overall_status': ['OK', 'BAD', 'OK', 'OK', 'OK', 'OK', 'BAD', 'OK']})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE studies_new (study_key TEXT PRIMARY KEY, "
+                          "overall_status TEXT CHECK (overall_status <> 'BAD'))"))
+        conn.execute(text("CREATE TABLE load_quarantine (run_id INT, chunk_offset INT, study_key TEXT, "
+                          "reason TEXT, row_data TEXT)"))
+        loaded = upload.insert_or_quarantine(conn, rows, 'studies_new', 3, 100)
+        quarantined = conn.execute(text("SELECT run_id, chunk_offset, study_key, reason FROM load_quarantine "
+                                        "ORDER BY study_key")).all()
+        stored = conn.execute(text("SELECT study_key FROM studies_new ORDER BY study_key")).scalars().all()
+    assert loaded['study_key'].tolist() == ['k0', 'k2', 'k3', 'k4', 'k5', 'k7'] == stored
+    assert [r[:3] for r in quarantined] == [(3, 100, 'k1'), (3, 100, 'k6')]
+    assert all('CHECK constraint failed' in r[3] for r in quarantined)
+
+
+class _StubConn:
+    """Connection stand-in: records the SQL it gets, `scalars` answers the SELECTs"""
+    def __init__(self, scalars=()):
+        self.statements, self._scalars = [], list(scalars)
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return self
+
+    def scalars(self):
+        return self._scalars
+
+
+class _StubEngine:
+    def __init__(self):
+        self.conn = _StubConn()
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield self.conn
+
+
+def test_load_chunk_keeps_the_first_occurrence_across_chunks(monkeypatch):
+    chunk = pd.DataFrame({'Brief Title': ['a', 'b', 'c'], 'Overall Status': ['COMPLETED'] * 3})
+    keys = upload.transform(chunk.copy())[0]['study_key'].tolist()
+    inserted = []
+    monkeypatch.setattr(upload, 'insert_or_quarantine', lambda conn, rows, *a: inserted.append(rows) or rows)
+    monkeypatch.setattr(upload, 'save_load_sketch', lambda *a: None)
+
+    conn = _StubConn(scalars=[keys[1]])              # an earlier chunk already loaded 'b'
+    assert upload.load_chunk(conn, 7, 50, chunk) == (2, 0)
+    assert inserted[0]['study_key'].tolist() == [keys[0], keys[2]]
+    assert 'INSERT INTO load_chunks' in conn.statements[-1]
+
+
+def test_load_data_resumable_skips_committed_chunks(tmp_path, monkeypatch):
+    csv_file = tmp_path / "clin_trials.csv"
+    csv_file.write_text("Brief Title,Overall Status\n" + "".join(f"S{i},COMPLETED\n" for i in range(5)),
+                        encoding="utf-8")
+    loaded = []
+    monkeypatch.setattr(upload, 'CHUNK_ROWS', 2)
+    monkeypatch.setattr(upload, 'ensure_ledger', lambda conn: None)
+    monkeypatch.setattr(upload, 'start_or_resume_run', lambda conn, path, fp: (7, {0, 4}))
+    monkeypatch.setattr(upload, 'load_chunk', lambda conn, run_id, offset, chunk, tokenizer=None:
+                        loaded.append((run_id, offset, chunk['Brief Title'].tolist())) or (len(chunk), 0))
+    monkeypatch.setattr(upload, 'swap_shadow_tables', lambda engine: None)
+    monkeypatch.setattr(upload, 'load_script', lambda name: types.SimpleNamespace(
+        MERGED_PART=-1, merge_parts=lambda conn, load_id: None, save_sketch=lambda *a: None))
+
+    engine = _StubEngine()
+    upload.load_data_resumable(engine, str(csv_file))
+    assert loaded == [(7, 2, ['S2', 'S3'])]          # chunks @0 and @4 were committed by the earlier attempt
+    assert any("status = 'published'" in s for s in engine.conn.statements)
+
+
+def test_merge_blocks_keeps_the_first_occurrence_of_a_study_repeated_across_blocks():
+    from sqlalchemy import create_engine, text
+    first = pd.DataFrame({'Brief Title': ['a', 'b'], 'Overall Status': ['COMPLETED'] * 2,
+                          'Conditions': ['asthma, cold', 'obesity']})
+    second = pd.DataFrame({'Brief Title': ['c', 'a'], 'Overall Status': ['COMPLETED', 'RECRUITING'],
+                           'Conditions': ['asthma', 'asthma, diabetes']})
+    studies, cond_df = upload.merge_blocks([upload.transform(first), upload.transform(second)])
+    key_a = upload.transform(first)[0]['study_key'].iloc[0]
+    assert studies['study_key'].is_unique and len(studies) == 3
+    assert studies.set_index('study_key').loc[key_a, 'overall_status'] == 'COMPLETED'
+    assert sorted(cond_df.loc[cond_df['study_key'] == key_a, 'condition_name']) == ['asthma', 'cold']
+
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE studies (study_key TEXT PRIMARY KEY, brief_title TEXT, "
+                          "overall_status TEXT)"))
+        conn.execute(text("CREATE TABLE conditions (id INTEGER PRIMARY KEY, condition_name TEXT UNIQUE)"))
+        conn.execute(text("CREATE TABLE study_conditions (study_key TEXT, condition_id INT, "
+                          "PRIMARY KEY (study_key, condition_id))"))
+        upload.write_tables(conn, studies, cond_df)
+        assert conn.execute(text("SELECT COUNT(*) FROM study_conditions")).scalar() == 4
+
+
+class _CatalogConn(_StubConn):
+    """_StubConn whose queries return `rows` through .scalars().all()"""
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+def test_swap_refuses_to_cascade_into_unmanaged_dependents():
+    conn = _CatalogConn(['materialized view top_orgs', 'constraint fk_study on table study_notes'])
+    try:
+        upload._swap(conn, upload.SHADOW_SUFFIX)
+    except RuntimeError as e:
+        assert 'top_orgs' in str(e) and 'study_notes' in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+    assert not any('DROP TABLE' in s for s in conn.statements)
@@ -0,0 +1,58 @@
+import pandas as pd
+
+from migx import async_upload
+
+
+def test_assign_condition_ids_is_dense_and_consistent():
+    cond_df = pd.DataFrame({
+        'study_key':      ['s1', 's1', 's2', 's3', 's3'],
+        'condition_name': ['asthma', 'diabetes', 'asthma', 'cold', 'cold'],
+    })
+    conditions, relations = async_upload.assign_condition_ids(cond_df)
+    assert conditions['id'].tolist() == [1, 2, 3]
+    ids = dict(zip(conditions['condition_name'], conditions['id']))
+    assert ids == {'asthma': 1, 'diabetes': 2, 'cold': 3}
+    # duplicate (s3, cold) collapses to one relationship
+    assert sorted(map(tuple, relations.values.tolist())) == [('s1', 1), ('s1', 2), ('s2', 1), ('s3', 3)]
+
+
+def test_frame_to_records_converts_nulls_and_dates():
+    df = pd.DataFrame({
+        'study_key':  ['a', 'b'],
+        'phase':      ['PHASE1', None],
+        'start_date': pd.to_datetime(['2020-01-02', 'notadate'], errors='coerce'),
+    })
+    records = async_upload.frame_to_records(df)
+    assert records[0] == ('a', 'PHASE1', pd.Timestamp('2020-01-02').date())
+    assert records[1] == ('b', None, None)
+
+
+def test_lock_connection_is_closed_when_the_pool_cannot_be_created(tmp_path, monkeypatch):
+    import asyncio
+
+    csv_file = tmp_path / "clin_trials.csv"
+    csv_file.write_text("Brief Title,Overall Status\nS1,COMPLETED\n", encoding="utf-8")
+    closed = []
+
+    class LockConn:
+        async def fetchval(self, sql, *args):
+            return True
+
+        async def close(self):
+            closed.append(True)
+
+    async def connect(url):
+        return LockConn()
+
+    async def create_pool(*args, **kwargs):
+        raise OSError("too many connections")
+
+    monkeypatch.setattr(async_upload.asyncpg, 'connect', connect)
+    monkeypatch.setattr(async_upload.asyncpg, 'create_pool', create_pool)
+    try:
+        asyncio.run(async_upload.load_data_async(str(csv_file), 'postgresql://u@h/db'))
+    except OSError:
+        pass
+    else:
+        raise AssertionError("expected OSError")
+    assert closed == [True]                          # advisory lock released
@@ -0,0 +1,133 @@
+import struct
+import pyarrow as pa
+
+from migx import export
+
+
+def field(data):
+    return struct.pack('>i', -1) if data is None else struct.pack('>i', len(data)) + data
+
+
+def text_array(values):
+    body = b''.join(field(v.encode()) for v in values)
+    return struct.pack('>iiiii', 1, 0, 25, len(values), 1) + body
+
+
+def copy_stream(rows):
+    out = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+    for row in rows:
+        out += struct.pack('>h', len(row)) + b''.join(field(v) for v in row)
+    return out + struct.pack('>h', -1)
+
+
+def test_decoder_handles_split_stream_and_types():
+    columns = [('k', 'text', pa.string()), ('d', 'date', pa.date32()), ('n', 'int4', pa.int32()),
+               ('c', 'text[]', pa.list_(pa.string()))]
+    stream = copy_stream([
+        [b'a', struct.pack('>i', 0), struct.pack('>i', 7), text_array(['asthma', 'café'])],
+        [b'b', None, None, struct.pack('>iii', 0, 0, 25)],
+        [b'c', struct.pack('>i', -1), struct.pack('>i', -3), text_array(['x'])],
+    ])
+    batches = []
+    decoder = export.BinaryCopyDecoder(columns, batches.append, batch_rows=2)
+    for i in range(len(stream)):                # worst case: one byte per write()
+        decoder.write(stream[i:i + 1])
+    decoder.close()
+
+    table = pa.Table.from_batches(batches).to_pydict()
+    assert [len(b) for b in batches] == [2, 1]
+    assert table['k'] == ['a', 'b', 'c']
+    assert [str(d) for d in table['d']] == ['2000-01-01', 'None', '1999-12-31']
+    assert table['n'] == [7, None, -3]
+    assert table['c'] == [['asthma', 'café'], [], ['x']]
+    assert decoder.rows == 3 and decoder.bytes == len(stream)
+
+
+def test_decoder_rejects_truncated_stream():
+    decoder = export.BinaryCopyDecoder([('k', 'text', pa.string())], lambda batch: None)
+    decoder.write(copy_stream([[b'a']])[:-2])
+    try:
+        decoder.close()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_partition_paths_and_filters(tmp_path):
+    assert export.partition_dir(tmp_path, 2015).name == "start_year=2015"
+    assert export.partition_dir(tmp_path, None).name == "start_year=__HIVE_DEFAULT_PARTITION__"
+    assert export.partition_filter(None) == "s.start_date IS NULL"
+    assert "DATE '2016-01-01'" in export.partition_filter(2015)
+
+
+class _StubCursor:
+    """Answers snapshot_marker()'s three queries from `marker`"""
+    def __init__(self, marker):
+        self.marker, self._rows = marker, []
+
+    def execute(self, sql):
+        if 'pg_relation_filenode' in sql:
+            self._rows = [(name, *v) for name, v in self.marker['tables'].items()]
+        elif 'MAX(created_at)' in sql:
+            self._rows = [(self.marker['latest_created_at'],)]
+        else:
+            self._rows = [(None if y == 'None' else int(y), n) for y, n in self.marker['partitions'].items()]
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0]
+
+
+def test_export_resumes_only_the_same_snapshot_and_drops_its_state_when_done(tmp_path, monkeypatch):
+    marker = {'partitions': {'2015': 3, '2016': 2, 'None': 1},
+              'tables': {'studies': [16400, 6], 'conditions': [16410, 4], 'study_conditions': [16420, 9]},
+              'latest_created_at': '2026-01-01 10:00:00'}
+    raw = type('Raw', (), {'driver_connection': type('D', (), {'set_session': lambda self, **kw: None})(),
+                           'cursor': lambda self: _StubCursor(marker), 'rollback': lambda self: None,
+                           'close': lambda self: None})()
+    monkeypatch.setattr(export, 'create_engine', lambda url: type('E', (), {'raw_connection': lambda self: raw})())
+    exported, fail_on = [], {'2016'}
+
+    def export_partition(cursor, out_dir, year):
+        if str(year) in fail_on:
+            raise RuntimeError("connection lost")
+        exported.append(str(year))
+        return {'rows': 1, 'copy_bytes': 10, 'parquet_bytes': 5, 'seconds': 0.1}
+
+    monkeypatch.setattr(export, 'export_partition', export_partition)
+    state_path = tmp_path / export.STATE_FILE
+    try:
+        export.export_warehouse(str(tmp_path))
+    except RuntimeError:
+        pass
+    assert exported == ['2015'] and state_path.exists()
+
+    fail_on.clear()
+    export.export_warehouse(str(tmp_path))                 # same snapshot: resumes after 2015
+    assert exported == ['2015', '2016', 'None']
+    assert not state_path.exists()
+
+    fail_on.add('None')
+    try:
+        export.export_warehouse(str(tmp_path))             # complete runs leave nothing to skip
+    except RuntimeError:
+        pass
+    assert exported[3:] == ['2015', '2016']
+    marker['tables']['studies'][1] += 1                 # an upsert, same row counts
+    fail_on.clear()
+    export.export_warehouse(str(tmp_path))
+    assert exported[5:] == ['2015', '2016', 'None']
+
+
+def test_prune_partitions_removes_years_gone_from_the_tables(tmp_path):
+    for name in ('start_year=2014', 'start_year=2015', 'start_year=__HIVE_DEFAULT_PARTITION__'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'part-0.parquet').write_bytes(b'x')
+    (tmp_path / export.STATE_FILE).write_text('{}')
+
+    assert export.prune_partitions(tmp_path, ['2015', 'None']) == ['start_year=2014']
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        export.STATE_FILE, 'start_year=2015', 'start_year=__HIVE_DEFAULT_PARTITION__']
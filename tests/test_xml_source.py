@@ -0,0 +1,60 @@
+import pandas as pd
+
+from migx import upload, xml
+
+
+STUDY_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<clinical_studies>
+<clinical_study>
+  <brief_title>Aspirin &amp; Stroke</brief_title>
+  <official_title>A Study of Aspirin</official_title>
+  <sponsors><lead_sponsor><agency>ACME</agency><agency_class>Other gov</agency_class></lead_sponsor></sponsors>
+  <overall_status>Active, not recruiting</overall_status>
+  <start_date>March 5, 2004</start_date>
+  <study_type>Interventional</study_type>
+  <phase>Phase 1/Phase 2</phase>
+  <eligibility><std_age>Adult</std_age><std_age>Older adult</std_age></eligibility>
+  <condition>Stroke</condition>
+  <condition>Hypertension</condition>
+</clinical_study>
+<clinical_study>
+  <brief_title>Second</brief_title>
+  <overall_status>Completed</overall_status>
+  <start_date>January 2010</start_date>
+  <phase>N/A</phase>
+</clinical_study>
+<clinical_study>
+  <brief_title>Third</brief_title>
+  <overall_status>Recruiting</overall_status>
+</clinical_study>
+</clinical_studies>
+"""
+
+
+def test_record_fields_are_mapped_to_csv_codes(tmp_path):
+    xml_file = tmp_path / "studies.xml"
+    xml_file.write_text(STUDY_XML, encoding="utf-8")
+    df = xml.parse_xml_to_df(str(xml_file))
+    first = df.iloc[0]
+    assert list(df.columns) == xml.COLUMNS
+    assert first['brief_title'] == 'Aspirin & Stroke'
+    assert first['org_class'] == 'OTHER_GOV'
+    assert first['overall_status'] == 'ACTIVE_NOT_RECRUITING'
+    assert first['start_date'] == '2004-03-05'
+    assert first['phase'] == 'PHASE1|PHASE2'
+    assert first['standard_age'] == 'ADULT, OLDER_ADULT'
+    assert first['conditions'] == 'Stroke|Hypertension'
+    assert df.iloc[1]['start_date'] == '2010-01' and df.iloc[1]['phase'] == 'NA'
+    assert pd.isna(df.iloc[2]['full_title'])
+
+
+def test_chunks_feed_the_loader_transform(tmp_path):
+    xml_file = tmp_path / "studies.xml"
+    xml_file.write_text(STUDY_XML, encoding="utf-8")
+    chunks = list(upload.iter_source_frames(str(xml_file), 2))
+    assert [len(c) for c in chunks] == [2, 1]
+
+    studies, cond_df = upload.transform(chunks[0])
+    assert set(studies.columns) <= set(upload.STUDY_COLUMNS)
+    assert 'org_name' in studies.columns and 'study_key' in studies.columns
+    assert set(cond_df['condition_name']) == {'stroke', 'hypertension'}